@@ -0,0 +1,55 @@
+"""
+Compare how long a task of a job array takes to find its arguments, with sed and with the index.
+
+Writes the arguments of a ``--tasks``-task array with
+:func:`slurmpilot.slurm_script.write_python_args` and times, for tasks at several positions
+of the array, the former ``sed -n Np python-args.txt`` lookup and the indexed lookup of the
+generated scripts. Run from the repository root (with slurmpilot installed, or with
+``PYTHONPATH=.``)::
+
+    python benchmarks/bench_array_args.py --tasks 100000
+
+Pass ``--dir`` to write the arguments on the shared filesystem of a cluster, where reading
+a file from its start is much slower than on a local disk.
+"""
+import argparse
+import os
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+from slurmpilot.slurm_script import ARGS_FILE, _argument_lookup, write_python_args
+
+SED_LOOKUP = f'argument=$(sed -n "$(( TASK + 1 ))p" {ARGS_FILE})\n'
+
+
+def time_lookup(lookup: str, directory: Path, task: int, repeat: int) -> float:
+    """Seconds per lookup of the argument of ``task``, process startup included."""
+    script = f"for _ in $(seq {repeat}); do {lookup}done\n"
+    start = time.perf_counter()
+    subprocess.run(["bash", "-c", script], cwd=directory, env={**os.environ, "TASK": str(task)}, check=True)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20, help="lookups timed per task position")
+    parser.add_argument("--dir", type=Path, default=None, help="where to write the argument files")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        tmp = Path(tmp)
+        write_python_args(tmp, [{"seed": i, "lr": 1.0 / (i + 1), "model": "resnet50"} for i in range(args.tasks)])
+        size = (tmp / ARGS_FILE).stat().st_size
+        print(f"{args.tasks} tasks, {size / 1e6:.1f} MB of arguments")
+        print(f"{'task':>8} {'sed':>10} {'index':>10}")
+        for task in sorted({0, args.tasks // 2, args.tasks - 1}):
+            sed = time_lookup(SED_LOOKUP, tmp, task, args.repeat)
+            indexed = time_lookup(_argument_lookup("TASK"), tmp, task, args.repeat)
+            print(f"{task:>8} {1000 * sed:8.2f}ms {1000 * indexed:8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
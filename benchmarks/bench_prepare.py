@@ -0,0 +1,72 @@
+"""
+Measure how many jobs per second :meth:`slurmpilot.SlurmPilot.schedule_jobs` prepares locally.
+
+Builds a synthetic source tree and prepares ``--jobs`` jobs from it in dry-run mode (copy of
+the sources, python-args.txt, slurm script and metadata, nothing is submitted) with each
+number of ``--workers``. Run from the repository root (with slurmpilot installed, or with
+``PYTHONPATH=.``)::
+
+    python benchmarks/bench_prepare.py --jobs 200 --files 500 --workers 1 4 16
+
+Pass ``--dir`` to run on a given filesystem and ``--snapshot-mode copy`` to measure plain
+copies on filesystems that support reflinks.
+"""
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from slurmpilot.config import Config
+from slurmpilot.snapshot import SNAPSHOT_MODES
+
+from slurmpilot import JobCreationInfo, SlurmPilot
+
+
+def make_tree(root: Path, n_files: int, file_size: int) -> None:
+    for i in range(n_files):
+        path = root / f"pkg{i % 20}" / f"module{i}.py"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(os.urandom(file_size))
+    (root / "main.py").write_text("print('hello')\n")
+
+
+def run(src: Path, local_path: Path, jobs: int, workers: int, snapshot_mode: str) -> float:
+    slurm = SlurmPilot(config=Config(local_path=local_path, snapshot_mode=snapshot_mode), clusters=["mock"])
+    job_infos = [
+        JobCreationInfo(
+            jobname=f"bench/job{i}", entrypoint="main.py", src_dir=str(src), cluster="mock",
+            python_args=[{"seed": seed, "lr": 0.1 / (i + 1)} for seed in range(3)],
+        )
+        for i in range(jobs)
+    ]
+    start = time.perf_counter()
+    scheduled = slurm.schedule_jobs(job_infos, dryrun=True, workers=workers)
+    elapsed = time.perf_counter() - start
+    if scheduled.errors:
+        raise RuntimeError(f"{len(scheduled.errors)} jobs failed, e.g. {next(iter(scheduled.errors.values()))!r}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--file-size", type=int, default=5_000, help="size of each file in bytes")
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 4, 16])
+    parser.add_argument("--snapshot-mode", default="reflink", choices=SNAPSHOT_MODES)
+    parser.add_argument("--dir", type=Path, default=None, help="where to create the trees")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        tmp = Path(tmp)
+        src = tmp / "src"
+        make_tree(src, args.files, args.file_size)
+        print(f"{args.jobs} jobs of {args.files} files of {args.file_size} bytes ({args.snapshot_mode})")
+        for workers in args.workers:
+            elapsed = run(src, tmp / f"workers{workers}", args.jobs, workers, args.snapshot_mode)
+            print(f"{workers:>3} workers: {elapsed:7.2f}s, {args.jobs / elapsed:8.1f} jobs/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Compare ``shutil.copytree`` with :func:`slurmpilot.snapshot.snapshot` for freezing a source folder.
+
+Builds a synthetic source tree and snapshots it ``--jobs`` times per method, changing one
+file between jobs as happens when iterating on code. Run from the repository root (with
+slurmpilot installed, or with ``PYTHONPATH=.``)::
+
+    python benchmarks/bench_snapshot.py --files 2000 --file-size 20000 --jobs 10
+
+Pass ``--dir`` to run on a given filesystem, reflinks are only used on filesystems that
+support them (btrfs, XFS, ...).
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from slurmpilot.snapshot import SnapshotIndex, snapshot
+
+
+def make_tree(root: Path, n_files: int, file_size: int) -> None:
+    for i in range(n_files):
+        path = root / f"pkg{i % 20}" / f"module{i}.py"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(os.urandom(file_size))
+
+
+def run(method: str, src: Path, workdir: Path, jobs: int) -> float:
+    index = SnapshotIndex(workdir / "snapshots.json")
+    start = time.perf_counter()
+    for job in range(jobs):
+        (src / "pkg0" / "module0.py").write_bytes(os.urandom(64))
+        dst = workdir / f"job{job}"
+        if method == "copytree":
+            shutil.copytree(src, dst)
+        else:
+            snapshot(src, dst, mode=method, index=index)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--file-size", type=int, default=20_000, help="size of each file in bytes")
+    parser.add_argument("--jobs", type=int, default=10)
+    parser.add_argument("--dir", type=Path, default=None, help="where to create the trees")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        tmp = Path(tmp)
+        src = tmp / "src"
+        make_tree(src, args.files, args.file_size)
+        print(f"{args.files} files of {args.file_size} bytes, {args.jobs} jobs")
+        for method in ["copytree", "copy", "reflink", "auto"]:
+            workdir = tmp / method
+            workdir.mkdir()
+            elapsed = run(method, src, workdir, args.jobs)
+            print(f"{method:>9}: {elapsed:7.3f}s total, {1000 * elapsed / args.jobs:8.1f}ms per job")
+            shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Compare the rsync and tar transfers of :class:`slurmpilot.remote_command.SSHExecution`.
+
+Builds a synthetic tree of many small files, as found in repositories with configs,
+notebooks or vendored packages, and uploads it ``--repeat`` times with each transfer to a
+fresh remote folder. Run from the repository root (with slurmpilot installed, or with
+``PYTHONPATH=.``) against a host you can ssh into without a password::
+
+    python benchmarks/bench_transfer.py --host mycluster --files 50000
+
+``--parallel 1 4 8`` also times rsync split into that many concurrent shards.
+
+The remote folders are created under ``--remote-path`` and removed afterwards.
+"""
+import argparse
+import os
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+from slurmpilot.remote_command import TRANSFERS, SSHExecution
+
+
+def make_tree(root: Path, n_files: int, file_size: int) -> None:
+    for i in range(n_files):
+        path = root / f"pkg{i % 100}" / f"sub{i % 7}" / f"file{i}.py"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(os.urandom(file_size // 2).hex().encode()[:file_size])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", required=True, help="ssh host or alias")
+    parser.add_argument("--user", default=None)
+    parser.add_argument("--remote-path", default="/tmp", help="remote folder where uploads are written")
+    parser.add_argument("--files", type=int, default=50_000)
+    parser.add_argument("--file-size", type=int, default=500, help="size of each file in bytes")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--transfers", nargs="+", default=list(TRANSFERS), choices=TRANSFERS)
+    parser.add_argument("--parallel", nargs="+", type=int, default=[1], help="numbers of rsync shards to compare")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = Path(tmp) / "src"
+        make_tree(src, args.files, args.file_size)
+        print(f"{args.files} files of {args.file_size} bytes to {args.host}:{args.remote_path}")
+        runs = [(transfer, 1) for transfer in args.transfers]
+        if "rsync" in args.transfers:
+            runs += [("rsync", n) for n in args.parallel if n > 1]
+        for transfer, parallel in runs:
+            exe = SSHExecution(
+                host=args.host, user=args.user, multiplex=True, transfer=transfer, parallel_transfers=parallel
+            )
+            exe.open_master()
+            timings = []
+            for _ in range(args.repeat):
+                remote = Path(args.remote_path) / f"slurmpilot-bench-{uuid.uuid4().hex}"
+                start = time.perf_counter()
+                exe.upload_folder(src, remote)
+                timings.append(time.perf_counter() - start)
+                exe.run(f"rm -rf {remote}")
+            exe.close()
+            label = transfer if parallel == 1 else f"{transfer}x{parallel}"
+            print(f"{label:>8}: best {min(timings):7.2f}s, mean {sum(timings) / len(timings):7.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,6 @@
 from .config import default_cluster_and_partition  # noqa: F401
+from .connection_pool import ConnectionPool  # noqa: F401
+from .instrumentation import InMemoryCollector, JsonLinesSink  # noqa: F401
 from .job_creation_info import JobCreationInfo  # noqa: F401
 from .slurmpilot import SlurmPilot  # noqa: F401
 from .util import unify  # noqa: F401
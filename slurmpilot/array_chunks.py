@@ -0,0 +1,194 @@
+"""
+Submission of job arrays larger than the limits of a cluster.
+
+Slurm rejects an array with an index of ``MaxArraySize`` or more, and every task of an
+array counts toward the ``MaxSubmitJobs`` limit of the user's association, pending tasks
+included. A job array exceeding either limit is therefore submitted as several chunks,
+sub-arrays indexed from 0 that each get the offset of their first task in the
+:data:`ARRAY_OFFSET_VAR` environment variable; the generated script adds it to
+``SLURM_ARRAY_TASK_ID`` to find the arguments of each task (see ``slurm_script.py``).
+
+The chunks of a job are listed in its ``jobid.json`` together with their sbatch command,
+and with their Slurm job id once submitted. Chunks that would take the jobs of the user
+above ``MaxSubmitJobs`` are only submitted later, when enough of the earlier ones have
+left the queue. Nothing runs in the background to do so: pending chunks are submitted
+when the status of the job is read, by :meth:`SlurmPilot.status`,
+:meth:`SlurmPilot.sacct_info` (and so ``sp list-jobs``), their async variants or
+:meth:`SlurmPilot.wait_completion`. The first chunk is always submitted, so that a job
+always has a job id once scheduled.
+
+A job with ``n_concurrent_jobs`` gives its ``%N`` throttle to every chunk, and Slurm
+applies it to each chunk on its own. Such chunks are therefore submitted one at a time,
+each once the previous one has left the queue, so that at most ``N`` tasks of the job
+run at once.
+
+The limits are read from the cluster config (``max_array_size`` and ``max_submit_jobs``)
+or, when not configured, from ``scontrol show config`` and ``sacctmgr``. Limits read from
+a cluster are kept in ``cache/limits.json`` by :class:`LimitsCache` for
+:data:`LIMITS_TTL_SECONDS`, so that they cost a round trip once a day rather than once
+per :class:`SlurmPilot` object.
+"""
+import json
+import logging
+import os
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from .remote_command import CommandResult
+
+logger = logging.getLogger(__name__)
+
+ARRAY_OFFSET_VAR = "SP_ARRAY_OFFSET"
+
+# Print MaxArraySize, and the MaxSubmit limits of the associations of the user (empty when unlimited).
+LIMITS_COMMANDS = [
+    "scontrol show config | sed -n 's/^MaxArraySize *= *//p'",
+    'sacctmgr -n -P show assoc user="$USER" format=MaxSubmit',
+]
+# Number of jobs of the user in the queue, counting each pending array task, per job id
+# (the job id of the whole array for array tasks), see parse_queue.
+QUEUED_JOBS_COMMAND = 'squeue -h -r -u "$USER" -o %F | sort | uniq -c'
+# How long limits read from a cluster are trusted before being read again.
+LIMITS_TTL_SECONDS = 24 * 3600.0
+
+
+@dataclass
+class SlurmLimits:
+    """Limits of a cluster on the submission of job arrays, None when unlimited or unknown."""
+
+    max_array_size: int | None = None
+    max_submit_jobs: int | None = None
+
+    @classmethod
+    def parse(cls, results: list[CommandResult]) -> "SlurmLimits":
+        """Parse the results of :data:`LIMITS_COMMANDS`; a failed command leaves its limit unknown."""
+        array_size, submit = results
+        return cls(
+            max_array_size=_smallest_int(array_size.stdout) if not array_size.failed else None,
+            max_submit_jobs=_smallest_int(submit.stdout) if not submit.failed else None,
+        )
+
+    def chunk_size(self) -> int | None:
+        limits = [limit for limit in [self.max_array_size, self.max_submit_jobs] if limit is not None]
+        return min(limits) if limits else None
+
+
+class LimitsCache:
+    """Limits read from each cluster, stored as JSON with the time they were read."""
+
+    def __init__(self, path: Path, ttl: float = LIMITS_TTL_SECONDS):
+        self.path = Path(path)
+        self.ttl = ttl
+
+    def _read(self) -> dict:
+        if not self.path.exists():
+            return {}
+        try:
+            return json.loads(self.path.read_text())
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable cluster limits {self.path}: {e}")
+            return {}
+
+    def get(self, cluster: str) -> SlurmLimits | None:
+        """Limits of ``cluster`` if they were read less than ``ttl`` seconds ago."""
+        entry = self._read().get(cluster)
+        if entry is None or time.time() - entry["time"] > self.ttl:
+            return None
+        return SlurmLimits(**entry["limits"])
+
+    def put(self, cluster: str, limits: SlurmLimits) -> None:
+        data = self._read()
+        data[cluster] = {"time": time.time(), "limits": asdict(limits)}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", dir=self.path.parent, delete=False) as f:
+            json.dump(data, f)
+        os.replace(f.name, self.path)
+
+
+@dataclass
+class ArrayChunk:
+    """Tasks ``offset`` to ``offset + size - 1`` of a job array, submitted as one sub-array."""
+
+    offset: int
+    size: int
+    # sbatch command submitting the chunk, run in the job folder.
+    command: str = ""
+    jobid: int | None = None
+    cancelled: bool = False
+    # ``%N`` throttle of the chunk, taken from ``n_concurrent_jobs``.
+    throttle: int | None = None
+
+    @property
+    def pending(self) -> bool:
+        """Whether the chunk still has to be submitted."""
+        return self.jobid is None and not self.cancelled
+
+
+def split_array(n_tasks: int, limits: SlurmLimits) -> list[ArrayChunk]:
+    """Split an array of ``n_tasks`` into chunks fitting ``limits``, a single chunk if it fits already."""
+    size = limits.chunk_size() or n_tasks
+    return [ArrayChunk(offset=offset, size=min(size, n_tasks - offset)) for offset in range(0, n_tasks, size)]
+
+
+def parse_queue(output: str) -> tuple[int, set[int]]:
+    """Number of queued jobs and job ids in the queue, from the output of :data:`QUEUED_JOBS_COMMAND`."""
+    queued, jobids = 0, set()
+    for line in output.splitlines():
+        fields = line.split()
+        if len(fields) == 2 and all(field.isdigit() for field in fields):
+            queued += int(fields[0])
+            jobids.add(int(fields[1]))
+    return queued, jobids
+
+
+def chunks_to_submit(
+    chunks: list[ArrayChunk],
+    queued: int | None,
+    max_submit_jobs: int | None,
+    live: set[int] | None = None,
+) -> list[ArrayChunk]:
+    """Pending chunks, in order, that fit under ``max_submit_jobs`` with ``queued`` jobs in the queue.
+
+    The first chunk of a job is returned even if it does not fit, see the module doc.
+
+    :param live: job ids in the queue, None if unknown. Throttled chunks are only returned
+        one at a time, once no earlier chunk is in ``live``.
+    """
+    pending = [chunk for chunk in chunks if chunk.pending]
+    started = any(chunk.jobid is not None for chunk in chunks)
+    throttled = chunks[0].throttle is not None
+    if throttled and started and (live is None or any(chunk.jobid in live for chunk in chunks)):
+        return []
+    ready = []
+    for chunk in pending:
+        fits = max_submit_jobs is None or queued is None or queued + chunk.size <= max_submit_jobs
+        if not fits and (started or ready):
+            break
+        ready.append(chunk)
+        if throttled:
+            break
+        queued = None if queued is None else queued + chunk.size
+    return ready
+
+
+def read_chunks(jobid_file: Path) -> list[ArrayChunk] | None:
+    """Chunks recorded in ``jobid_file``, None for a job submitted as a whole."""
+    if not jobid_file.exists():
+        return None
+    data = json.loads(jobid_file.read_text())
+    if "chunks" not in data:
+        return None
+    return [ArrayChunk(**chunk) for chunk in data["chunks"]]
+
+
+def write_chunks(jobid_file: Path, chunks: list[ArrayChunk]) -> None:
+    """Record ``chunks`` in ``jobid_file``, with the job id of the first one as the job id of the job."""
+    data = {"jobid": chunks[0].jobid, "chunks": [asdict(chunk) for chunk in chunks]}
+    jobid_file.write_text(json.dumps(data))
+
+
+def _smallest_int(output: str) -> int | None:
+    values = [int(token) for token in output.split() if token.isdigit()]
+    return min(values) if values else None
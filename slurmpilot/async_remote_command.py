@@ -0,0 +1,353 @@
+"""
+Asyncio counterparts of the command executors in :mod:`slurmpilot.remote_command`.
+
+Commands run through ``asyncio.create_subprocess_exec`` so that several clusters can be
+queried concurrently from one event loop: the latency of a multi-cluster operation is then
+the latency of the slowest cluster instead of the sum over clusters.
+
+- `AsyncSSHExecution`: runs commands on a remote host via native ssh/rsync subprocesses.
+- `AsyncLocalExecution`: runs commands locally.
+"""
+import asyncio
+import logging
+import os
+import shutil
+import signal
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Callable
+
+from .remote_command import (
+    CommandResult,
+    CommandTimeoutError,
+    TransferSettings,
+    _batch_script,
+    _env_prefixed,
+    _file_list,
+    _listing_command,
+    _local_sizes,
+    _parse_batch_output,
+    _parse_listing,
+    _Progress,
+    _SSHTarget,
+    _timed_out_result,
+    balanced_shards,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncRemoteExecution(ABC):
+    @abstractmethod
+    async def run(
+        self, command: str, env: dict | None = None, retries: int = 0, timeout: float | None = None
+    ) -> CommandResult: ...
+
+    async def run_many(
+        self, commands: list[str], env: dict | None = None, timeout: float | None = None, retries: int = 0
+    ) -> list[CommandResult]:
+        """Run ``commands`` in a single round trip, see :meth:`RemoteExecution.run_many`."""
+        if not commands:
+            return []
+        marker = f"__slurmpilot_{uuid.uuid4().hex}__"
+        result = await self._run_script(_batch_script(commands, marker, env), timeout=timeout, retries=retries)
+        return _parse_batch_output(commands, marker, result)
+
+    @abstractmethod
+    async def _run_script(self, script: str, timeout: float | None = None, retries: int = 0) -> CommandResult: ...
+
+    @abstractmethod
+    async def upload_folder(
+        self,
+        local_path: Path,
+        remote_path: Path,
+        timeout: float | None = None,
+        link_dest: Path | None = None,
+        files: list[str] | None = None,
+        progress: Callable[[int, int], None] | None = None,
+        settings: TransferSettings | None = None,
+    ) -> None: ...
+
+    @abstractmethod
+    async def download_folder(
+        self,
+        remote_path: Path,
+        local_path: Path,
+        timeout: float | None = None,
+        progress: Callable[[int, int], None] | None = None,
+    ) -> None: ...
+
+
+async def _communicate(
+    *args: str, input: str | None = None, env: dict | None = None, timeout: float | None = None
+) -> tuple[str, str, int]:
+    """Run ``args`` and return ``(stdout, stderr, return_code)``.
+
+    Like :func:`slurmpilot.remote_command._run_process`, the process group is killed when
+    ``timeout`` expires, and the process is killed when the awaiting task is cancelled.
+
+    :raises CommandTimeoutError: if the process did not finish within ``timeout`` seconds.
+    """
+    own_group = timeout is not None
+    process = await asyncio.create_subprocess_exec(
+        *args,
+        stdin=asyncio.subprocess.PIPE if input is not None else asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        env=env,
+        start_new_session=own_group,
+    )
+    # Shielded so that after a timeout the output read so far can still be collected.
+    communicate = asyncio.ensure_future(process.communicate(input.encode() if input is not None else None))
+    try:
+        stdout, stderr = await asyncio.wait_for(asyncio.shield(communicate), timeout)
+    except asyncio.TimeoutError:
+        _kill(process, own_group)
+        stdout, stderr = await communicate
+        raise CommandTimeoutError(
+            args, timeout, stdout.decode(errors="replace"), stderr.decode(errors="replace")
+        ) from None
+    except asyncio.CancelledError:
+        _kill(process, own_group)
+        raise
+    return stdout.decode(errors="replace"), stderr.decode(errors="replace"), process.returncode
+
+
+def _kill(process: asyncio.subprocess.Process, own_group: bool) -> None:
+    try:
+        if own_group:
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except ProcessLookupError:
+        pass
+
+
+class AsyncLocalExecution(AsyncRemoteExecution):
+    """Runs commands and copies files locally."""
+
+    async def run(
+        self, command: str, env: dict | None = None, retries: int = 0, timeout: float | None = None
+    ) -> CommandResult:
+        try:
+            stdout, stderr, return_code = await _communicate("sh", "-c", command, env=env, timeout=timeout)
+        except CommandTimeoutError as e:
+            return _timed_out_result(command, e)
+        return CommandResult(command=command, stdout=stdout, stderr=stderr, return_code=return_code)
+
+    async def _run_script(self, script: str, timeout: float | None = None, retries: int = 0) -> CommandResult:
+        try:
+            stdout, stderr, return_code = await _communicate("sh", "-s", input=script, timeout=timeout)
+        except CommandTimeoutError as e:
+            return _timed_out_result(script, e)
+        return CommandResult(command=script, stdout=stdout, stderr=stderr, return_code=return_code)
+
+    async def upload_folder(
+        self,
+        local_path: Path,
+        remote_path: Path,
+        timeout: float | None = None,
+        link_dest: Path | None = None,
+        files: list[str] | None = None,
+        progress: Callable[[int, int], None] | None = None,
+        settings: TransferSettings | None = None,
+    ) -> None:
+        """Copy local_path into remote_path (mirrors rsync semantics: dst/src_name/)."""
+        dest = Path(remote_path) / Path(local_path).name
+        await asyncio.to_thread(shutil.copytree, src=local_path, dst=dest, dirs_exist_ok=True)
+
+    async def download_folder(
+        self,
+        remote_path: Path,
+        local_path: Path,
+        timeout: float | None = None,
+        progress: Callable[[int, int], None] | None = None,
+    ) -> None:
+        """Copy remote_path into local_path (mirrors rsync semantics: dst/src_name/)."""
+        dest = Path(local_path) / Path(remote_path).name
+        await asyncio.to_thread(shutil.copytree, src=remote_path, dst=dest, dirs_exist_ok=True)
+
+
+class AsyncSSHExecution(_SSHTarget, AsyncRemoteExecution):
+    """Runs commands on a remote host via ssh subprocess; transfers files via rsync.
+
+    Takes the same connection settings as :class:`SSHExecution` and shares its
+    ControlMaster socket when ``multiplex`` is enabled.
+    """
+
+    async def run(
+        self, command: str, env: dict | None = None, retries: int = 0, timeout: float | None = None
+    ) -> CommandResult:
+        """
+        Run `command` on the remote host.
+
+        :param command: shell command string to execute remotely.
+        :param env: optional dict of environment variables prepended via `env KEY=val`.
+        :param retries: number of additional attempts when ssh cannot reach the host
+            (0 = try once), see :meth:`SSHExecution.run`.
+        :param timeout: defaults to the executor's ``timeout``, see :meth:`SSHExecution.run`.
+        """
+        remote_command = _env_prefixed(command, env)
+
+        async def attempt_once() -> CommandResult:
+            try:
+                stdout, stderr, return_code = await _communicate(
+                    *self._ssh_command(remote_command), timeout=self._timeout(timeout)
+                )
+            except CommandTimeoutError as e:
+                logger.warning(f"Command on {self._remote} timed out after {e.timeout}s: {command}")
+                result = _timed_out_result(command, e)
+                result.stdout, result.stderr = result.stdout.strip(), result.stderr.strip()
+                return result
+            return CommandResult(command=command, stdout=stdout.strip(), stderr=stderr.strip(), return_code=return_code)
+
+        return await self._retrying(attempt_once, retries)
+
+    async def _retrying(self, attempt_once, retries: int) -> CommandResult:
+        """Await ``attempt_once()`` until it reaches the host or ``retries`` is used up, see :class:`RetryPolicy`."""
+        attempt = 0
+        while True:
+            result = await attempt_once()
+            result.attempts = attempt + 1
+            delay = self._retry_delay(result, attempt, retries)
+            if delay is None:
+                return result
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def run_many(
+        self, commands: list[str], env: dict | None = None, timeout: float | None = None, retries: int = 0
+    ) -> list[CommandResult]:
+        return [
+            CommandResult(
+                command=r.command,
+                stdout=r.stdout.strip(),
+                stderr=r.stderr.strip(),
+                return_code=r.return_code,
+                timed_out=r.timed_out,
+            )
+            for r in await super().run_many(commands, env=env, timeout=timeout, retries=retries)
+        ]
+
+    async def _run_script(self, script: str, timeout: float | None = None, retries: int = 0) -> CommandResult:
+        async def attempt_once() -> CommandResult:
+            try:
+                stdout, stderr, return_code = await _communicate(
+                    *self._ssh_command("sh -s"), input=script, timeout=self._timeout(timeout)
+                )
+            except CommandTimeoutError as e:
+                return _timed_out_result(script, e)
+            return CommandResult(command=script, stdout=stdout, stderr=stderr, return_code=return_code)
+
+        return await self._retrying(attempt_once, retries)
+
+    async def upload_folder(
+        self,
+        local_path: Path,
+        remote_path: Path,
+        timeout: float | None = None,
+        link_dest: Path | None = None,
+        files: list[str] | None = None,
+        progress: Callable[[int, int], None] | None = None,
+        settings: TransferSettings | None = None,
+    ) -> None:
+        """
+        Upload local_path to remote_path via rsync, or as a tar stream if ``transfer="tar"``.
+        The folder will appear as remote_path/local_path.name/ on the remote host.
+
+        :param link_dest: see :meth:`SSHExecution.upload_folder`.
+        :param files: see :meth:`SSHExecution.upload_folder`.
+        :param progress: see :meth:`SSHExecution.upload_folder`.
+        :param settings: see :meth:`SSHExecution.upload_folder`.
+        :raises CommandTimeoutError: if rsync exceeds ``timeout``, which defaults to the
+            executor's ``transfer_timeout``.
+        """
+        timeout = self._transfer_timeout(timeout)
+        sizes = _local_sizes(local_path, files) if self._sharded() else {}
+        if sizes:
+            await self._run_shards(
+                sizes, progress,
+                lambda files_from: self._upload_shard(
+                    local_path, remote_path, link_dest, files_from, timeout, settings
+                ),
+            )
+            return
+        with _file_list(files) as files_from:
+            if self.transfer == "tar":
+                _, stderr, return_code = await _communicate(
+                    *self._tar_upload_command(local_path, remote_path, files_from, settings), timeout=timeout
+                )
+                if return_code != 0:
+                    raise RuntimeError(f"tar upload failed:\n{stderr}")
+            else:
+                await self._upload_shard(local_path, remote_path, link_dest, files_from, timeout, settings)
+        if progress is not None:
+            total = sum(_local_sizes(local_path, files).values())
+            progress(total, total)
+
+    async def _upload_shard(self, local_path, remote_path, link_dest, files_from, timeout, settings=None) -> None:
+        _, stderr, return_code = await _communicate(
+            *self._rsync_upload_command(local_path, remote_path, link_dest, files_from, settings), timeout=timeout
+        )
+        if return_code != 0 and link_dest is not None:
+            logger.warning(f"rsync upload against {link_dest} failed, retrying without it:\n{stderr}")
+            _, stderr, return_code = await _communicate(
+                *self._rsync_upload_command(local_path, remote_path, files_from=files_from, settings=settings),
+                timeout=timeout,
+            )
+        if return_code != 0:
+            raise RuntimeError(f"rsync upload failed:\n{stderr}")
+
+    async def _run_shards(self, sizes: dict[str, int], progress, transfer) -> None:
+        """Await ``transfer(files_from)`` concurrently on balanced shards of the paths of ``sizes``."""
+        tracker = _Progress(sum(sizes.values()), progress)
+
+        async def run_shard(shard: list[str]) -> None:
+            with _file_list(shard) as files_from:
+                await transfer(files_from)
+            tracker.add(sum(sizes[relative] for relative in shard))
+
+        await asyncio.gather(*(run_shard(shard) for shard in balanced_shards(sizes, self.parallel_transfers)))
+
+    async def download_folder(
+        self,
+        remote_path: Path,
+        local_path: Path,
+        timeout: float | None = None,
+        progress: Callable[[int, int], None] | None = None,
+    ) -> None:
+        """
+        Download remote_path to local_path via rsync, or as a tar stream if ``transfer="tar"``.
+        The folder will appear as local_path/remote_path.name/ locally.
+
+        :param progress: see :meth:`SSHExecution.download_folder`.
+        :raises CommandTimeoutError: if rsync exceeds ``timeout``, which defaults to the
+            executor's ``transfer_timeout``.
+        """
+        Path(local_path).mkdir(parents=True, exist_ok=True)
+        timeout = self._transfer_timeout(timeout)
+        if self._sharded():
+            listing = await self.run(_listing_command(remote_path), timeout=timeout)
+            if listing.failed:
+                raise RuntimeError(f"Could not list {remote_path}:\n{listing.stderr}")
+            (Path(local_path) / Path(remote_path).name).mkdir(exist_ok=True)
+            await self._run_shards(
+                _parse_listing(listing.stdout), progress,
+                lambda files_from: self._download_shard(remote_path, local_path, files_from, timeout),
+            )
+            return
+        if self.transfer == "tar":
+            args = self._tar_download_command(remote_path, local_path)
+        else:
+            args = self._rsync_download_command(remote_path, local_path)
+        _, stderr, return_code = await _communicate(*args, timeout=timeout)
+        if return_code != 0:
+            raise RuntimeError(f"{self.transfer} download failed:\n{stderr}")
+
+    async def _download_shard(self, remote_path, local_path, files_from, timeout) -> None:
+        _, stderr, return_code = await _communicate(
+            *self._rsync_download_command(remote_path, local_path, files_from), timeout=timeout
+        )
+        if return_code != 0:
+            raise RuntimeError(f"rsync download failed:\n{stderr}")
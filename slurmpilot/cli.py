@@ -12,11 +12,15 @@ Job commands (all take an optional positional jobname, default = latest job):
 
 Cluster commands:
   list-jobs     Print a table of recent jobs
+  gc-libs       Remove cached python_libraries no job uses anymore
+  sync          Upload a source folder to a cluster ahead of launching jobs from it
+  transfer-stats  Print the throughput measured on uploads and the settings in use
 
 Launch command:
   launch        Build and submit a job from a YAML config and/or CLI flags
 """
 import argparse
+import asyncio
 import sys
 from dataclasses import fields as dc_fields
 from pathlib import Path
@@ -31,6 +35,7 @@ from .slurm_script import generate_slurm_script
 from .slurmpilot import LOCAL_CLUSTER, MOCK_CLUSTER, SlurmPilot
 from .slurmpilot_logging import _cluster, _jobname
 from .util import parse_elapsed_minutes, unify
+from .watch import SourceWatcher
 
 _STATUS_EMOJI = {
     "COMPLETED":     "✅",
@@ -49,6 +54,25 @@ def _status_str(state: str | None) -> str:
     return f"{emoji} {state}"
 
 
+def _entries_str(done: int | None, failed: int | None, total: int | None) -> str:
+    """Progress of a job using tasks_per_job, e.g. ``12/50 (1 failed)``; empty for other jobs."""
+    if done is None:
+        return ""
+    return f"{done}/{total}" + (f" ({failed} failed)" if failed else "")
+
+
+def _job_entries_str(infos: list[dict], jobname: str, total: int | None) -> str:
+    """Progress of all the array tasks of ``jobname``, see :meth:`SlurmPilot.sacct_info`."""
+    rows = [info for info in infos if info["jobname"] == jobname and info.get("entries_done") is not None]
+    # A row without task id (e.g. the pending tasks of the array) already counts the whole job.
+    whole = [info for info in rows if info["task_id"] is None]
+    if whole:
+        return _entries_str(whole[0]["entries_done"], whole[0]["entries_failed"], total)
+    if not rows:
+        return ""
+    return _entries_str(sum(info["entries_done"] for info in rows), sum(info["entries_failed"] for info in rows), total)
+
+
 def _print_table(rows: list[dict]) -> None:
     """Print a list of dicts as a fixed-width table with a header."""
     if not rows:
@@ -117,7 +141,7 @@ def _make_sp(jobname: str, config: Config) -> tuple[SlurmPilot, str]:
 def cmd_log(args: argparse.Namespace, config: Config) -> None:
     sp, jobname = _make_sp(args.jobname, config)
     print(f"Log for {_jobname(jobname)}:")
-    stdout, stderr = sp.log(jobname)
+    stdout, stderr = sp.log(jobname, index=getattr(args, "entry", None))
     if stdout:
         print(stdout, end="")
     if stderr:
@@ -180,16 +204,19 @@ def cmd_list_jobs(args: argparse.Namespace, config: Config) -> None:
 
     unique_clusters = list({m.cluster for m in metadatas})
     sp = SlurmPilot(config=config, clusters=unique_clusters)
-    infos = sp.sacct_info([m.jobname for m in metadatas])
+    infos = asyncio.run(sp.sacct_info_async([m.jobname for m in metadatas]))
 
     rows = []
-    seen_jobids: set = set()
+    # Collapse on the jobname, a job array submitted in chunks has one Slurm job id per chunk.
+    seen_jobnames: set = set()
+    show_entries = any(info.get("entries") is not None for info in infos)
+    n_entries = {m.jobname: m.n_entries for m in metadatas}
     for info in infos:
-        if args.collapse_job_array and info["jobid"] in seen_jobids:
+        if args.collapse_job_array and info["jobname"] in seen_jobnames:
             continue
-        seen_jobids.add(info["jobid"])
+        seen_jobnames.add(info["jobname"])
         task_suffix = f" ({info['task_id']})" if info["task_id"] is not None else ""
-        rows.append({
+        row = {
             "job":      Path(info["jobname"]).name + task_suffix,
             "jobid":    info["jobid"],
             "cluster":  info["cluster"],
@@ -197,7 +224,13 @@ def cmd_list_jobs(args: argparse.Namespace, config: Config) -> None:
             "min":      f"{parse_elapsed_minutes(info['elapsed']):.1f}",
             "status":   _status_str(info["state"]),
             "nodelist": info["nodelist"],
-        })
+        }
+        if show_entries:
+            if args.collapse_job_array:
+                row["entries"] = _job_entries_str(infos, info["jobname"], n_entries.get(info["jobname"]))
+            else:
+                row["entries"] = _entries_str(info.get("entries_done"), info.get("entries_failed"), info.get("entries"))
+        rows.append(row)
 
     rows.sort(key=lambda r: r["creation"], reverse=True)
     _print_table(rows)
@@ -206,8 +239,11 @@ def cmd_list_jobs(args: argparse.Namespace, config: Config) -> None:
 def cmd_test_ssh(args: argparse.Namespace, config: Config) -> None:
     clusters = args.clusters
     sp = SlurmPilot(config=config, clusters=clusters)
-    for cluster in clusters:
-        ok = sp.test_ssh(cluster)
+
+    async def test_all() -> list[bool]:
+        return await asyncio.gather(*(sp.test_ssh_async(cluster) for cluster in clusters))
+
+    for cluster, ok in zip(clusters, asyncio.run(test_all())):
         symbol = "✅" if ok else "❌"
         print(f"{symbol} {_cluster(cluster)}")
 
@@ -219,7 +255,7 @@ def cmd_stop_all(args: argparse.Namespace, config: Config) -> None:
         clusters = list(config.cluster_configs.keys()) or [c for c in
                    SlurmPilot(config=config).clusters]
     sp = SlurmPilot(config=config, clusters=clusters)
-    cancelled = sp.stop_all_jobs(clusters)
+    cancelled = asyncio.run(sp.stop_all_jobs_async(clusters))
     if not cancelled:
         print("No jobs to stop.")
     else:
@@ -228,6 +264,87 @@ def cmd_stop_all(args: argparse.Namespace, config: Config) -> None:
         print(f"\n{len(cancelled)} job(s) stopped.")
 
 
+def cmd_gc_libs(args: argparse.Namespace, config: Config) -> None:
+    clusters = args.clusters or [
+        name for name, cfg in config.cluster_configs.items() if cfg.library_cache
+    ]
+    sp = SlurmPilot(config=config, clusters=clusters)
+    for cluster in clusters:
+        removed = sp.gc_libraries(cluster, max_age_days=args.max_age_days, dryrun=args.dry_run)
+        verb = "would remove" if args.dry_run else "removed"
+        for key in removed:
+            print(f"🗑  {_cluster(cluster)} {verb} {key}")
+        print(f"{_cluster(cluster)}: {len(removed)} library version(s) {verb}.")
+
+
+def cmd_sync(args: argparse.Namespace, config: Config) -> None:
+    cluster = args.cluster or config.default_cluster
+    if cluster is None:
+        print("Error: pass --cluster or set default_cluster in general.yaml", file=sys.stderr)
+        sys.exit(1)
+    src_dir = Path(args.src_dir).resolve()
+    sp = SlurmPilot(config=config, clusters=[cluster])
+    watcher = SourceWatcher(
+        sp, cluster, src_dir, exclude=args.exclude, interval=args.interval,
+        use_gitignore=args.use_gitignore, ship_git=args.ship_git,
+    )
+
+    def report(upload) -> None:
+        print(f"📤 {src_dir} staged on {_cluster(cluster)}: {upload.uploaded_blobs} new file(s), "
+              f"{upload.uploaded_bytes} B")
+
+    try:
+        report(watcher.sync())
+    except (RuntimeError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    if args.watch:
+        print(f"Watching {src_dir} for changes, press Ctrl-C to stop.")
+        try:
+            watcher.run(on_sync=report)
+        except KeyboardInterrupt:
+            pass
+
+
+def _rate(bytes_per_second: float | None) -> str:
+    return f"{bytes_per_second / 1e6:.1f} MB/s" if bytes_per_second is not None else "-"
+
+
+def _describe_settings(settings) -> str:
+    parts = [f"compress -{settings.compress_level}" if settings.compress_level else "compress"]
+    if not settings.compress:
+        parts = ["no compression"]
+    if settings.whole_file:
+        parts.append("whole files")
+    if settings.bwlimit:
+        parts.append(f"bwlimit {settings.bwlimit}")
+    return ", ".join(parts)
+
+
+def cmd_transfer_stats(args: argparse.Namespace, config: Config) -> None:
+    clusters = args.clusters or list(config.cluster_configs)
+    if not clusters:
+        print("No clusters configured.")
+        return
+    sp = SlurmPilot(config=config, clusters=clusters)
+    stats = sp.transfer_stats()
+    rows = []
+    for cluster in clusters:
+        summary = stats.summary(cluster)
+        settings = _describe_settings(sp._transfer_settings(cluster))
+        if sp._cluster_config(cluster).compress == "auto":
+            settings += " (auto)"
+        rows.append({
+            "cluster": _cluster(cluster),
+            "uploads": summary["uploads"],
+            "throughput": _rate(summary["throughput"]),
+            "compressed": _rate(summary["compressed"]),
+            "uncompressed": _rate(summary["uncompressed"]),
+            "settings": settings,
+        })
+    _print_table(rows)
+
+
 def cmd_queue_status(args: argparse.Namespace, config: Config) -> None:
     sp, jobname = _make_sp(args.jobname, config)
     pos = sp.queue_position(jobname)
@@ -279,10 +396,18 @@ _LAUNCH_FIELDS: list[tuple[str, type, str]] = [
     ("--max-runtime-minutes",  int,  "Wall-clock time limit in minutes"),
     ("--account",              str,  "Slurm account"),
     ("--n-concurrent-jobs",    int,  "Max concurrent tasks in a job array"),
+    ("--tasks-per-job",        int,  "python_args entries run by each task of a job array"),
     ("--remote-path",          str,  "Override remote slurmpilot root for this job"),
 ]
 
 
+def _add_ignore_flags(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--use-gitignore", action="store_true", dest="use_gitignore",
+                        help="Also leave out the files matched by .gitignore files")
+    parser.add_argument("--ship-git", action="store_true", dest="ship_git",
+                        help="Ship the .git folders, left out by default")
+
+
 def _load_launch_yaml(path: Path) -> dict:
     """Load a launch YAML, resolving relative paths against the YAML's directory."""
     with open(path) as f:
@@ -328,6 +453,16 @@ def _build_job_info(args: argparse.Namespace) -> JobCreationInfo:
             for lib in cli_libs
         ]
 
+    # exclude: CLI patterns are added to the ones of the YAML
+    cli_exclude = getattr(args, "exclude", None)
+    if cli_exclude is not None:
+        data["exclude"] = list(data.get("exclude") or []) + cli_exclude
+
+    # use_gitignore, ship_git: the flags can only turn on what the YAML leaves off
+    for option in ("use_gitignore", "ship_git"):
+        if getattr(args, option, False):
+            data[option] = True
+
     # src_dir: fall back to cwd when neither YAML nor flag provided
     if "src_dir" not in data:
         data["src_dir"] = str(Path.cwd())
@@ -426,6 +561,9 @@ _DESCRIPTIONS = {
     "slurm-script": "Print the generated Slurm script for a job",
     "queue-status": "Show position and priority of a pending job in the Slurm queue",
     "list-jobs": "Print a table of recent jobs",
+    "gc-libs": "Remove cached python_libraries no job uses anymore",
+    "sync": "Upload a source folder to a cluster ahead of launching jobs from it",
+    "transfer-stats": "Print the throughput measured on uploads and the settings in use",
     "launch": "Build and submit a job from a YAML config and/or CLI flags",
 }
 
@@ -437,6 +575,10 @@ def main(config: Config | None = None) -> None:
     for name in _COMMANDS:
         p = subparsers.add_parser(name, help=_DESCRIPTIONS[name])
         p.add_argument("jobname", nargs="?", default=None, help="Job name (defaults to latest)")
+    subparsers.choices["log"].add_argument(
+        "--entry", type=int, default=None,
+        help="Show the log of this python_args entry, for jobs launched with tasks_per_job",
+    )
 
     p = subparsers.add_parser("list-jobs", help=_DESCRIPTIONS["list-jobs"])
     p.add_argument("n", nargs="?", type=int, default=10, help="Number of jobs to show")
@@ -452,6 +594,29 @@ def main(config: Config | None = None) -> None:
     p.add_argument("--clusters", "--cluster", dest="clusters", nargs="+", default=None,
                    metavar="CLUSTER", help="Cluster(s) to stop (defaults to all)")
 
+    p = subparsers.add_parser("gc-libs", help=_DESCRIPTIONS["gc-libs"])
+    p.add_argument("--clusters", "--cluster", dest="clusters", nargs="+", default=None,
+                   metavar="CLUSTER", help="Cluster(s) to clean (defaults to those with library_cache)")
+    p.add_argument("--max-age-days", type=float, default=30.0, dest="max_age_days", metavar="N",
+                   help="Drop references of jobs older than N days that are not queued (default: 30)")
+    p.add_argument("--dry-run", action="store_true", dest="dry_run",
+                   help="Only print what would be removed")
+
+    p = subparsers.add_parser("sync", help=_DESCRIPTIONS["sync"])
+    p.add_argument("--cluster", default=None, help="Cluster to stage on (default: default_cluster)")
+    p.add_argument("--src-dir", dest="src_dir", default=".", help="Source folder (default: cwd)")
+    p.add_argument("--exclude", dest="exclude", nargs="+", default=None, metavar="PATTERN",
+                   help="Gitignore-style patterns of files not to ship, as for launch")
+    _add_ignore_flags(p)
+    p.add_argument("--watch", action="store_true",
+                   help="Keep running and stage the folder again whenever it changes")
+    p.add_argument("--interval", type=float, default=1.0, metavar="SECONDS",
+                   help="Seconds between two scans of the folder with --watch (default: 1)")
+
+    p = subparsers.add_parser("transfer-stats", help=_DESCRIPTIONS["transfer-stats"])
+    p.add_argument("--clusters", "--cluster", dest="clusters", nargs="+", default=None,
+                   metavar="CLUSTER", help="Cluster(s) to show (defaults to all configured)")
+
     p = subparsers.add_parser("launch", help=_DESCRIPTIONS["launch"])
     p.add_argument("--config", metavar="YAML", default=None,
                    help="Path to a job YAML config file")
@@ -460,6 +625,10 @@ def main(config: Config | None = None) -> None:
     p.add_argument("--python-libraries", dest="python_libraries", nargs="+", default=None,
                    metavar="PATH",
                    help="Local library directories to ship alongside the script (overrides YAML)")
+    p.add_argument("--exclude", dest="exclude", nargs="+", default=None, metavar="PATTERN",
+                   help="Gitignore-style patterns of files not to ship, on top of .slurmpilotignore "
+                        "(added to YAML)")
+    _add_ignore_flags(p)
     p.add_argument("--wait", action="store_true",
                    help="Block until the job completes and print its logs")
     p.add_argument("--max-wait-seconds", type=int, default=86400, dest="max_wait_seconds",
@@ -479,6 +648,12 @@ def main(config: Config | None = None) -> None:
         cmd_test_ssh(args, config)
     elif args.command == "stop-all":
         cmd_stop_all(args, config)
+    elif args.command == "gc-libs":
+        cmd_gc_libs(args, config)
+    elif args.command == "sync":
+        cmd_sync(args, config)
+    elif args.command == "transfer-stats":
+        cmd_transfer_stats(args, config)
     elif args.command == "launch":
         cmd_launch(args, config)
     else:
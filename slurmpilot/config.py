@@ -17,6 +17,47 @@ class ClusterConfig:
     account: str | None = None
     remote_path: str = "~/slurmpilot"
     default_partition: str | None = None
+    # Reuse one multiplexed ssh master connection (socket ~/.ssh/slurmpilot-%C) for all
+    # commands and transfers; off by default as some hosts forbid multiplexing.
+    ssh_multiplexing: bool = False
+    ssh_control_persist: str = "10m"
+    # Run sbatch/sacct/squeue/scancel through one long-lived remote shell.
+    ssh_persistent_shell: bool = False
+    # Seconds after which a remote command or a file transfer is killed, None to wait forever.
+    command_timeout: float | None = None
+    transfer_timeout: float | None = None
+    # Additional attempts of read-only commands (sacct, squeue, limits, upload checks) when ssh
+    # cannot reach the host, with jittered exponential backoff capped at retry_max_delay seconds;
+    # sbatch and scancel are never retried, see RetryPolicy in remote_command.py.
+    retries: int = 0
+    retry_max_delay: float = 30.0
+    # Upload job files through a content-addressed blob store on the cluster, see source_cache.py.
+    source_cache: bool = False
+    # Hard link files unchanged since the previous job from the same src_dir (rsync --link-dest).
+    link_dest: bool = True
+    # How job folders and logs are moved: "rsync", or "tar" to stream one compressed archive
+    # over a single ssh pipe, which is faster for trees of many small files.
+    transfer: str = "rsync"
+    # After an upload, check in one command that every file of the job arrived with its size.
+    verify_upload: bool = False
+    # Store python_libraries once per content in a shared libs/ folder on the cluster instead
+    # of in every job folder, see library_cache.py.
+    library_cache: bool = False
+    # Compression of transfers: true, false, or "auto" to pick it, with the compression level
+    # and whole-file mode, from the throughput of past uploads, see transfer_stats.py.
+    compress: bool | str = True
+    compress_level: int | None = None
+    # Bandwidth cap of rsync transfers, in KiB/s or with a unit such as "10m".
+    bwlimit: str | None = None
+    # Send changed files whole instead of computing rsync deltas.
+    whole_file: bool = False
+    # Number of concurrent rsync streams of an upload or download, each sending a share of
+    # the files balanced by size; 1 keeps a single stream.
+    parallel_transfers: int = 1
+    # Largest job array and number of queued jobs Slurm accepts, read from the cluster when
+    # not set; larger arrays are submitted in chunks, see array_chunks.py.
+    max_array_size: int | None = None
+    max_submit_jobs: int | None = None
 
 
 class Config:
@@ -25,12 +66,18 @@ class Config:
         local_path: str | Path | None = None,
         cluster_configs: dict[str, ClusterConfig] | None = None,
         default_cluster: str | None = None,
+        snapshot_mode: str = "reflink",
     ):
+        """
+        :param snapshot_mode: how ``schedule_job`` copies source folders into job folders,
+            ``"copy"``, ``"reflink"`` or ``"auto"``; see :mod:`slurmpilot.snapshot`.
+        """
         if local_path is None:
             local_path = Path("~/slurmpilot").expanduser()
         self._local_path = Path(local_path)
         self.cluster_configs = cluster_configs or {}
         self.default_cluster = default_cluster
+        self.snapshot_mode = snapshot_mode
 
     def local_slurmpilot_path(self) -> Path:
         return self._local_path.expanduser()
@@ -47,7 +94,7 @@ def load_config(path: Path | None = None) -> Config:
     Directory layout::
 
         {path}/
-          general.yaml            # optional; keys: local_path, default_cluster
+          general.yaml            # optional; keys: local_path, default_cluster, snapshot_mode
           clusters/
             {cluster}.yaml        # one file per cluster; keys match ClusterConfig fields
 
@@ -57,7 +104,7 @@ def load_config(path: Path | None = None) -> Config:
         path = DEFAULT_CONFIG_PATH.expanduser()
     path = Path(path).expanduser()
 
-    local_path, default_cluster = _load_general(path / "general.yaml")
+    local_path, default_cluster, snapshot_mode = _load_general(path / "general.yaml")
     cluster_configs = _load_clusters(path / "clusters")
 
     logger.info(f"Loaded cluster configurations: {', '.join(cluster_configs) or '(none)'}.")
@@ -65,6 +112,7 @@ def load_config(path: Path | None = None) -> Config:
         local_path=local_path,
         cluster_configs=cluster_configs,
         default_cluster=default_cluster,
+        snapshot_mode=snapshot_mode,
     )
 
 
@@ -107,15 +155,15 @@ def _load_yaml(path: Path) -> dict:
         return yaml.safe_load(f) or {}
 
 
-def _load_general(path: Path) -> tuple[str | None, str | None]:
-    """Return (local_path, default_cluster) from general.yaml, or (None, None) if missing."""
+def _load_general(path: Path) -> tuple[str | None, str | None, str]:
+    """Return (local_path, default_cluster, snapshot_mode) from general.yaml, with defaults if missing."""
     if not path.exists():
-        return None, None
+        return None, None, "reflink"
     data = _load_yaml(path)
     local_path = data.get("local_path")
     if local_path is not None:
         local_path = str(Path(local_path).expanduser())
-    return local_path, data.get("default_cluster")
+    return local_path, data.get("default_cluster"), data.get("snapshot_mode", "reflink")
 
 
 def _load_clusters(clusters_dir: Path) -> dict[str, ClusterConfig]:
@@ -0,0 +1,126 @@
+"""
+Process-wide pool of ssh executors shared by :class:`SlurmPilot` instances.
+
+Connections are keyed by ``(host, user)`` and the options they were created with, and are
+created lazily on first use. A connection
+that has not been used for ``max_idle_seconds`` is closed (its ssh master and persistent
+shell are torn down) the next time the pool is accessed, and a connection that has been
+idle for more than ``health_check_after`` seconds is probed before being handed out again.
+A connection is idle from the end of its last command or transfer: connections with a
+call in progress in any thread (see :attr:`SSHExecution.in_use`) are neither closed nor
+probed.
+
+Usage::
+
+    with ConnectionPool() as pool:
+        for config in configs:
+            SlurmPilot(config=config, clusters=["mycluster"], pool=pool).status([...])
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+
+from .remote_command import SSHExecution
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _PoolEntry:
+    connection: SSHExecution
+    last_used: float
+    # Held while the connection is probed, so that the pool stays usable meanwhile.
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def idle_seconds(self, now: float) -> float:
+        """Time since the connection was last handed out or used, 0 while it is in use."""
+        if self.connection.in_use:
+            return 0.0
+        return now - max(self.last_used, self.connection.last_active)
+
+
+class ConnectionPool:
+    def __init__(self, max_idle_seconds: float = 600.0, health_check_after: float = 60.0):
+        """
+        :param max_idle_seconds: close connections unused for longer than this.
+        :param health_check_after: probe a connection unused for longer than this before
+            reusing it, and replace it if the probe fails.
+        """
+        self.max_idle_seconds = max_idle_seconds
+        self.health_check_after = health_check_after
+        self._entries: dict[tuple[str, str | None, tuple], _PoolEntry] = {}
+        self._lock = threading.Lock()
+
+    def get(self, host: str, user: str | None = None, **options) -> SSHExecution:
+        """Return the pooled connection for ``(host, user)`` and ``options``, creating it if needed.
+
+        :param options: keyword arguments forwarded to :class:`SSHExecution` when the
+            connection is created. Connections to the same host created with different
+            options are pooled separately.
+        """
+        key = (host, user, _options_key(options))
+        with self._lock:
+            now = time.monotonic()
+            self._evict_idle(now)
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _PoolEntry(connection=SSHExecution(host=host, user=user, **options), last_used=now)
+                self._entries[key] = entry
+            # Marked as used before the pool lock is released so that no one evicts it meanwhile.
+            idle = entry.idle_seconds(now)
+            entry.last_used = max(entry.last_used, now)
+        # The probe is an ssh round trip, only callers wanting this connection wait for it.
+        with entry.lock:
+            if idle > self.health_check_after and not entry.connection.is_healthy():
+                logger.info(f"Replacing unhealthy connection to {entry.connection._remote}.")
+                entry.connection.close()
+                entry.connection = SSHExecution(host=host, user=user, **options)
+            return entry.connection
+
+    def evict_idle(self) -> int:
+        """Close connections that have been idle for too long; returns how many were closed."""
+        with self._lock:
+            return self._evict_idle(time.monotonic())
+
+    def close(self) -> None:
+        """Close every pooled connection."""
+        with self._lock:
+            for entry in self._entries.values():
+                entry.connection.close()
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: tuple[str, str | None]) -> bool:
+        """Whether a connection to ``(host, user)`` is pooled, whatever its options."""
+        return any(pooled[:2] == tuple(key) for pooled in self._entries)
+
+    def __enter__(self) -> "ConnectionPool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _evict_idle(self, now: float) -> int:
+        idle = [key for key, entry in self._entries.items() if entry.idle_seconds(now) > self.max_idle_seconds]
+        for key in idle:
+            self._entries.pop(key).connection.close()
+        return len(idle)
+
+
+def _options_key(options: dict) -> tuple:
+    # Options such as a RetryPolicy are not hashable, their repr compares by value instead.
+    return tuple(sorted((name, repr(value)) for name, value in options.items()))
+
+
+_default_pool: ConnectionPool | None = None
+
+
+def default_pool() -> ConnectionPool:
+    """Pool shared by every :class:`SlurmPilot` created without an explicit ``pool``."""
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = ConnectionPool()
+    return _default_pool
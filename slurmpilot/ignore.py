@@ -0,0 +1,182 @@
+"""
+Gitignore-style filtering of the folders shipped with a job.
+
+The patterns of the ``.slurmpilotignore`` files found in a shipped folder (and in its
+subfolders, where they apply relative to their own folder) are honoured, together with
+the extra patterns of ``JobCreationInfo.exclude`` which apply relative to the root of the
+folder. ``.gitignore`` files are only honoured with ``JobCreationInfo.use_gitignore``, as
+they often list files a job needs such as generated data or local configs. ``.git``
+folders are excluded unless ``JobCreationInfo.ship_git`` is set.
+
+The usual gitignore syntax is supported: ``#`` comments, ``!`` negation (the last
+matching pattern wins), a trailing ``/`` to only match folders, a leading or inner
+``/`` to anchor a pattern to its folder, and the ``*``, ``?``, ``[...]`` and ``**``
+wildcards. As with git, a file inside an excluded folder cannot be re-included.
+
+Filtering happens when the job folder is snapshotted, so the upload and the size
+reported for it only cover the files that are shipped.
+"""
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable
+
+IGNORE_FILE = ".slurmpilotignore"
+GITIGNORE_FILE = ".gitignore"
+GIT_DIR = ".git"
+
+
+@dataclass
+class _Rule:
+    regex: re.Pattern
+    negate: bool
+    dir_only: bool
+
+
+class IgnoreRules:
+    """Ordered list of gitignore patterns, matched against paths relative to one folder."""
+
+    def __init__(self, patterns: Iterable[str] = ()):
+        self.rules = [rule for rule in map(_parse, patterns) if rule is not None]
+
+    @classmethod
+    def from_file(cls, path: Path) -> "IgnoreRules":
+        try:
+            return cls(Path(path).read_text().splitlines())
+        except (OSError, UnicodeDecodeError):
+            return cls()
+
+    def __bool__(self) -> bool:
+        return bool(self.rules)
+
+    def match(self, relative: str, is_dir: bool) -> bool | None:
+        """Whether the posix path ``relative`` is ignored, or None if no pattern matches it."""
+        ignored = None
+        for rule in self.rules:
+            if rule.dir_only and not is_dir:
+                continue
+            if rule.regex.fullmatch(relative):
+                ignored = not rule.negate
+        return ignored
+
+
+def _parse(line: str) -> _Rule | None:
+    # Trailing spaces are ignored unless escaped, like git does.
+    line = line.rstrip("\n")
+    while line.endswith(" ") and not line.endswith("\\ "):
+        line = line[:-1]
+    if not line or line.startswith("#"):
+        return None
+    negate = line.startswith("!")
+    if negate:
+        line = line[1:]
+    elif line.startswith("\\"):
+        line = line[1:]
+    dir_only = line.endswith("/")
+    line = line.rstrip("/")
+    if not line:
+        return None
+    anchored = "/" in line
+    line = line.lstrip("/")
+    regex = _translate(line)
+    if not anchored:
+        regex = "(?:.*/)?" + regex
+    return _Rule(regex=re.compile(regex, re.DOTALL), negate=negate, dir_only=dir_only)
+
+
+def _translate(pattern: str) -> str:
+    """Translate a gitignore glob to a regular expression matching a whole relative path."""
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == "*":
+            if pattern.startswith("**/", i):
+                out.append("(?:.*/)?")
+                i += 3
+                continue
+            if pattern.startswith("**", i) and (i + 2 == n) and (i == 0 or pattern[i - 1] == "/"):
+                out.append(".*")
+                i += 2
+                continue
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            # A "]" right after the opening bracket (or its negation) is a literal.
+            end = pattern.find("]", i + (3 if pattern.startswith(("[!", "[^"), i) else 2))
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1:end]
+                if body[0] in "!^":
+                    body = "^" + body[1:]
+                out.append("[" + body + "]")
+                i = end
+        elif c == "\\" and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+def ignore_function(
+    root: Path, exclude: list[str] | None = None, use_gitignore: bool = False, ship_git: bool = False
+) -> Callable[[str, list[str]], set[str]]:
+    """Return an ``ignore`` callable for ``shutil.copytree(root, ...)`` applying the ignore
+    files found under ``root`` plus the ``exclude`` patterns.
+
+    :param use_gitignore: also apply the ``.gitignore`` files.
+    :param ship_git: keep the ``.git`` folders.
+    """
+    root = Path(root)
+    extra = IgnoreRules(exclude or [])
+    ignore_files = (GITIGNORE_FILE, IGNORE_FILE) if use_gitignore else (IGNORE_FILE,)
+    rules_of: dict[Path, list[IgnoreRules]] = {}
+
+    def rules_in(folder: Path) -> list[IgnoreRules]:
+        if folder not in rules_of:
+            rules = [IgnoreRules.from_file(folder / name) for name in ignore_files]
+            if folder == root:
+                rules.append(extra)
+            rules_of[folder] = [r for r in rules if r]
+        return rules_of[folder]
+
+    def ignore(directory: str, names: list[str]) -> set[str]:
+        directory = Path(directory)
+        relative = directory.relative_to(root)
+        # Ignore files of the parents first, so that deeper (more specific) files win.
+        folders = [root.joinpath(*relative.parts[:depth]) for depth in range(len(relative.parts) + 1)]
+        ignored = set()
+        for name in names:
+            if name == GIT_DIR and not ship_git:
+                ignored.add(name)
+                continue
+            is_dir = os.path.isdir(directory / name)
+            result = None
+            for folder in folders:
+                path = (directory / name).relative_to(folder).as_posix()
+                for rules in rules_in(folder):
+                    matched = rules.match(path, is_dir)
+                    if matched is not None:
+                        result = matched
+            if result:
+                ignored.add(name)
+        return ignored
+
+    return ignore
+
+
+def shipped_files(root: Path, ignore: Callable[[str, list[str]], set[str]] | None = None) -> list[str]:
+    """Relative posix paths of the files ``shutil.copytree(root, ..., ignore=ignore)`` would copy."""
+    files = []
+    for dirpath, dirnames, filenames in os.walk(root, followlinks=True):
+        ignored = ignore(dirpath, dirnames + filenames) if ignore is not None else set()
+        dirnames[:] = [name for name in dirnames if name not in ignored]
+        for name in filenames:
+            if name not in ignored:
+                files.append((Path(dirpath) / name).relative_to(root).as_posix())
+    return files
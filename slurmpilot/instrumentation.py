@@ -0,0 +1,155 @@
+"""
+Timed spans describing what slurmpilot spends its time on.
+
+Executors (:class:`~slurmpilot.remote_command.RemoteExecution`) emit one span per
+``run``, ``run_many``, ``upload`` and ``download`` to the listeners in their
+``listeners`` list. :class:`~slurmpilot.SlurmPilot` emits spans for the steps of its own
+operations (``copy``, ``upload``, ``sbatch``, ``sacct``, ``scancel``, ``squeue``,
+``download``) to the listeners passed to its constructor.
+
+Two listeners are provided:
+- `InMemoryCollector`: keeps spans in a list, e.g. to print a breakdown after a sweep.
+- `JsonLinesSink`: appends one JSON object per span to a file, for external dashboards.
+
+Usage::
+
+    collector = InMemoryCollector()
+    sp = SlurmPilot(clusters=["mycluster"], listeners=[collector])
+    sp.schedule_job(job)
+    for span in collector.spans:
+        print(span.operation, f"{span.duration:.2f}s", span.bytes_transferred)
+"""
+import functools
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Iterator
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Span:
+    operation: str
+    cluster: str | None
+    # Wall-clock start time (seconds since the epoch) and duration in seconds.
+    start: float
+    duration: float = 0.0
+    return_code: int | None = None
+    bytes_transferred: int | None = None
+    retries: int = 0
+    # "ExceptionType: message" if the operation raised.
+    error: str | None = None
+    attributes: dict = field(default_factory=dict)
+
+
+class SpanListener(ABC):
+    @abstractmethod
+    def on_span(self, span: Span) -> None:
+        """Called once per finished span; must be cheap and thread-safe."""
+
+
+class InMemoryCollector(SpanListener):
+    """Keeps every span it receives in ``spans``."""
+
+    def __init__(self):
+        self.spans: list[Span] = []
+        self._lock = threading.Lock()
+
+    def on_span(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def by_operation(self, operation: str) -> list[Span]:
+        return [span for span in self.spans if span.operation == operation]
+
+    def total_duration(self, operation: str) -> float:
+        return sum(span.duration for span in self.by_operation(operation))
+
+    def clear(self) -> None:
+        with self._lock:
+            self.spans.clear()
+
+
+class JsonLinesSink(SpanListener):
+    """Appends each span as one JSON line to ``path``."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path).expanduser()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def on_span(self, span: Span) -> None:
+        line = json.dumps(asdict(span), default=str)
+        with self._lock, open(self.path, "a") as f:
+            f.write(line + "\n")
+
+
+def emit(listeners: list[SpanListener], span: Span) -> None:
+    """Send ``span`` to every listener; a failing listener is logged and skipped."""
+    for listener in listeners:
+        try:
+            listener.on_span(span)
+        except Exception:
+            logger.exception(f"Span listener {listener!r} failed")
+
+
+@contextmanager
+def record_span(
+    listeners: list[SpanListener], operation: str, cluster: str | None = None, **attributes
+) -> Iterator[Span]:
+    """Time the body of the ``with`` block and emit it as a span.
+
+    The yielded span can be filled in (return code, bytes, ...) within the block. If the
+    block raises, the exception is recorded in ``error`` and propagated.
+    """
+    span = Span(operation=operation, cluster=cluster, start=time.time(), attributes=attributes)
+    started = time.perf_counter()
+    try:
+        yield span
+    except BaseException as e:
+        span.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        span.duration = time.perf_counter() - started
+        if listeners:
+            emit(listeners, span)
+
+
+def describe_result(span: Span, result) -> None:
+    """Copy return code, retries and timeout of a CommandResult (or a list of them) to ``span``."""
+    results = result if isinstance(result, list) else [result]
+    if not results:
+        return
+    span.return_code = next((r.return_code for r in results if r.failed), 0)
+    span.retries = sum(r.attempts - 1 for r in results)
+    if any(r.timed_out for r in results):
+        span.attributes["timed_out"] = True
+
+
+def traced(operation: str, transferred=None):
+    """Decorate an executor method so that each call emits a span to ``self.listeners``.
+
+    :param operation: name of the span.
+    :param transferred: optional function called with the method arguments after the call,
+        returning the number of bytes reported as ``bytes_transferred``.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if not self.listeners:
+                return method(self, *args, **kwargs)
+            with record_span(self.listeners, operation, self.span_cluster) as span:
+                result = method(self, *args, **kwargs)
+                if result is not None:
+                    describe_result(span, result)
+                if transferred is not None:
+                    span.bytes_transferred = transferred(*args, **kwargs)
+                return result
+        return wrapper
+    return decorator
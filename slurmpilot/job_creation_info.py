@@ -15,6 +15,11 @@ class JobCreationInfo:
         python_binary: If set, use this Python interpreter instead of bare bash.
         python_args: Arguments forwarded to the Python entrypoint. A dict is converted to
             ``--key=value`` flags. Ignored in bash mode.
+        n_concurrent_jobs: Maximum number of array tasks running at once.
+        tasks_per_job: Number of consecutive ``python_args`` entries run by each array task,
+            each with its own logs and exit status (see :mod:`slurmpilot.task_bundles`).
+        parallel_entries: Run the entries of an array task ``n_cpus`` at a time instead of
+            one after the other.
         partition: Slurm partition to use.
         n_cpus: CPUs per task.
         n_gpus: GPUs per node.
@@ -23,6 +28,10 @@ class JobCreationInfo:
         account: Slurm account to charge.
         env: Extra environment variables injected via ``--export``.
         sbatch_arguments: Raw extra flags passed verbatim to sbatch.
+        exclude: Extra gitignore-style patterns of files not to ship, on top of the
+            ``.slurmpilotignore`` files of `src_dir` and of each python library.
+        use_gitignore: Also leave out the files matched by their ``.gitignore`` files.
+        ship_git: Ship the ``.git`` folders, which are left out by default.
     """
 
     jobname: str
@@ -33,6 +42,8 @@ class JobCreationInfo:
     python_binary: str | None = None
     python_args: str | dict | list[str] | list[dict] | None = None
     n_concurrent_jobs: int | None = None
+    tasks_per_job: int | None = None
+    parallel_entries: bool = False
     python_libraries: list[str] | None = None
     partition: str | None = None
     n_cpus: int = 1
@@ -43,6 +54,9 @@ class JobCreationInfo:
     env: dict | None = None
     sbatch_arguments: str | None = None
     remote_path: str | None = None
+    exclude: list[str] | None = None
+    use_gitignore: bool = False
+    ship_git: bool = False
 
     def __post_init__(self):
         if self.src_dir is None:
@@ -59,3 +73,10 @@ class JobCreationInfo:
             assert isinstance(self.python_args, list), (
                 "n_concurrent_jobs can only be used when python_args is a list."
             )
+        if self.tasks_per_job is not None:
+            assert isinstance(self.python_args, list), (
+                "tasks_per_job can only be used when python_args is a list."
+            )
+            assert self.tasks_per_job >= 1, f"tasks_per_job must be at least 1, got {self.tasks_per_job}"
+        if self.parallel_entries:
+            assert self.tasks_per_job is not None, "parallel_entries requires tasks_per_job."
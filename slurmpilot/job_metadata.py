@@ -1,4 +1,6 @@
 import json
+import os
+import tempfile
 from dataclasses import dataclass
 from pathlib import Path
 
@@ -11,11 +13,20 @@ class JobMetadata:
     cluster: str
     date: str
     remote_path: str | None = None
+    src_dir: str | None = None
+    # Entries of python_args and number run per array task, for jobs using tasks_per_job.
+    n_entries: int | None = None
+    tasks_per_job: int | None = None
 
     def to_json(self) -> str:
         d = {"jobname": self.jobname, "cluster": self.cluster, "date": self.date}
         if self.remote_path is not None:
             d["remote_path"] = self.remote_path
+        if self.src_dir is not None:
+            d["src_dir"] = self.src_dir
+        if self.tasks_per_job is not None:
+            d["n_entries"] = self.n_entries
+            d["tasks_per_job"] = self.tasks_per_job
         return json.dumps(d)
 
     @classmethod
@@ -29,9 +40,45 @@ class JobMetadata:
             cluster=data["cluster"],
             date=data["date"],
             remote_path=data.get("remote_path"),
+            src_dir=data.get("src_dir"),
+            n_entries=data.get("n_entries"),
+            tasks_per_job=data.get("tasks_per_job"),
         )
 
 
+class UploadIndex:
+    """Latest remote job folder uploaded from each source folder, per cluster and remote root.
+
+    Kept in a small JSON file so that finding the base of a delta upload (see
+    ``ClusterConfig.link_dest``) does not require reading the metadata of every job.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    def latest(self, cluster: str, remote_root: Path, src_dir: str) -> Path | None:
+        entry = self._load().get(self._key(cluster, remote_root, src_dir))
+        return Path(entry) if entry else None
+
+    def record(self, cluster: str, remote_root: Path, src_dir: str, remote_job_dir: Path) -> None:
+        entries = self._load()
+        entries[self._key(cluster, remote_root, src_dir)] = str(remote_job_dir)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", dir=self.path.parent, delete=False) as f:
+            json.dump(entries, f)
+        os.replace(f.name, self.path)
+
+    @staticmethod
+    def _key(cluster: str, remote_root: Path, src_dir: str) -> str:
+        return f"{cluster}:{remote_root}:{Path(src_dir).resolve()}"
+
+    def _load(self) -> dict[str, str]:
+        try:
+            return json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return {}
+
+
 def list_metadatas(jobs_root: Path) -> list["JobMetadata"]:
     """Return all JobMetadata found under ``jobs_root``, sorted newest-first.
 
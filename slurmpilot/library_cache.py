@@ -0,0 +1,237 @@
+"""
+Remote cache of ``python_libraries`` shared by all jobs of a cluster.
+
+Without it, every ``python_libraries`` folder is copied into each job folder and uploaded
+again with it. With ``ClusterConfig.library_cache``, a library is stored once per content
+under ``{remote_root}/libs/{name}-{hash}/{name}/`` and the ``PYTHONPATH`` of the generated
+script points to ``libs/{name}-{hash}``, so that ``import {name}`` works as when the library
+is copied into the job folder. The hash covers the relative path, content and executable bit of
+every shipped file (after the ignore rules, see ``ignore.py``), so any change to the
+library creates a new version while unchanged libraries are never uploaded twice.
+
+Each job using a version registers a reference, a file named after the job in
+``libs/{name}-{hash}.refs/``. :meth:`LibraryCache.gc` drops the references of jobs that
+are gone and removes the versions left without any, see its documentation.
+
+Registering the references of one or many jobs and checking which versions are missing
+costs one round trip; the missing versions are then uploaded together to a temporary
+folder and moved into place, so that an interrupted upload never leaves a partial version
+behind.
+"""
+import hashlib
+import logging
+import os
+import shlex
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+from urllib.parse import quote
+
+from .ignore import shipped_files
+from .remote_command import RemoteExecution
+from .snapshot import snapshot
+from .source_cache import HashCache, blob_name
+from .util import shell_path
+
+logger = logging.getLogger(__name__)
+
+LIBS_DIR = "libs"
+# A job registers its references before its folder is uploaded, gc leaves newer references alone.
+GC_GRACE_SECONDS = 3600.0
+
+
+def library_key(
+    path: Path, hash_cache: HashCache, ignore: Callable[[str, list[str]], set[str]] | None = None
+) -> str:
+    """Name of the cached version of the library folder ``path``: ``{name}-{hash}``."""
+    path = Path(path)
+    h = hashlib.sha256()
+    for relative in sorted(shipped_files(path, ignore)):
+        file = path / relative
+        h.update(f"{relative}\0{blob_name(hash_cache.digest(file), os.stat(file).st_mode)}\n".encode())
+    return f"{path.resolve().name}-{h.hexdigest()[:16]}"
+
+
+def library_dir(remote_root: Path, key: str) -> Path:
+    """Remote folder of the cached library version ``key``, put on the ``PYTHONPATH`` of jobs.
+
+    The library itself is stored in a subfolder named after it.
+    """
+    return Path(remote_root) / LIBS_DIR / key
+
+
+@dataclass
+class LibraryReference:
+    """A reference of a job to a cached library version, as listed by :meth:`LibraryCache.gc`."""
+    key: str
+    jobname: str
+    mtime: float
+    job_exists: bool
+
+
+class LibraryCache:
+    def __init__(self, connection: RemoteExecution, remote_root: Path):
+        """
+        :param connection: executor of the cluster.
+        :param remote_root: remote slurmpilot root, libraries are stored in ``remote_root/libs``.
+        """
+        self.connection = connection
+        self.remote_root = Path(remote_root)
+
+    @property
+    def libs_dir(self) -> Path:
+        return self.remote_root / LIBS_DIR
+
+    def remote_dir(self, key: str) -> Path:
+        return library_dir(self.remote_root, key)
+
+    def ensure(
+        self,
+        libraries: dict[str, Path],
+        jobname: str,
+        snapshot_mode: str = "reflink",
+        ignore: Callable[[Path], Callable[[str, list[str]], set[str]]] | None = None,
+    ) -> list[str]:
+        """Reference the library versions ``libraries`` from ``jobname`` and upload the missing ones.
+
+        :param libraries: maps the key of each version (see :func:`library_key`) to the local
+            folder of the library.
+        :param ignore: returns the ``copytree`` ignore function of a library folder.
+        :return: the keys that were uploaded.
+        """
+        ignores = {key: ignore(path) for key, path in libraries.items()} if ignore else None
+        return self.ensure_many({jobname: libraries}, snapshot_mode=snapshot_mode, ignores=ignores)
+
+    def ensure_many(
+        self,
+        references: dict[str, dict[str, Path]],
+        snapshot_mode: str = "reflink",
+        ignores: dict[str, Callable[[str, list[str]], set[str]]] | None = None,
+    ) -> list[str]:
+        """Like :meth:`ensure` for several jobs: all references are registered in one round
+        trip and the missing versions are uploaded in one transfer.
+
+        :param references: maps each jobname to its libraries, as in :meth:`ensure`.
+        :param ignores: ``copytree`` ignore function of each version key.
+        :return: the keys that were uploaded.
+        """
+        libraries = {key: path for libs in references.values() for key, path in libs.items()}
+        if not libraries:
+            return []
+        libs = shell_path(self.libs_dir)
+        commands = []
+        for key in libraries:
+            refs = [
+                f"printf '%s' {shlex.quote(jobname)} > {libs}/{key}.refs/{shlex.quote(_ref_name(jobname))}"
+                for jobname, job_libraries in references.items() if key in job_libraries
+            ]
+            commands.append(
+                f"mkdir -p {libs}/{key}.refs && {' && '.join(refs)}"
+                f" && if [ -d {libs}/{key} ]; then echo present; else echo missing; fi"
+            )
+        missing = []
+        for key, result in zip(libraries, self.connection.run_many(commands)):
+            if result.failed:
+                raise RuntimeError(f"Could not register library {key} in {self.libs_dir}:\n{result.stderr}")
+            if result.stdout.strip() == "missing":
+                missing.append(key)
+        if missing:
+            self._upload({key: libraries[key] for key in missing}, snapshot_mode, ignores or {})
+        return missing
+
+    def _upload(self, libraries: dict[str, Path], snapshot_mode: str, ignores: dict) -> None:
+        """Upload the versions ``libraries`` together and move each one into place."""
+        logger.info(f"Uploading libraries {', '.join(libraries)}.")
+        incoming = f".incoming-{uuid.uuid4().hex}"
+        with tempfile.TemporaryDirectory(prefix="slurmpilot-lib-") as staging:
+            for key, path in libraries.items():
+                dst = Path(staging) / incoming / key / Path(path).name
+                snapshot(src=path, dst=dst, mode=snapshot_mode, ignore=ignores.get(key))
+            self.connection.upload_folder(Path(staging) / incoming, self.libs_dir)
+        # A version uploaded concurrently is kept. If it appears between the test and the mv,
+        # mv moves this copy inside it, where it is removed again.
+        commands = []
+        for key in libraries:
+            target = shell_path(self.remote_dir(key))
+            commands.append(
+                f"[ -d {target} ] || mv {shell_path(self.libs_dir / incoming / key)} {target};"
+                f" rm -rf {target}/{key}"
+            )
+        commands.append(f"rm -rf {shell_path(self.libs_dir / incoming)}")
+        commands.append(" && ".join(f"test -d {shell_path(self.remote_dir(key))}" for key in libraries))
+        result = self.connection.run("; ".join(commands))
+        if result.failed:
+            raise RuntimeError(f"Could not store libraries {', '.join(libraries)} in {self.libs_dir}:\n{result.stderr}")
+
+    def references(self) -> tuple[list[LibraryReference], set[str], set[str]]:
+        """List every reference, every cached version and the names of the jobs in the queue, in one command."""
+        root = shell_path(self.remote_root)
+        [result] = self.connection.run_many([
+            f"cd {root} 2>/dev/null || exit 0; "
+            f"for v in {LIBS_DIR}/*/; do case \"$v\" in *.refs/) continue;; esac; "
+            f"[ -d \"$v\" ] && echo \"version $(basename \"$v\")\"; done; "
+            f"for r in {LIBS_DIR}/*.refs/*; do [ -f \"$r\" ] || continue; j=$(cat \"$r\"); "
+            f"if [ -d \"jobs/$j\" ]; then e=1; else e=0; fi; "
+            f"t=$(stat -c %Y \"$r\" 2>/dev/null || stat -f %m \"$r\"); "
+            f"echo \"ref $t $e $(basename \"$(dirname \"$r\")\" .refs) $j\"; done; "
+            f"squeue -h -u \"$USER\" -o '%j' 2>/dev/null | sed 's/^/queued /'"
+        ])
+        if result.failed:
+            raise RuntimeError(f"Could not list libraries in {self.libs_dir}:\n{result.stderr}")
+        references, versions, queued = [], set(), set()
+        for line in result.stdout.splitlines():
+            kind, _, rest = line.partition(" ")
+            if kind == "version":
+                versions.add(rest)
+            elif kind == "ref":
+                mtime, exists, key, jobname = rest.split(" ", 3)
+                references.append(LibraryReference(key, jobname, float(mtime), exists == "1"))
+            elif kind == "queued":
+                queued.add(rest)
+        return references, versions, queued
+
+    def gc(
+        self, max_age_days: float = 30.0, dryrun: bool = False, grace_seconds: float = GC_GRACE_SECONDS
+    ) -> list[str]:
+        """Remove the library versions no job needs anymore.
+
+        A reference is dropped when its job folder no longer exists on the cluster, or when
+        it is older than ``max_age_days`` and the job is not in the Slurm queue anymore.
+        Versions left without any reference are then removed.
+
+        :param dryrun: only return what would be removed.
+        :param grace_seconds: references younger than this are kept even without a job folder,
+            as the job may still be uploading.
+        :return: keys of the removed versions.
+        """
+        references, versions, queued = self.references()
+        now = time.time()
+        stale, live = [], set()
+        for ref in references:
+            age = now - ref.mtime
+            expired = age > max_age_days * 86400 and ref.jobname not in queued
+            if (not ref.job_exists and age > grace_seconds) or expired:
+                stale.append(ref)
+            else:
+                live.add(ref.key)
+        unused = sorted(versions - live)
+        if dryrun or not (stale or unused):
+            return unused
+        libs = shell_path(self.libs_dir)
+        commands = [f"rm -f {libs}/{ref.key}.refs/{shlex.quote(_ref_name(ref.jobname))}" for ref in stale]
+        # A job may have referenced a version since it was listed, keep those.
+        commands += [
+            f"rmdir {libs}/{key}.refs 2>/dev/null; [ -d {libs}/{key}.refs ] || rm -rf {libs}/{key}"
+            for key in unused
+        ]
+        [result] = self.connection.run_many(["\n".join(commands)])
+        if result.failed:
+            raise RuntimeError(f"Could not remove libraries from {self.libs_dir}:\n{result.stderr}")
+        return unused
+
+
+def _ref_name(jobname: str) -> str:
+    return quote(jobname, safe="")
@@ -0,0 +1,102 @@
+"""
+List of the files of a job folder, built once while the folder is prepared.
+
+``schedule_job`` records every file it writes into the local job folder (the snapshotted
+sources and the generated files) in a :class:`Manifest` stored as ``manifest.json`` in the
+job folder. The manifest then replaces further walks of the folder: it gives the size
+reported before the upload, the list of files to transfer, and what to compare the remote
+copy against to verify an upload in one command (see :meth:`Manifest.verify_command`).
+
+``manifest.json`` itself is not listed and stays local.
+"""
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+from .util import shell_path
+
+MANIFEST_FILE = "manifest.json"
+
+
+@dataclass
+class ManifestEntry:
+    size: int
+    mtime_ns: int
+    sha256: str | None = None
+
+
+class Manifest:
+    def __init__(self, root: Path, entries: dict[str, ManifestEntry] | None = None):
+        """
+        :param root: folder the paths of the manifest are relative to.
+        :param entries: maps the relative posix path of each file to its entry.
+        """
+        self.root = Path(root)
+        self.entries = entries or {}
+
+    def add(self, path: Path, sha256: str | None = None) -> None:
+        """Record the file ``path``, which must be inside ``root``."""
+        st = os.stat(path)
+        relative = Path(os.path.relpath(path, self.root)).as_posix()
+        self.entries[relative] = ManifestEntry(size=st.st_size, mtime_ns=st.st_mtime_ns, sha256=sha256)
+
+    @property
+    def total_size(self) -> int:
+        return sum(entry.size for entry in self.entries.values())
+
+    def paths(self) -> list[str]:
+        return sorted(self.entries)
+
+    @property
+    def path(self) -> Path:
+        return self.root / MANIFEST_FILE
+
+    def save(self) -> None:
+        data = {
+            relative: [entry.size, entry.mtime_ns] + ([entry.sha256] if entry.sha256 else [])
+            for relative, entry in sorted(self.entries.items())
+        }
+        self.path.write_text(json.dumps(data))
+
+    @classmethod
+    def load(cls, root: Path) -> "Manifest | None":
+        """Load the manifest saved in ``root``, or None if there is none."""
+        try:
+            data = json.loads((Path(root) / MANIFEST_FILE).read_text())
+        except (OSError, ValueError):
+            return None
+        return cls(root, {relative: ManifestEntry(*values) for relative, values in data.items()})
+
+    @staticmethod
+    def verify_command(remote_dir: Path | str) -> str:
+        """Command listing the size and path of every file of the remote copy, see :meth:`check`.
+
+        GNU find prints the listing by itself, other finds (BSD, macOS) run ``stat -f`` instead.
+        """
+        gnu = "find . -type f -printf '%s %P\\n'"
+        bsd = "find . -type f -exec stat -f '%z %N' {} +"
+        return (
+            f"cd {shell_path(remote_dir)} && "
+            f"if find . -maxdepth 0 -printf '' 2>/dev/null; then {gnu}; else {bsd}; fi"
+        )
+
+    def check(self, listing: str) -> list[str]:
+        """Compare the output of :meth:`verify_command` with the manifest.
+
+        :return: one message per file missing or with a different size on the remote side.
+        """
+        remote_sizes = {}
+        for line in listing.splitlines():
+            size, _, relative = line.partition(" ")
+            if relative:
+                # stat prints the paths as found, with a leading "./".
+                remote_sizes[relative.removeprefix("./")] = int(size)
+        problems = []
+        for relative, entry in sorted(self.entries.items()):
+            size = remote_sizes.get(relative)
+            if size is None:
+                problems.append(f"missing {relative}")
+            elif size != entry.size:
+                problems.append(f"{relative} has {size} bytes instead of {entry.size}")
+        return problems
@@ -4,17 +4,96 @@ SSH and local command execution.
 Two implementations are provided:
 - `SSHExecution`: runs commands on a remote host via native ssh/rsync subprocesses.
 - `LocalExecution`: runs commands locally; useful for testing or single-machine use.
+
+`ShellSession` keeps a single shell process open and runs framed commands through its
+stdin; `SSHExecution` uses it when `persistent_shell` is enabled.
 """
+import contextlib
+import functools
+import heapq
 import logging
+import os
+import posixpath
+import queue
+import random
 import shlex
 import shutil
+import signal
 import subprocess
+import tempfile
+import threading
+import time
+import uuid
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Callable, Iterator
+
+from .instrumentation import SpanListener, traced
+from .util import folder_size, shell_path
 
 logger = logging.getLogger(__name__)
 
+# Default socket of the multiplexed master connection; %C is a hash of (local host, remote
+# host, port, user) computed by ssh, which keeps the path short and unique per target.
+DEFAULT_CONTROL_PATH = "~/.ssh/slurmpilot-%C"
+
+# How SSHExecution moves folders: "rsync" sends only what changed, "tar" streams one
+# compressed archive over a single ssh pipe, which is faster for trees of many small files.
+TRANSFERS = ("rsync", "tar")
+
+# ssh exits with 255 when the connection itself failed, the remote command's own exit code
+# is forwarded otherwise.
+SSH_TRANSPORT_ERROR = 255
+# Return code reported for commands killed on timeout, same as coreutils' timeout(1).
+TIMEOUT_RETURN_CODE = 124
+# Seconds given to the no-op command of is_healthy when the executor has no timeout.
+HEALTH_CHECK_TIMEOUT = 30.0
+
+
+@dataclass(frozen=True)
+class TransferSettings:
+    """How uploads and downloads are encoded on the wire.
+
+    :param compress: compress the data sent (rsync ``-z``, gzip for tar transfers).
+    :param compress_level: compression level from 1 (fastest) to 9 (smallest), None for
+        the default of rsync or gzip.
+    :param bwlimit: bandwidth cap of rsync transfers in rsync ``--bwlimit`` syntax, KiB/s
+        or with a unit such as ``"10m"``; tar transfers are not capped.
+    :param whole_file: send changed files whole instead of computing rsync deltas, which
+        is faster when the network is faster than reading the files on both ends.
+    """
+    compress: bool = True
+    compress_level: int | None = None
+    bwlimit: str | None = None
+    whole_file: bool = False
+
+    def __post_init__(self):
+        if self.compress_level is not None and not 1 <= self.compress_level <= 9:
+            raise ValueError(f"compress_level must be between 1 and 9, got {self.compress_level}")
+
+    def rsync_options(self) -> list[str]:
+        options = ["-az" if self.compress else "-a"]
+        if self.compress and self.compress_level is not None:
+            options.append(f"--compress-level={self.compress_level}")
+        if self.bwlimit is not None:
+            options.append(f"--bwlimit={self.bwlimit}")
+        if self.whole_file:
+            options.append("--whole-file")
+        return options
+
+    def tar_compression(self) -> list[str]:
+        """tar options compressing an archive as configured, see also :meth:`tar_decompression`."""
+        if not self.compress:
+            return []
+        if self.compress_level is None:
+            return ["-z"]
+        return [f"--use-compress-program=gzip -{self.compress_level}"]
+
+    def tar_decompression(self) -> list[str]:
+        return ["-z"] if self.compress else []
+
 
 @dataclass
 class CommandResult:
@@ -22,36 +101,435 @@ class CommandResult:
     stdout: str
     stderr: str
     return_code: int
+    # True if the command was killed because it exceeded its timeout; stdout and stderr
+    # then hold whatever it printed until then.
+    timed_out: bool = False
+    # Number of times the command was sent, more than 1 if transport failures were retried.
+    attempts: int = 1
 
     @property
     def failed(self) -> bool:
         return self.return_code != 0
 
+    @property
+    def transport_failed(self) -> bool:
+        """True if ssh could not reach the host, as opposed to the command failing."""
+        return self.return_code == SSH_TRANSPORT_ERROR
+
+
+@dataclass
+class RetryPolicy:
+    """Exponential backoff with full jitter for commands that failed to reach the host.
+
+    Only transport failures (see :attr:`CommandResult.transport_failed`) are retried: a
+    command that ran and returned an error, such as ``sbatch`` rejecting a job, would fail
+    the same way again.
+
+    The delay before retry ``n`` (starting at 0) is drawn uniformly in
+    ``[0, min(max_delay, base_delay * multiplier ** n)]`` so that many clients losing the
+    same login node do not reconnect in lockstep. ``budget`` bounds how many retries an
+    executor may have in flight overall: each retry spends one token and each successful
+    command gives one back, so a host that stays down stops being retried after ``budget``
+    attempts instead of stalling every command of a large submission.
+    """
+    base_delay: float = 1.0
+    max_delay: float = 30.0
+    multiplier: float = 2.0
+    jitter: bool = True
+    budget: int | None = 20
+
+    def delay(self, attempt: int) -> float:
+        """Seconds to wait before retry number ``attempt`` (0-based)."""
+        cap = min(self.max_delay, self.base_delay * self.multiplier ** attempt)
+        return random.uniform(0, cap) if self.jitter else cap
+
+
+class CommandTimeoutError(RuntimeError):
+    """Raised when a process or transfer does not finish within its timeout.
+
+    ``stdout`` and ``stderr`` hold the output produced before the process was killed.
+    """
+
+    def __init__(self, command, timeout: float, stdout: str = "", stderr: str = ""):
+        super().__init__(f"Timed out after {timeout}s: {command}")
+        self.command = command
+        self.timeout = timeout
+        self.stdout = stdout
+        self.stderr = stderr
+
+
+def _timed_out_result(command: str, error: CommandTimeoutError) -> CommandResult:
+    return CommandResult(
+        command=command,
+        stdout=error.stdout,
+        stderr=error.stderr,
+        return_code=TIMEOUT_RETURN_CODE,
+        timed_out=True,
+    )
+
+
+def _run_process(
+    args: list[str] | str,
+    input: str | None = None,
+    timeout: float | None = None,
+    shell: bool = False,
+    env: dict | None = None,
+) -> subprocess.CompletedProcess:
+    """Run ``args`` and capture its text output, like ``subprocess.run``.
+
+    When a timeout is given the process is started in its own session, so that the whole
+    process group is killed when the timeout expires: rsync and the ssh it spawned, or
+    every command of a shell pipeline, not only the direct child whose grandchildren
+    would otherwise keep the output pipes open. The process is also killed if the caller
+    is interrupted. Without a timeout the process stays attached to the terminal, so ssh
+    can still prompt for a password.
+
+    :raises CommandTimeoutError: if the process did not finish within ``timeout`` seconds.
+    """
+    own_group = timeout is not None
+    process = subprocess.Popen(
+        args,
+        stdin=subprocess.PIPE if input is not None else None,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        shell=shell,
+        env=env,
+        start_new_session=own_group,
+    )
+    try:
+        stdout, stderr = process.communicate(input, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        _kill(process, own_group)
+        stdout, stderr = process.communicate()
+        raise CommandTimeoutError(args, timeout, stdout, stderr)
+    except BaseException:
+        _kill(process, own_group)
+        process.wait()
+        raise
+    return subprocess.CompletedProcess(args, process.returncode, stdout, stderr)
+
+
+def _kill(process, own_group: bool) -> None:
+    try:
+        if own_group:
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except ProcessLookupError:
+        pass
+
+
+def _stream_process(args: list[str] | str, shell: bool = False, env: dict | None = None) -> Iterator[str]:
+    """Yield the stdout lines of ``args`` as they are produced, see :meth:`RemoteExecution.stream`.
+
+    stdout is read lazily from the pipe, so a consumer slower than the process makes it
+    block on a full pipe instead of buffering its output in memory. stderr goes to a
+    temporary file so that it cannot fill up and stall the process. If the generator is
+    closed before the end of the output, the process group is killed.
+    """
+    with tempfile.TemporaryFile(mode="w+") as stderr:
+        process = subprocess.Popen(
+            args,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=stderr,
+            text=True,
+            shell=shell,
+            env=env,
+            start_new_session=True,
+        )
+        finished = False
+        try:
+            yield from process.stdout
+            finished = True
+        finally:
+            if not finished:
+                _kill(process, own_group=True)
+            process.stdout.close()
+            process.wait()
+        if process.returncode != 0:
+            stderr.seek(0)
+            raise RuntimeError(f"Command failed with return code {process.returncode}: {args}\n{stderr.read()}")
+
+
+def _uploaded_bytes(local_path, *args, files: list[str] | None = None, **kwargs) -> int:
+    if files is not None:
+        return sum(_local_sizes(local_path, files).values())
+    return folder_size(local_path)
+
+
+def _downloaded_bytes(remote_path, local_path, *args, **kwargs) -> int:
+    return folder_size(Path(local_path) / Path(remote_path).name)
+
+
+def _relative_link_dest(link_dest: Path, dest: Path) -> str:
+    """Path of ``link_dest`` for ``rsync --link-dest`` uploading into ``dest``.
+
+    rsync resolves a relative ``--link-dest`` against the destination folder, which also
+    works for paths under ``~/`` that rsync would not expand.
+    """
+    if Path(link_dest).is_absolute() != Path(dest).is_absolute():
+        return str(link_dest)
+    return posixpath.relpath(str(link_dest), str(dest))
+
+
+@contextlib.contextmanager
+def _file_list(files: list[str] | None) -> Iterator[str | None]:
+    """Write ``files`` NUL-separated to a temporary file for ``rsync --files-from`` or ``tar -T``."""
+    if files is None:
+        yield None
+        return
+    with tempfile.NamedTemporaryFile("w", prefix="slurmpilot-files-", suffix=".txt") as f:
+        f.write("\0".join(files))
+        f.flush()
+        yield f.name
+
+
+def balanced_shards(sizes: dict[str, int], n: int) -> list[list[str]]:
+    """Split the paths of ``sizes`` (relative path to bytes) into at most ``n`` shards of similar total size.
+
+    Paths are assigned from the largest to the current lightest shard, which keeps the
+    heaviest shard within 4/3 of the best possible split.
+    """
+    heap = [(0, i) for i in range(max(1, min(n, len(sizes))))]
+    shards: list[list[str]] = [[] for _ in heap]
+    for path, size in sorted(sizes.items(), key=lambda item: (-item[1], item[0])):
+        total, i = heapq.heappop(heap)
+        shards[i].append(path)
+        heapq.heappush(heap, (total + size, i))
+    return [sorted(shard) for shard in shards if shard]
+
+
+def _local_sizes(root: Path, files: list[str] | None = None) -> dict[str, int]:
+    """Size of each file under ``root`` (or of ``files``), empty folders included with size 0."""
+    root = Path(root)
+    if files is not None:
+        return {relative: os.stat(root / relative).st_size for relative in files}
+    sizes = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        relative_dir = Path(dirpath).relative_to(root)
+        if not dirnames and not filenames and dirpath != str(root):
+            sizes[relative_dir.as_posix()] = 0
+        for name in filenames:
+            sizes[(relative_dir / name).as_posix()] = os.stat(Path(dirpath) / name).st_size
+    return sizes
+
+
+def _listing_command(remote_path: Path | str) -> str:
+    """Command printing ``size path`` of every file and empty folder under ``remote_path``.
+
+    GNU find prints the listing by itself, NUL-separated; other finds (BSD, macOS) run
+    ``stat -f`` instead, which prints one entry per line.
+    """
+    gnu = "find . -mindepth 1 \\( -type d -empty -printf '0 %P\\0' \\) -o \\( ! -type d -printf '%s %P\\0' \\)"
+    bsd = (
+        "find . -mindepth 1 \\( -type d -empty -exec printf '0 %s\\n' {} + \\)"
+        " -o \\( ! -type d -exec stat -f '%z %N' {} + \\)"
+    )
+    return (
+        f"cd {shell_path(remote_path)} && "
+        f"if find . -maxdepth 0 -printf '' 2>/dev/null; then {gnu}; else {bsd}; fi"
+    )
+
+
+def _parse_listing(listing: str) -> dict[str, int]:
+    sizes = {}
+    for entry in listing.split("\0" if "\0" in listing else "\n"):
+        size, _, relative = entry.strip("\n").partition(" ")
+        if relative:
+            # stat prints the paths as found, with a leading "./".
+            sizes[relative.removeprefix("./")] = int(size)
+    return sizes
+
+
+class _Progress:
+    """Adds up the bytes of the shards of a transfer as they complete and reports the total."""
+
+    def __init__(self, total: int, callback: Callable[[int, int], None] | None):
+        self.total = total
+        self.done = 0
+        self.callback = callback
+        self._lock = threading.Lock()
+
+    def add(self, nbytes: int) -> None:
+        with self._lock:
+            self.done += nbytes
+            done = self.done
+        logger.debug(f"Transferred {done}/{self.total} bytes.")
+        if self.callback is not None:
+            self.callback(done, self.total)
+
+
+def _env_prefixed(command: str, env: dict | None) -> str:
+    """Prefix ``command`` with ``env KEY=val ...`` so that it runs with ``env`` remotely."""
+    if not env:
+        return command
+    env_prefix = " ".join(f"{k}={shlex.quote(str(v))}" for k, v in env.items())
+    return f"env {env_prefix} {command}"
+
 
 class RemoteExecution(ABC):
+    @property
+    def listeners(self) -> list[SpanListener]:
+        """Listeners receiving a :class:`~slurmpilot.instrumentation.Span` per operation."""
+        if "_listeners" not in self.__dict__:
+            self._listeners: list[SpanListener] = []
+        return self._listeners
+
+    @property
+    def span_cluster(self) -> str | None:
+        """Value of ``cluster`` in the spans emitted by this executor."""
+        return None
+
     @abstractmethod
-    def run(self, command: str, env: dict | None = None, retries: int = 0) -> CommandResult: ...
+    def run(
+        self, command: str, env: dict | None = None, retries: int = 0, timeout: float | None = None
+    ) -> CommandResult: ...
+
+    @traced("run_many")
+    def run_many(
+        self, commands: list[str], env: dict | None = None, timeout: float | None = None, retries: int = 0
+    ) -> list[CommandResult]:
+        """Run ``commands`` in a single round trip and return one result per command.
+
+        The commands are shipped as one generated shell script that runs each of them in
+        turn, regardless of earlier failures, and frames their stdout, stderr and return
+        code. If the script itself cannot run, or is killed after ``timeout`` seconds,
+        every command without a result is reported as failed with the script's stderr.
+
+        :param retries: number of additional attempts of the whole script when ssh cannot
+            reach the host, see :meth:`run`; only for commands that are safe to run twice.
+        """
+        if not commands:
+            return []
+        marker = f"__slurmpilot_{uuid.uuid4().hex}__"
+        result = self._run_script(_batch_script(commands, marker, env), timeout=timeout, retries=retries)
+        return _parse_batch_output(commands, marker, result)
+
+    def _run_script(self, script: str, timeout: float | None = None, retries: int = 0) -> CommandResult:
+        """Run a multi-line shell script; implementations should feed it through stdin."""
+        return self.run(script, retries=retries, timeout=timeout)
+
+    def stream(self, command: str, env: dict | None = None) -> Iterator[str]:
+        """Yield the stdout lines of ``command`` (with their line endings) as they arrive.
+
+        Unlike :meth:`run`, the output is not buffered, which makes it suitable for
+        following a log with ``tail -f`` or for very long ``sacct`` outputs. Closing the
+        generator early (``break`` in a for loop, or ``close()``) kills the command.
+
+        This default implementation runs the command to completion with :meth:`run`;
+        executors that can read output incrementally override it.
+
+        :raises RuntimeError: once the output is exhausted, if the command failed.
+        """
+        result = self.run(command, env=env)
+        yield from result.stdout.splitlines(keepends=True)
+        if result.failed:
+            raise RuntimeError(f"Command failed with return code {result.return_code}: {command}\n{result.stderr}")
 
     @abstractmethod
-    def upload_folder(self, local_path: Path, remote_path: Path) -> None: ...
+    def upload_folder(
+        self,
+        local_path: Path,
+        remote_path: Path,
+        timeout: float | None = None,
+        link_dest: Path | None = None,
+        files: list[str] | None = None,
+        progress: Callable[[int, int], None] | None = None,
+        settings: TransferSettings | None = None,
+    ) -> None: ...
 
     @abstractmethod
-    def download_folder(self, remote_path: Path, local_path: Path) -> None: ...
+    def download_folder(
+        self,
+        remote_path: Path,
+        local_path: Path,
+        timeout: float | None = None,
+        progress: Callable[[int, int], None] | None = None,
+    ) -> None: ...
+
+
+def _batch_script(commands: list[str], marker: str, env: dict | None = None) -> str:
+    """Generate a POSIX shell script running ``commands`` with framed outputs (see run_many)."""
+    lines = [f"export {k}={shlex.quote(str(v))}" for k, v in (env or {}).items()]
+    lines += [
+        '__sp_dir=$(mktemp -d) || exit 1',
+        """trap 'rm -rf "$__sp_dir"' EXIT""",
+    ]
+    for i, command in enumerate(commands):
+        lines += [
+            f'( eval {shlex.quote(command)} ) </dev/null >"$__sp_dir/out" 2>"$__sp_dir/err"',
+            "__sp_rc=$?",
+            f"printf '%s out %d\\n' {marker} {i}",
+            'cat "$__sp_dir/out"',
+            f"printf '\\n%s err %d\\n' {marker} {i}",
+            'cat "$__sp_dir/err"',
+            f"printf '\\n%s rc %d %d\\n' {marker} {i} $__sp_rc",
+        ]
+    return "\n".join(lines) + "\n"
+
+
+def _parse_batch_output(commands: list[str], marker: str, result: CommandResult) -> list[CommandResult]:
+    """Split the output of a script generated by :func:`_batch_script` into per-command results."""
+    outputs: dict[int, dict] = {}
+    current: list[str] | None = None
+    for line in result.stdout.splitlines(keepends=True):
+        if line.startswith(marker):
+            fields = line.split()
+            index, kind = int(fields[2]), fields[1]
+            entry = outputs.setdefault(index, {})
+            if current is not None:
+                # Drop the newline printed in front of the marker.
+                entry["stdout" if kind == "err" else "stderr"] = "".join(current)[:-1]
+            if kind == "rc":
+                entry["return_code"] = int(fields[3])
+                current = None
+            else:
+                current = []
+        elif current is not None:
+            current.append(line)
+
+    results = []
+    for i, command in enumerate(commands):
+        entry = outputs.get(i, {})
+        if "return_code" in entry:
+            results.append(CommandResult(command=command, stdout=entry["stdout"], stderr=entry["stderr"],
+                                         return_code=entry["return_code"]))
+        else:
+            results.append(CommandResult(
+                command=command,
+                stdout="",
+                stderr=result.stderr or "batched command did not run",
+                return_code=result.return_code or 1,
+                timed_out=result.timed_out,
+            ))
+    return results
 
 
 class LocalExecution(RemoteExecution):
-    """Runs commands and copies files locally."""
+    """Runs commands and copies files locally.
 
-    def run(self, command: str, env: dict | None = None, retries: int = 0) -> CommandResult:
+    With ``parallel_transfers`` above 1, folders are copied by that many threads, each
+    copying a shard of the files of similar total size (see :func:`balanced_shards`).
+    """
+
+    span_cluster = "local"
+    parallel_transfers = 1
+
+    def __init__(self, parallel_transfers: int = 1):
+        self.parallel_transfers = parallel_transfers
+
+    @traced("run")
+    def run(
+        self, command: str, env: dict | None = None, retries: int = 0, timeout: float | None = None
+    ) -> CommandResult:
         # shell=True is required so that compound commands (&&, cd, etc.) work
         # the same way they do when forwarded through ssh.
-        result = subprocess.run(
-            command,
-            shell=True,
-            capture_output=True,
-            text=True,
-            env=env,
-        )
+        try:
+            result = _run_process(command, shell=True, env=env, timeout=timeout)
+        except CommandTimeoutError as e:
+            return _timed_out_result(command, e)
         return CommandResult(
             command=command,
             stdout=result.stdout,
@@ -59,96 +537,777 @@ class LocalExecution(RemoteExecution):
             return_code=result.returncode,
         )
 
-    def upload_folder(self, local_path: Path, remote_path: Path) -> None:
-        """Copy local_path into remote_path (mirrors rsync semantics: dst/src_name/)."""
+    def _run_script(self, script: str, timeout: float | None = None, retries: int = 0) -> CommandResult:
+        try:
+            result = _run_process(["sh", "-s"], input=script, timeout=timeout)
+        except CommandTimeoutError as e:
+            return _timed_out_result(script, e)
+        return CommandResult(
+            command=script,
+            stdout=result.stdout,
+            stderr=result.stderr,
+            return_code=result.returncode,
+        )
+
+    def stream(self, command: str, env: dict | None = None) -> Iterator[str]:
+        return _stream_process(command, shell=True, env=env)
+
+    @traced("upload", transferred=_uploaded_bytes)
+    def upload_folder(
+        self,
+        local_path: Path,
+        remote_path: Path,
+        timeout: float | None = None,
+        link_dest: Path | None = None,
+        files: list[str] | None = None,
+        progress: Callable[[int, int], None] | None = None,
+        settings: TransferSettings | None = None,
+    ) -> None:
+        """Copy local_path into remote_path (mirrors rsync semantics: dst/src_name/).
+
+        Local copies cannot hang on the network and have nothing to save by linking against
+        a previous upload, skipping files or compressing them, ``timeout``, ``link_dest``,
+        ``files`` and ``settings`` are accepted for interface compatibility and ignored.
+
+        :param progress: called with the bytes copied so far and the total after each shard.
+        """
         local_path = Path(local_path)
-        remote_path = Path(remote_path)
-        dest = remote_path / local_path.name
-        dest.mkdir(parents=True, exist_ok=True)
-        shutil.copytree(src=local_path, dst=dest, dirs_exist_ok=True)
+        self._copy(local_path, Path(remote_path) / local_path.name, progress)
 
-    def download_folder(self, remote_path: Path, local_path: Path) -> None:
-        """Copy remote_path into local_path (mirrors rsync semantics: dst/src_name/)."""
+    @traced("download", transferred=_downloaded_bytes)
+    def download_folder(
+        self,
+        remote_path: Path,
+        local_path: Path,
+        timeout: float | None = None,
+        progress: Callable[[int, int], None] | None = None,
+    ) -> None:
+        """Copy remote_path into local_path (mirrors rsync semantics: dst/src_name/), see upload_folder."""
         remote_path = Path(remote_path)
-        local_path = Path(local_path)
-        dest = local_path / remote_path.name
+        self._copy(remote_path, Path(local_path) / remote_path.name, progress)
+
+    def _copy(self, src: Path, dest: Path, progress: Callable[[int, int], None] | None) -> None:
         dest.mkdir(parents=True, exist_ok=True)
-        shutil.copytree(src=remote_path, dst=dest, dirs_exist_ok=True)
+        sizes = _local_sizes(src)
+        if self.parallel_transfers <= 1 or not sizes:
+            shutil.copytree(src=src, dst=dest, dirs_exist_ok=True)
+            if progress is not None:
+                total = sum(sizes.values())
+                progress(total, total)
+            return
+        tracker = _Progress(sum(sizes.values()), progress)
+
+        def copy_shard(shard: list[str]) -> int:
+            for relative in shard:
+                source, target = src / relative, dest / relative
+                if source.is_dir():
+                    target.mkdir(parents=True, exist_ok=True)
+                else:
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    shutil.copy2(source, target)
+            return sum(sizes[relative] for relative in shard)
+
+        shards = balanced_shards(sizes, self.parallel_transfers)
+        with ThreadPoolExecutor(max_workers=len(shards)) as pool:
+            for future in as_completed([pool.submit(copy_shard, shard) for shard in shards]):
+                tracker.add(future.result())
+
+
+class ShellSessionError(RuntimeError):
+    """Raised when a persistent shell dies or its output does not follow the framing protocol."""
+
+
+class ShellSession:
+    """A long-lived shell process that runs commands written to its stdin.
+
+    Each command is evaluated in a subshell with stdin closed, so ``cd``, exported variables
+    or a command reading stdin cannot affect later commands. After the command, the shell
+    prints a random sentinel line (with the return code) on stdout and on stderr, which
+    delimits the output of that command.
+
+    :param argv: command that starts the shell, e.g. ``["bash"]`` or
+        ``["ssh", "host", "bash"]``.
+    """
+
+    def __init__(self, argv: list[str]):
+        self.argv = argv
+        self._process: subprocess.Popen | None = None
+        self._stdout: queue.Queue = queue.Queue()
+        self._stderr: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+
+    @property
+    def alive(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    @property
+    def exited(self) -> bool:
+        """True if the shell was started and has since terminated on its own."""
+        return self._process is not None and self._process.poll() is not None
+
+    def start(self) -> None:
+        self._stdout = queue.Queue()
+        self._stderr = queue.Queue()
+        self._process = subprocess.Popen(
+            self.argv,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        # Both pipes are drained continuously so a command filling stderr cannot block
+        # while we are waiting for its stdout sentinel.
+        for stream, lines in ((self._process.stdout, self._stdout), (self._process.stderr, self._stderr)):
+            threading.Thread(target=_pump_lines, args=(stream, lines), daemon=True).start()
+
+    def run(self, command: str, timeout: float | None = None) -> CommandResult:
+        """Run ``command`` in the session, starting the shell first if needed.
+
+        :raises CommandTimeoutError: if the command did not complete within ``timeout``
+            seconds; the shell is killed since its output stream is then out of sync, and
+            restarted by the next call.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            if not self.alive:
+                self.start()
+            sentinel = f"__slurmpilot_{uuid.uuid4().hex}__"
+            framed = (
+                f"( eval {shlex.quote(command)} ) </dev/null; "
+                f"printf '\\n{sentinel} %d\\n' $?; printf '\\n{sentinel}\\n' >&2\n"
+            )
+            try:
+                self._process.stdin.write(framed)
+                self._process.stdin.flush()
+            except OSError as e:
+                self.close()
+                raise ShellSessionError(f"Could not write to shell session: {e}") from e
+            try:
+                stdout, trailer = self._read_frame(self._stdout, sentinel, deadline)
+            except CommandTimeoutError as e:
+                raise CommandTimeoutError(command, timeout, e.stdout, self._drain(self._stderr)) from None
+            try:
+                stderr, _ = self._read_frame(self._stderr, sentinel, deadline)
+            except CommandTimeoutError as e:
+                raise CommandTimeoutError(command, timeout, stdout, e.stdout) from None
+            try:
+                return_code = int(trailer.split()[1])
+            except (IndexError, ValueError):
+                self.close()
+                raise ShellSessionError(f"Malformed sentinel line: {trailer!r}")
+            return CommandResult(command=command, stdout=stdout, stderr=stderr, return_code=return_code)
+
+    def close(self) -> None:
+        if self._process is None:
+            return
+        if self._process.poll() is None:
+            try:
+                self._process.stdin.close()
+                self._process.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                self._kill()
+        self._process = None
 
+    def _kill(self) -> None:
+        """Kill the shell and wait for it, so that no zombie ssh process is left behind."""
+        self._process.kill()
+        self._process.wait()
+        with contextlib.suppress(OSError):
+            self._process.stdin.close()
+        self._process = None
 
-class SSHExecution(RemoteExecution):
-    """Runs commands on a remote host via ssh subprocess; transfers files via rsync."""
+    def _read_frame(self, lines: queue.Queue, sentinel: str, deadline: float | None = None) -> tuple[str, str]:
+        """Collect lines up to the sentinel; returns ``(output, sentinel_line)``.
+
+        If ``deadline`` passes first, the shell is killed and a CommandTimeoutError carrying
+        the lines read so far in ``stdout`` is raised.
+        """
+        output = []
+        while True:
+            try:
+                if deadline is None:
+                    line = lines.get()
+                else:
+                    line = lines.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                self._kill()
+                raise CommandTimeoutError(sentinel, 0, "".join(output))
+            if line is None:
+                self.close()
+                raise ShellSessionError("Shell session exited before the command completed")
+            if line.startswith(sentinel):
+                # Drop the newline printed in front of the sentinel.
+                return "".join(output)[:-1], line
+            output.append(line)
 
-    def __init__(self, host: str, user: str | None = None):
+    @staticmethod
+    def _drain(lines: queue.Queue) -> str:
+        output = []
+        while True:
+            try:
+                line = lines.get_nowait()
+            except queue.Empty:
+                return "".join(output)
+            if line is not None:
+                output.append(line)
+
+
+def _pump_lines(stream, lines: queue.Queue) -> None:
+    for line in stream:
+        lines.put(line)
+    lines.put(None)
+
+
+class _SSHTarget:
+    """Connection settings of a remote host and the ssh/rsync argv built from them.
+
+    Shared by :class:`SSHExecution` and its asyncio counterpart.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        user: str | None = None,
+        multiplex: bool = False,
+        control_path: str = DEFAULT_CONTROL_PATH,
+        control_persist: str = "10m",
+        retry_policy: RetryPolicy | None = None,
+        timeout: float | None = None,
+        transfer_timeout: float | None = None,
+        transfer: str = "rsync",
+        transfer_settings: TransferSettings | None = None,
+        parallel_transfers: int = 1,
+    ):
+        """
+        :param host: hostname or ssh alias of the remote machine.
+        :param user: optional remote username.
+        :param multiplex: share one master connection between all ssh/rsync calls.
+        :param control_path: ssh ControlPath of the master socket, ssh tokens such as
+            ``%C`` are expanded by ssh itself.
+        :param control_persist: how long the master stays alive once idle, in ssh
+            ControlPersist syntax (e.g. ``"10m"``, ``"600"``, ``"yes"`` for forever).
+        :param retry_policy: backoff and budget used when ``run(..., retries=N)`` hits a
+            transport failure, defaults to ``RetryPolicy()``.
+        :param timeout: default timeout in seconds of commands, None to wait forever.
+        :param transfer_timeout: default timeout in seconds of uploads and downloads.
+        :param transfer: how folders are uploaded and downloaded, one of :data:`TRANSFERS`.
+        :param transfer_settings: compression, bandwidth cap and delta mode of transfers.
+        :param parallel_transfers: number of concurrent rsync processes of an upload or
+            download, each sending a shard of the files of similar total size. Tar
+            transfers always use a single stream.
+        """
+        if transfer not in TRANSFERS:
+            raise ValueError(f"Unknown transfer {transfer!r}, expected one of {TRANSFERS}")
         self.host = host
         self.user = user
+        self.multiplex = multiplex
+        self.control_path = control_path
+        self.control_persist = control_persist
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.timeout = timeout
+        self.transfer_timeout = transfer_timeout
+        self.transfer = transfer
+        self.transfer_settings = transfer_settings or TransferSettings()
+        self.parallel_transfers = parallel_transfers
+        self._retry_tokens = self.retry_policy.budget
+        self._retry_lock = threading.Lock()
 
     @property
     def _remote(self) -> str:
         return f"{self.user}@{self.host}" if self.user else self.host
 
-    def run(self, command: str, env: dict | None = None, retries: int = 0) -> CommandResult:
-        """
-        Run `command` on the remote host.
+    def _ssh_options(self) -> list[str]:
+        if not self.multiplex:
+            return []
+        # ssh refuses to create the socket if its directory is missing.
+        Path(self.control_path).expanduser().parent.mkdir(parents=True, exist_ok=True)
+        return [
+            "-o", "ControlMaster=auto",
+            "-o", f"ControlPath={self.control_path}",
+            "-o", f"ControlPersist={self.control_persist}",
+        ]
 
-        :param command: shell command string to execute remotely.
-        :param env: optional dict of environment variables prepended via `env KEY=val`.
-        :param retries: number of additional attempts on failure (0 = try once).
-        """
-        remote_command = command
-        if env:
-            env_prefix = " ".join(f"{k}={shlex.quote(str(v))}" for k, v in env.items())
-            remote_command = f"env {env_prefix} {command}"
+    def _ssh_command(self, *args: str) -> list[str]:
+        return ["ssh", *self._ssh_options(), self._remote, *args]
 
-        ssh_args = ["ssh", self._remote, remote_command]
+    def _timeout(self, timeout: float | None) -> float | None:
+        return self.timeout if timeout is None else timeout
 
-        for attempt in range(1 + retries):
-            result = subprocess.run(ssh_args, capture_output=True, text=True)
-            cmd_result = CommandResult(
-                command=command,
-                stdout=result.stdout.strip(),
-                stderr=result.stderr.strip(),
-                return_code=result.returncode,
+    def _transfer_timeout(self, timeout: float | None) -> float | None:
+        return self.transfer_timeout if timeout is None else timeout
+
+    def _retry_delay(self, result: CommandResult, attempt: int, retries: int) -> float | None:
+        """Seconds to wait before retrying ``result``, or None if it should be returned as is."""
+        with self._retry_lock:
+            if not result.failed:
+                if self._retry_tokens is not None:
+                    self._retry_tokens = min(self._retry_tokens + 1, self.retry_policy.budget)
+                return None
+            if attempt >= retries or not result.transport_failed:
+                return None
+            if self._retry_tokens is not None:
+                if self._retry_tokens <= 0:
+                    logger.warning(f"Retry budget for {self._remote} exhausted, not retrying: {result.command}")
+                    return None
+                self._retry_tokens -= 1
+        delay = self.retry_policy.delay(attempt)
+        logger.warning(
+            f"Could not reach {self._remote} (attempt {attempt + 1}/{1 + retries}), "
+            f"retrying in {delay:.1f}s: {result.command}"
+        )
+        return delay
+
+    def _rsync_command(self, *args: str, settings: TransferSettings | None = None) -> list[str]:
+        options = self._ssh_options()
+        rsh = ["-e", shlex.join(["ssh", *options])] if options else []
+        return ["rsync", *(settings or self.transfer_settings).rsync_options(), *rsh, *args]
+
+    def _rsync_upload_command(
+        self, local_path, remote_path, link_dest=None, files_from=None, settings: TransferSettings | None = None
+    ) -> list[str]:
+        """rsync argv uploading ``local_path`` into ``remote_path``, creating it if missing.
+
+        The destination is created by the remote side of rsync itself (``--rsync-path``
+        runs through the remote shell), which saves the separate ``ssh mkdir -p`` round
+        trip before every upload.
+
+        With ``link_dest`` or ``files_from``, the content of ``local_path`` is sent straight
+        into ``remote_path/local_path.name``. ``--link-dest`` then hard links the files that
+        are unchanged in the remote folder ``link_dest`` instead of transferring them, and
+        ``files_from`` (a file of NUL-separated paths relative to ``local_path``) restricts
+        the transfer to those files and saves rsync from scanning the folder. ``settings``
+        override the executor's ``transfer_settings``.
+        """
+        if link_dest is None and files_from is None:
+            return self._rsync_command(
+                f"--rsync-path=mkdir -p {shell_path(remote_path)} && rsync",
+                str(local_path),
+                f"{self._remote}:{remote_path}",
+                settings=settings,
             )
-            if not cmd_result.failed:
-                return cmd_result
-            if attempt < retries:
-                logger.warning(
-                    f"Command failed (attempt {attempt + 1}/{1 + retries}), retrying: {command}"
-                )
+        dest = Path(remote_path) / Path(local_path).name
+        options = []
+        if link_dest is not None:
+            options.append(f"--link-dest={_relative_link_dest(link_dest, dest)}")
+        if files_from is not None:
+            options += [f"--files-from={files_from}", "--from0"]
+        return self._rsync_command(
+            f"--rsync-path=mkdir -p {shell_path(dest)} && rsync",
+            *options,
+            f"{local_path}/",
+            f"{self._remote}:{dest}/",
+            settings=settings,
+        )
 
-        return cmd_result
+    def _rsync_download_command(self, remote_path, local_path, files_from=None) -> list[str]:
+        """rsync argv downloading ``remote_path`` into ``local_path``.
 
-    def upload_folder(self, local_path: Path, remote_path: Path) -> None:
+        With ``files_from``, only the listed paths (relative to ``remote_path``) are sent,
+        into ``local_path/remote_path.name``.
         """
-        Upload local_path to remote_path via rsync.
-        The folder will appear as remote_path/local_path.name/ on the remote host.
+        if files_from is None:
+            return self._rsync_command(f"{self._remote}:{remote_path}", str(local_path))
+        return self._rsync_command(
+            f"--files-from={files_from}", "--from0",
+            f"{self._remote}:{remote_path}/",
+            f"{Path(local_path) / Path(remote_path).name}/",
+        )
+
+    def _sharded(self) -> bool:
+        return self.parallel_transfers > 1 and self.transfer == "rsync"
+
+    def _tar_upload_command(
+        self, local_path, remote_path, files_from=None, settings: TransferSettings | None = None
+    ) -> list[str]:
+        """argv streaming ``local_path`` as a gzipped tar into ``remote_path`` over one ssh pipe.
+
+        :param files_from: optional file of NUL-separated paths relative to ``local_path``,
+            only those files are sent.
+        :param settings: overrides the executor's ``transfer_settings``.
         """
         local_path = Path(local_path)
-        subprocess.run(
-            ["ssh", self._remote, f"mkdir -p {str(remote_path)}"],
-            check=True,
+        settings = settings or self.transfer_settings
+        compress = settings.tar_compression()
+        if files_from is None:
+            remote = shell_path(remote_path)
+            tar = shlex.join(["tar", "-C", str(local_path.parent), *compress, "-cf", "-", local_path.name])
+        else:
+            remote = shell_path(Path(remote_path) / local_path.name)
+            tar = shlex.join(["tar", "-C", str(local_path), *compress, "-cf", "-", "--null", "-T", str(files_from)])
+        extract = " ".join(["tar", "-C", remote, *settings.tar_decompression(), "-xf", "-"])
+        ssh = shlex.join(self._ssh_command(f"mkdir -p {remote} && {extract}"))
+        return ["bash", "-c", f"set -o pipefail; {tar} | {ssh}"]
+
+    def _tar_download_command(self, remote_path, local_path) -> list[str]:
+        """argv streaming ``remote_path`` as a gzipped tar into ``local_path``, see _tar_upload_command."""
+        remote_path = Path(remote_path)
+        archive = shlex.join([*self.transfer_settings.tar_compression(), "-cf", "-", remote_path.name])
+        ssh = shlex.join(self._ssh_command(f"tar -C {shell_path(remote_path.parent)} {archive}"))
+        tar = shlex.join(["tar", "-C", str(local_path), *self.transfer_settings.tar_decompression(), "-xf", "-"])
+        return ["bash", "-c", f"set -o pipefail; {ssh} | {tar}"]
+
+
+def _counted_use(method):
+    """Count the calls of an :class:`SSHExecution` method in progress, see :attr:`SSHExecution.in_use`."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._use():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class SSHExecution(_SSHTarget, RemoteExecution):
+    """Runs commands on a remote host via ssh subprocess; transfers files via rsync or tar.
+
+    When ``multiplex`` is enabled, every ssh/rsync invocation goes through an OpenSSH
+    ControlMaster socket so that only the first call pays for the TCP handshake and
+    authentication; later calls reuse the master connection until it has been idle
+    for ``control_persist``.
+
+    When ``persistent_shell`` is enabled, :meth:`run` writes commands to one long-lived
+    remote ``bash`` (see :class:`ShellSession`) instead of starting a remote shell per
+    command, and falls back to one ssh process per command if the session breaks.
+    """
+
+    def __init__(self, host: str, user: str | None = None, persistent_shell: bool = False, **ssh_options):
+        """
+        :param host: hostname or ssh alias of the remote machine.
+        :param user: optional remote username.
+        :param persistent_shell: run commands through a single long-lived remote shell.
+        :param ssh_options: ``multiplex``, ``control_path``, ``control_persist``,
+            ``retry_policy``, ``timeout``, ``transfer_timeout``, ``transfer`` and
+            ``transfer_settings``, see :class:`_SSHTarget`.
+        """
+        super().__init__(host=host, user=user, **ssh_options)
+        self.persistent_shell = persistent_shell
+        self._session: ShellSession | None = None
+        self._users = 0
+        self._last_active = time.monotonic()
+        self._use_lock = threading.Lock()
+
+    @property
+    def in_use(self) -> bool:
+        """Whether a command or transfer is running on this connection, from any thread."""
+        return self._users > 0
+
+    @property
+    def last_active(self) -> float:
+        """``time.monotonic()`` when the last command or transfer on this connection finished."""
+        return self._last_active
+
+    @contextlib.contextmanager
+    def _use(self):
+        with self._use_lock:
+            self._users += 1
+        try:
+            yield
+        finally:
+            with self._use_lock:
+                self._users -= 1
+                self._last_active = time.monotonic()
+
+    def open_master(self) -> None:
+        """Start the multiplexed master connection in the background if it is not running."""
+        if not self.multiplex:
+            raise RuntimeError("open_master requires multiplex=True")
+        if self.master_alive():
+            return
+        result = subprocess.run(
+            ["ssh", *self._ssh_options(), "-f", "-N", self._remote],
             capture_output=True,
+            text=True,
         )
+        if result.returncode != 0:
+            raise RuntimeError(f"Could not open ssh master connection to {self._remote}:\n{result.stderr}")
+
+    def master_alive(self) -> bool:
+        """Return True if a master connection is currently listening on the control socket."""
+        if not self.multiplex:
+            return False
         result = subprocess.run(
-            ["rsync", "-az", str(local_path), f"{self._remote}:{remote_path}"],
+            ["ssh", *self._ssh_options(), "-O", "check", self._remote],
+            capture_output=True,
+            text=True,
+        )
+        return result.returncode == 0
+
+    @property
+    def span_cluster(self) -> str:
+        return self.host
+
+    def is_healthy(self) -> bool:
+        """Probe the connection with a no-op command; False if the transport failed or hung."""
+        if self._session is not None and self._session.exited:
+            return False
+        result = self.run("true", timeout=self.timeout or HEALTH_CHECK_TIMEOUT)
+        return result.return_code != SSH_TRANSPORT_ERROR and not result.timed_out
+
+    def close(self) -> None:
+        """Close the shell session and ask the master connection to exit, if any."""
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+        if not self.multiplex:
+            return
+        subprocess.run(
+            ["ssh", *self._ssh_options(), "-O", "exit", self._remote],
             capture_output=True,
             text=True,
         )
+
+    @_counted_use
+    @traced("run")
+    def run(
+        self, command: str, env: dict | None = None, retries: int = 0, timeout: float | None = None
+    ) -> CommandResult:
+        """
+        Run `command` on the remote host.
+
+        :param command: shell command string to execute remotely.
+        :param env: optional dict of environment variables prepended via `env KEY=val`.
+        :param retries: number of additional attempts when ssh cannot reach the host
+            (0 = try once); failures of the command itself are never retried. Waits
+            between attempts follow ``retry_policy``.
+        :param timeout: seconds after which ssh is killed and a result with ``timed_out``
+            set is returned, defaults to the executor's ``timeout``. Timed out commands
+            are not retried.
+        """
+        remote_command = _env_prefixed(command, env)
+        return self._retrying(lambda: self._execute(command, remote_command, self._timeout(timeout)), retries)
+
+    def _retrying(self, attempt_once: Callable[[], CommandResult], retries: int) -> CommandResult:
+        """Call ``attempt_once`` until it reaches the host or ``retries`` is used up, see :class:`RetryPolicy`."""
+        attempt = 0
+        while True:
+            cmd_result = attempt_once()
+            cmd_result.attempts = attempt + 1
+            delay = self._retry_delay(cmd_result, attempt, retries)
+            if delay is None:
+                return cmd_result
+            time.sleep(delay)
+            attempt += 1
+
+    @_counted_use
+    def run_many(
+        self, commands: list[str], env: dict | None = None, timeout: float | None = None, retries: int = 0
+    ) -> list[CommandResult]:
+        # Strip outputs the same way run() does.
+        return [
+            CommandResult(
+                command=r.command,
+                stdout=r.stdout.strip(),
+                stderr=r.stderr.strip(),
+                return_code=r.return_code,
+                timed_out=r.timed_out,
+            )
+            for r in super().run_many(commands, env=env, timeout=timeout, retries=retries)
+        ]
+
+    def stream(self, command: str, env: dict | None = None) -> Iterator[str]:
+        """Yield the stdout lines of ``command`` as they arrive, see :meth:`RemoteExecution.stream`.
+
+        The command always runs in its own ssh process, through the master connection when
+        multiplexing is enabled, so that it can be interrupted without disturbing the
+        persistent shell.
+        """
+        with self._use():
+            yield from _stream_process(self._ssh_command(_env_prefixed(command, env)))
+
+    def _run_script(self, script: str, timeout: float | None = None, retries: int = 0) -> CommandResult:
+        timeout = self._timeout(timeout)
+        return self._retrying(lambda: self._run_script_once(script, timeout), retries)
+
+    def _run_script_once(self, script: str, timeout: float | None) -> CommandResult:
+        if self.persistent_shell:
+            result = self._run_in_session(script, script, timeout)
+            if result is not None:
+                return result
+        # The script goes through stdin so its size is not bounded by the remote ARG_MAX.
+        try:
+            result = _run_process(self._ssh_command("sh -s"), input=script, timeout=timeout)
+        except CommandTimeoutError as e:
+            return _timed_out_result(script, e)
+        return CommandResult(
+            command=script,
+            stdout=result.stdout,
+            stderr=result.stderr,
+            return_code=result.returncode,
+        )
+
+    def _run_in_session(self, command: str, remote_command: str, timeout: float | None) -> CommandResult | None:
+        """Run ``remote_command`` in the persistent shell.
+
+        :return: None if the session broke, after which commands run with one ssh each; the
+            caller then runs the command that way.
+        """
+        if self._session is None:
+            self._session = ShellSession(self._ssh_command("bash"))
+        try:
+            result = self._session.run(remote_command, timeout=timeout)
+        except ShellSessionError as e:
+            logger.warning(f"Shell session to {self._remote} failed ({e}), falling back to one ssh per command.")
+            self._session.close()
+            self.persistent_shell = False
+            return None
+        except CommandTimeoutError as e:
+            return self._timed_out(command, timeout, e)
+        return CommandResult(
+            command=command,
+            stdout=result.stdout.strip(),
+            stderr=result.stderr.strip(),
+            return_code=result.return_code,
+        )
+
+    def _timed_out(self, command: str, timeout: float | None, error: CommandTimeoutError) -> CommandResult:
+        logger.warning(f"Command on {self._remote} timed out after {timeout}s: {command}")
+        result = _timed_out_result(command, error)
+        result.stdout, result.stderr = result.stdout.strip(), result.stderr.strip()
+        return result
+
+    def _execute(self, command: str, remote_command: str, timeout: float | None = None) -> CommandResult:
+        if self.persistent_shell:
+            result = self._run_in_session(command, remote_command, timeout)
+            if result is not None:
+                return result
+        try:
+            result = _run_process(self._ssh_command(remote_command), timeout=timeout)
+        except CommandTimeoutError as e:
+            return self._timed_out(command, timeout, e)
+        return CommandResult(
+            command=command,
+            stdout=result.stdout.strip(),
+            stderr=result.stderr.strip(),
+            return_code=result.returncode,
+        )
+
+    @_counted_use
+    @traced("upload", transferred=_uploaded_bytes)
+    def upload_folder(
+        self,
+        local_path: Path,
+        remote_path: Path,
+        timeout: float | None = None,
+        link_dest: Path | None = None,
+        files: list[str] | None = None,
+        progress: Callable[[int, int], None] | None = None,
+        settings: TransferSettings | None = None,
+    ) -> None:
+        """
+        Upload local_path to remote_path via rsync, or as a tar stream if ``transfer="tar"``.
+        The folder will appear as remote_path/local_path.name/ on the remote host.
+
+        :param timeout: defaults to the executor's ``transfer_timeout``.
+        :param link_dest: remote folder holding a previous upload of a similar folder, whose
+            unchanged files are hard linked instead of transferred. If the upload fails with
+            it (for instance because the folder was deleted), it is retried without. Ignored
+            by tar transfers, which always send the whole folder.
+        :param files: paths relative to local_path of the files to send, instead of the
+            whole folder.
+        :param progress: called with the bytes sent so far and the total each time one of
+            the ``parallel_transfers`` shards completes.
+        :param settings: transfer settings of this upload, defaults to the executor's
+            ``transfer_settings``.
+        :raises CommandTimeoutError: if the transfer did not finish in time.
+        """
+        local_path = Path(local_path)
+        timeout = self._transfer_timeout(timeout)
+        sizes = _local_sizes(local_path, files) if self._sharded() else {}
+        if sizes:
+            self._run_shards(
+                sizes, progress,
+                lambda files_from: self._upload_shard(
+                    local_path, remote_path, link_dest, files_from, timeout, settings
+                ),
+            )
+            return
+        with _file_list(files) as files_from:
+            if self.transfer == "tar":
+                args = self._tar_upload_command(local_path, remote_path, files_from, settings)
+                result = _run_process(args, timeout=timeout)
+                if result.returncode != 0:
+                    raise RuntimeError(f"tar upload failed:\n{result.stderr}")
+            else:
+                self._upload_shard(local_path, remote_path, link_dest, files_from, timeout, settings)
+        if progress is not None:
+            total = sum(_local_sizes(local_path, files).values())
+            progress(total, total)
+
+    def _upload_shard(self, local_path: Path, remote_path: Path, link_dest, files_from, timeout, settings=None) -> None:
+        args = self._rsync_upload_command(local_path, remote_path, link_dest, files_from, settings)
+        result = _run_process(args, timeout=timeout)
+        if result.returncode != 0 and link_dest is not None:
+            logger.warning(f"rsync upload against {link_dest} failed, retrying without it:\n{result.stderr}")
+            result = _run_process(
+                self._rsync_upload_command(local_path, remote_path, files_from=files_from, settings=settings),
+                timeout=timeout,
+            )
         if result.returncode != 0:
             raise RuntimeError(f"rsync upload failed:\n{result.stderr}")
 
-    def download_folder(self, remote_path: Path, local_path: Path) -> None:
+    def _run_shards(self, sizes: dict[str, int], progress, transfer: Callable[[str], None]) -> None:
+        """Run ``transfer(files_from)`` concurrently on balanced shards of the paths of ``sizes``."""
+        tracker = _Progress(sum(sizes.values()), progress)
+
+        def run_shard(shard: list[str]) -> int:
+            with _file_list(shard) as files_from:
+                transfer(files_from)
+            return sum(sizes[relative] for relative in shard)
+
+        shards = balanced_shards(sizes, self.parallel_transfers)
+        if not shards:
+            return
+        errors = []
+        with ThreadPoolExecutor(max_workers=len(shards)) as pool:
+            for future in as_completed([pool.submit(run_shard, shard) for shard in shards]):
+                try:
+                    tracker.add(future.result())
+                except Exception as e:
+                    errors.append(e)
+        if errors:
+            raise errors[0]
+
+    @_counted_use
+    @traced("download", transferred=_downloaded_bytes)
+    def download_folder(
+        self,
+        remote_path: Path,
+        local_path: Path,
+        timeout: float | None = None,
+        progress: Callable[[int, int], None] | None = None,
+    ) -> None:
         """
-        Download remote_path to local_path via rsync.
+        Download remote_path to local_path via rsync, or as a tar stream if ``transfer="tar"``.
         The folder will appear as local_path/remote_path.name/ locally.
+
+        With ``parallel_transfers`` above 1, the remote folder is listed first, then its
+        files are downloaded in balanced shards by concurrent rsync processes.
+
+        :param timeout: defaults to the executor's ``transfer_timeout``.
+        :param progress: see :meth:`upload_folder`, reported only by sharded downloads.
+        :raises CommandTimeoutError: if the transfer did not finish in time.
         """
         local_path = Path(local_path)
         local_path.mkdir(parents=True, exist_ok=True)
-        result = subprocess.run(
-            ["rsync", "-az", f"{self._remote}:{remote_path}", str(local_path)],
-            capture_output=True,
-            text=True,
-        )
+        timeout = self._transfer_timeout(timeout)
+        if self._sharded():
+            listing = self.run(_listing_command(remote_path), timeout=timeout)
+            if listing.failed:
+                raise RuntimeError(f"Could not list {remote_path}:\n{listing.stderr}")
+            (local_path / Path(remote_path).name).mkdir(exist_ok=True)
+            self._run_shards(
+                _parse_listing(listing.stdout), progress,
+                lambda files_from: self._download_shard(remote_path, local_path, files_from, timeout),
+            )
+            return
+        if self.transfer == "tar":
+            args = self._tar_download_command(remote_path, local_path)
+        else:
+            args = self._rsync_download_command(remote_path, local_path)
+        result = _run_process(args, timeout=timeout)
+        if result.returncode != 0:
+            raise RuntimeError(f"{self.transfer} download failed:\n{result.stderr}")
+
+    def _download_shard(self, remote_path: Path, local_path: Path, files_from: str, timeout) -> None:
+        result = _run_process(self._rsync_download_command(remote_path, local_path, files_from), timeout=timeout)
         if result.returncode != 0:
             raise RuntimeError(f"rsync download failed:\n{result.stderr}")
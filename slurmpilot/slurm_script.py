@@ -1,13 +1,36 @@
+"""
+Generation of the sbatch script of a job.
+
+The arguments of the tasks of a job array are written to ``python-args.txt``, one line
+per task, by :func:`write_python_args`. Finding the line of a task by reading the file
+from its start (e.g. with ``sed -n Np``) costs every task of a 100k-task array a scan of
+the file on a shared filesystem, so ``python-args.idx`` also stores the byte offset of
+each line, right-aligned in :data:`ARGS_INDEX_WIDTH` characters plus a newline. A task
+reads its offset at a known position of the index and its line at that offset, both with
+``tail -c +N`` which seeks instead of reading what comes before.
+
+With ``tasks_per_job``, each array task runs a block of entries instead, see
+:mod:`slurmpilot.task_bundles`.
+"""
 import io
+import textwrap
 from pathlib import Path
 
+from .array_chunks import ARRAY_OFFSET_VAR
 from .job_creation_info import JobCreationInfo
+from .task_bundles import ENTRIES_DIR, n_array_tasks
+
+ARGS_FILE = "python-args.txt"
+ARGS_INDEX = "python-args.idx"
+# Characters of each offset in ARGS_INDEX, enough for argument files up to 1 TB.
+ARGS_INDEX_WIDTH = 12
 
 
 def generate_slurm_script(
     job_info: JobCreationInfo,
     entrypoint_from_cwd: Path,
     job_run_dir: Path | None = None,
+    library_dirs: list[Path] | None = None,
 ) -> str:
     """Generate a bash script suitable for submission with sbatch.
 
@@ -18,11 +41,13 @@ def generate_slurm_script(
         host. Used to set PYTHONPATH in python mode so that shipped libraries
         are importable. Pass the remote path for SSH clusters, the local path
         for mock.
+    :param library_dirs: folders of the ``python_libraries`` on the execution host, when
+        they are not shipped inside the job directory (see :mod:`slurmpilot.library_cache`).
     """
     with io.StringIO() as f:
         f.write("#!/bin/bash\n")
         _write_preamble(f, job_info)
-        _write_body(f, job_info, entrypoint_from_cwd, job_run_dir)
+        _write_body(f, job_info, entrypoint_from_cwd, job_run_dir, library_dirs)
         f.seek(0)
         return f.read()
 
@@ -36,7 +61,7 @@ def _write_preamble(f: io.StringIO, job_info: JobCreationInfo) -> None:
     sbatch("--error=logs/stderr")
     sbatch(f"--cpus-per-task={job_info.n_cpus}")
     if isinstance(job_info.python_args, list):
-        n_tasks = len(job_info.python_args) - 1
+        n_tasks = n_array_tasks(len(job_info.python_args), job_info.tasks_per_job) - 1
         array_spec = f"0-{n_tasks}"
         if job_info.n_concurrent_jobs is not None:
             array_spec += f"%{job_info.n_concurrent_jobs}"
@@ -60,6 +85,7 @@ def _write_body(
     job_info: JobCreationInfo,
     entrypoint_from_cwd: Path,
     job_run_dir: Path | None,
+    library_dirs: list[Path] | None = None,
 ) -> None:
     if job_info.env:
         for key, value in job_info.env.items():
@@ -71,12 +97,19 @@ def _write_body(
     if job_info.python_binary:
         if job_run_dir is not None:
             pythonpath_entries = [str(job_run_dir)]
-            if job_info.python_libraries:
+            if library_dirs is not None:
+                pythonpath_entries.extend(str(path) for path in library_dirs)
+            elif job_info.python_libraries:
                 for lib in job_info.python_libraries:
                     pythonpath_entries.append(str(job_run_dir / Path(lib).name))
             f.write(f'export PYTHONPATH=$PYTHONPATH:{":".join(pythonpath_entries)}\n')
         if isinstance(job_info.python_args, list):
-            f.write('argument=$(sed -n "$(( SLURM_ARRAY_TASK_ID + 1 ))p" python-args.txt)\n')
+            # Arrays split into chunks get the index of their first task, see array_chunks.py.
+            f.write(f"task=$(( SLURM_ARRAY_TASK_ID + ${{{ARRAY_OFFSET_VAR}:-0}} ))\n")
+            if job_info.tasks_per_job is not None:
+                _write_entries(f, job_info, entrypoint_from_cwd)
+                return
+            f.write(_argument_lookup("task"))
             f.write(f"{job_info.python_binary} {entrypoint_from_cwd} $argument\n")
         else:
             args = _format_python_args(job_info.python_args)
@@ -85,6 +118,63 @@ def _write_body(
         f.write(f"bash {entrypoint_from_cwd}\n")
 
 
+def _write_entries(f: io.StringIO, job_info: JobCreationInfo, entrypoint_from_cwd: Path) -> None:
+    """Run the block of entries of array task ``$task``, each with its own logs and status file."""
+    n_entries = len(job_info.python_args)
+    f.write(f"mkdir -p {ENTRIES_DIR}\n")
+    f.write("run_entry() {\n")
+    f.write(textwrap.indent(_argument_lookup("$1"), "    "))
+    f.write(
+        f"    {job_info.python_binary} {entrypoint_from_cwd} $argument "
+        f"> {ENTRIES_DIR}/$1.stdout 2> {ENTRIES_DIR}/$1.stderr\n"
+    )
+    f.write(f"    echo $? > {ENTRIES_DIR}/$1.status\n")
+    f.write("}\n")
+    tasks_per_job = job_info.tasks_per_job
+    f.write(f"first=$(( task * {tasks_per_job} ))\n")
+    f.write(f"last=$(( first + {tasks_per_job} < {n_entries} ? first + {tasks_per_job} : {n_entries} ))\n")
+    f.write("for (( entry = first; entry < last; entry++ )); do\n")
+    if job_info.parallel_entries:
+        # Keep at most n_cpus entries running, starting the next one as soon as one finishes.
+        f.write(f"    while (( $(jobs -rp | wc -l) >= {job_info.n_cpus} )); do wait -n; done\n")
+        f.write("    run_entry $entry &\n")
+        f.write("done\n")
+        f.write("wait\n")
+    else:
+        f.write("    run_entry $entry\n")
+        f.write("done\n")
+    f.write("failed=0\n")
+    f.write("for (( entry = first; entry < last; entry++ )); do\n")
+    f.write(f'    [ "$(cat {ENTRIES_DIR}/$entry.status 2>/dev/null)" = 0 ] || failed=1\n')
+    f.write("done\n")
+    f.write("exit $failed\n")
+
+
+def write_python_args(job_dir: Path, python_args: list[str | dict]) -> list[Path]:
+    """Write the arguments of each array task to :data:`ARGS_FILE` and their offsets to :data:`ARGS_INDEX`.
+
+    :param python_args: arguments of each task, as strings or dicts of ``--key=value`` options.
+    :return: paths of the written files.
+    """
+    lines = bytearray()
+    index = bytearray()
+    for arg in python_args:
+        index += f"{len(lines):>{ARGS_INDEX_WIDTH}}\n".encode()
+        lines += (_format_python_args(arg) + "\n").encode()
+    paths = [Path(job_dir) / ARGS_FILE, Path(job_dir) / ARGS_INDEX]
+    paths[0].write_bytes(bytes(lines))
+    paths[1].write_bytes(bytes(index))
+    return paths
+
+
+def _argument_lookup(task: str) -> str:
+    """Bash lines setting ``$argument`` to the line of :data:`ARGS_FILE` of the task numbered ``$task``."""
+    return (
+        f'offset=$(tail -c +$(( {task} * {ARGS_INDEX_WIDTH + 1} + 1 )) {ARGS_INDEX} | head -c {ARGS_INDEX_WIDTH})\n'
+        f'argument=$(tail -c +$(( offset + 1 )) {ARGS_FILE} | head -n 1)\n'
+    )
+
+
 def _format_python_args(python_args: str | dict | None) -> str:
     if python_args is None:
         return ""
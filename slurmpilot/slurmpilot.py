@@ -1,23 +1,49 @@
+import asyncio
 import json
 import logging
 import re
 import shlex
-import shutil
+import threading
 import time
-from dataclasses import dataclass
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
 from typing import List
 
-from .config import Config, default_cluster_and_partition, load_config  # noqa: F401
+from .array_chunks import (
+    ARRAY_OFFSET_VAR,
+    LIMITS_COMMANDS,
+    QUEUED_JOBS_COMMAND,
+    ArrayChunk,
+    LimitsCache,
+    SlurmLimits,
+    chunks_to_submit,
+    parse_queue,
+    read_chunks,
+    split_array,
+    write_chunks,
+)
+from .async_remote_command import AsyncLocalExecution, AsyncRemoteExecution, AsyncSSHExecution
+from .config import ClusterConfig, Config, default_cluster_and_partition, load_config  # noqa: F401
+from .connection_pool import ConnectionPool, default_pool
+from .ignore import ignore_function, shipped_files
+from .instrumentation import SpanListener, describe_result, record_span
 from .job_creation_info import JobCreationInfo  # noqa: F401
-from .job_metadata import JobMetadata
+from .job_metadata import JobMetadata, UploadIndex, list_metadatas
 from .job_path import JobPath
+from .library_cache import LibraryCache, library_dir, library_key
+from .manifest import Manifest
 from .mock_slurm import MockSlurm
-from .remote_command import LocalExecution, RemoteExecution, SSHExecution
-from .slurm_script import generate_slurm_script
+from .remote_command import CommandResult, LocalExecution, RemoteExecution, RetryPolicy, TransferSettings
+from .slurm_script import generate_slurm_script, write_python_args
 from .slurmpilot_logging import SlurmPilotLogging
-from .util import unify  # noqa: F401
+from .snapshot import SnapshotIndex, snapshot
+from .source_cache import CachedUpload, HashCache, KnownBlobs, SourceCache
+from .task_bundles import ENTRIES_DIR, block_entries, n_array_tasks, parse_progress, progress_command, read_progress
+from .transfer_stats import TransferStats, transfer_settings
+from .util import folder_size, unify  # noqa: F401
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +53,10 @@ LOCAL_CLUSTER = "local"
 # sacct format used throughout — must match MockSlurm.SACCT_HEADER
 SACCT_FORMAT = "JobID,Elapsed,start,State,nodelist"
 
+# Upper bound on job ids per sacct/scancel command line; larger sets are split and sent
+# together with RemoteExecution.run_many.
+MAX_JOBIDS_PER_COMMAND = 500
+
 TERMINAL_STATES = frozenset({"COMPLETED", "FAILED", "CANCELLED", "TIMEOUT", "OUT_OF_MEMORY"})
 
 
@@ -53,6 +83,30 @@ class QueuePosition:
     top_priority: int | None
 
 
+@dataclass
+class ScheduledJobs:
+    """Outcome of :meth:`SlurmPilot.schedule_jobs`.
+
+    Attributes:
+        jobids: Slurm job id of each submitted job, by jobname.
+        errors: exception that stopped each job that was not submitted, by jobname.
+    """
+
+    jobids: dict[str, int] = field(default_factory=dict)
+    errors: dict[str, Exception] = field(default_factory=dict)
+
+
+@dataclass
+class _PreparedJob:
+    """A job whose local folder is ready to be uploaded and submitted."""
+
+    info: JobCreationInfo
+    local: JobPath
+    manifest: Manifest
+    # Key → folder of the libraries shipped through the library cache, see _cached_libraries.
+    libraries: dict[str, Path] | None
+
+
 def _parse_squeue_rows(output: str) -> list[dict]:
     """Parse pipe-delimited squeue output into a list of row dicts.
 
@@ -107,6 +161,25 @@ def _compute_queue_position(jobid: int, partition: str, rows: list[dict]) -> Que
     )
 
 
+class _Connections(dict):
+    """Cluster → executor mapping that asks ``factory`` for missing clusters.
+
+    SSH executors come from a :class:`ConnectionPool` and are looked up again on every
+    access so that the pool sees them as in use; other executors (and any executor set
+    explicitly, e.g. a test double) are stored.
+    """
+
+    def __init__(self, factory):
+        super().__init__()
+        self._factory = factory
+
+    def __missing__(self, cluster: str) -> RemoteExecution:
+        connection = self._factory(cluster)
+        if cluster == LOCAL_CLUSTER:
+            self[cluster] = connection
+        return connection
+
+
 class SlurmPilot:
     """Schedules and monitors Slurm jobs.
 
@@ -125,26 +198,33 @@ class SlurmPilot:
         self,
         config: Config | None = None,
         clusters: List[str] | None = None,
+        pool: ConnectionPool | None = None,
+        listeners: list[SpanListener] | None = None,
     ):
+        """
+        :param config: configuration, loaded from ``~/slurmpilot/config`` if not given.
+        :param clusters: clusters this instance talks to, defaults to ``["mock"]``.
+        :param pool: pool providing the ssh connections; defaults to the process-wide
+            pool so that warm connections are reused across SlurmPilot instances.
+        :param listeners: receive a timed :class:`~slurmpilot.instrumentation.Span` for
+            each step of an operation (copy, upload, sbatch, sacct, scancel, squeue,
+            download), see :mod:`slurmpilot.instrumentation`.
+        """
         self.config = config if config is not None else load_config()
         self.clusters = clusters or [MOCK_CLUSTER]
+        self.listeners: list[SpanListener] = list(listeners or [])
 
         self._log = SlurmPilotLogging()
         self._mock_slurms: dict[str, MockSlurm] = {
             c: MockSlurm() for c in self.clusters if c == MOCK_CLUSTER
         }
-        self._connections: dict[str, RemoteExecution] = {}
-        for cluster in self.clusters:
-            if cluster == MOCK_CLUSTER:
-                continue
-            elif cluster == LOCAL_CLUSTER:
-                self._connections[cluster] = LocalExecution()
-            else:
-                cfg = self.config.cluster_configs.get(cluster)
-                if cfg:
-                    self._connections[cluster] = SSHExecution(host=cfg.host, user=cfg.user)
-                else:
-                    self._connections[cluster] = SSHExecution(host=cluster)
+        self._pool = pool if pool is not None else default_pool()
+        # Connections are only created when a cluster is first used; see _Connections.
+        self._connections: dict[str, RemoteExecution] = _Connections(self._make_connection)
+        self._async_connections: dict[str, AsyncRemoteExecution] = {}
+        self._hash_cache: HashCache | None = None
+        self._hash_cache_lock = threading.Lock()
+        self._limits: dict[str, SlurmLimits] = {}
 
     def schedule_job(self, job_info: JobCreationInfo, dryrun: bool = False) -> int | None:
         """Prepare and submit a job.
@@ -157,6 +237,73 @@ class SlurmPilot:
         :param dryrun: if True, prepare all files but do not submit to Slurm.
         :return: Slurm job id, or None in dryrun mode.
         """
+        job = self._prepare(job_info)
+        if dryrun:
+            return None
+
+        self._log.start_job(job_info.jobname, job_info.cluster)
+        jobid = self._submit(job_info, job.local, job.manifest, job.libraries)
+        self._log.job_submitted(job_info.cluster, jobid)
+        self._log.job_tips(job_info.jobname)
+        return jobid
+
+    def schedule_jobs(
+        self, job_infos: list[JobCreationInfo], dryrun: bool = False, workers: int = 4
+    ) -> ScheduledJobs:
+        """Prepare and submit many jobs with one upload and one sbatch round trip per cluster.
+
+        The local folders of all jobs are prepared first, as by :meth:`schedule_job`, by
+        ``workers`` threads since copying sources is mostly waiting on the disk. The
+        jobs of each cluster are then uploaded in a single transfer and submitted by a
+        single :meth:`~slurmpilot.remote_command.RemoteExecution.run_many` of their sbatch
+        commands. A job failing at any step is reported in :attr:`ScheduledJobs.errors`
+        and the others are still submitted; only a failure of the shared upload fails
+        every job of that cluster.
+
+        Jobs uploaded together are not sent as deltas against previous uploads
+        (``link_dest``); with ``source_cache`` the files they share are still sent once.
+
+        :param job_infos: full job specifications, with distinct jobnames.
+        :param dryrun: if True, prepare all files but do not submit to Slurm.
+        :param workers: number of jobs prepared concurrently.
+        :raises ValueError: if two jobs have the same jobname, before any job is prepared.
+        """
+        jobnames = [job_info.jobname for job_info in job_infos]
+        duplicates = sorted({jobname for jobname in jobnames if jobnames.count(jobname) > 1})
+        if duplicates:
+            raise ValueError(f"Jobnames must be unique within a batch, got several {', '.join(duplicates)}.")
+        scheduled = ScheduledJobs()
+        groups: dict[tuple[str, Path], list[_PreparedJob]] = defaultdict(list)
+        with self._span("prepare", None, jobs=len(job_infos), workers=workers):
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+                # map keeps the order of job_infos whatever the order the preparations end in.
+                for job_info, job in zip(job_infos, pool.map(self._try_prepare, job_infos)):
+                    if isinstance(job, Exception):
+                        scheduled.errors[job_info.jobname] = job
+                    else:
+                        groups[job_info.cluster, self._remote_root(job_info)].append(job)
+        if not dryrun:
+            for (cluster, remote_root), jobs in groups.items():
+                try:
+                    jobs = self._upload_jobs(cluster, remote_root, jobs, scheduled.errors)
+                except Exception as e:
+                    scheduled.errors.update({job.info.jobname: e for job in jobs})
+                    continue
+                self._sbatch_jobs(cluster, remote_root, jobs, scheduled)
+                self._log.jobs_submitted(cluster, sum(job.info.jobname in scheduled.jobids for job in jobs), len(jobs))
+        # Report jobs in the order they were given, whichever cluster or step they ended at.
+        scheduled.jobids = {name: scheduled.jobids[name] for name in jobnames if name in scheduled.jobids}
+        scheduled.errors = {name: scheduled.errors[name] for name in jobnames if name in scheduled.errors}
+        return scheduled
+
+    def _try_prepare(self, job_info: JobCreationInfo) -> _PreparedJob | Exception:
+        try:
+            return self._prepare(job_info)
+        except Exception as e:
+            return e
+
+    def _prepare(self, job_info: JobCreationInfo) -> _PreparedJob:
+        """Write the local folder of a job: sources, libraries, arguments, script and metadata."""
         job_info.check_path()
 
         src_dir_name = Path(job_info.src_dir).resolve().name
@@ -166,31 +313,48 @@ class SlurmPilot:
             src_dir_name=src_dir_name,
         )
 
-        if local.job_dir.exists():
+        # Creating the folder claims the jobname atomically, also against concurrent preparations.
+        local.job_dir.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            local.job_dir.mkdir()
+        except FileExistsError:
             raise ValueError(
                 f"Job '{job_info.jobname}' already exists at {local.job_dir}. "
                 "Jobnames must be unique. Use unify(jobname) to append a unique suffix automatically."
+            ) from None
+
+        # Every file written to the job folder is recorded, see manifest.py.
+        manifest = Manifest(local.job_dir)
+        with self._span("copy", job_info.cluster, jobname=job_info.jobname) as span:
+            index = SnapshotIndex(self.config.local_slurmpilot_path() / "cache" / "snapshots.json")
+            mode = self.config.snapshot_mode
+            span.attributes["files"] = snapshot(
+                src=job_info.src_dir, dst=local.src, mode=mode, index=index,
+                ignore=_job_ignore(job_info.src_dir, job_info), manifest=manifest,
             )
-
-        shutil.copytree(src=job_info.src_dir, dst=local.src)
+            # With the library cache, libraries are shipped once to the cluster instead.
+            libraries = self._cached_libraries(job_info)
+            if job_info.python_libraries and libraries is None:
+                for lib in job_info.python_libraries:
+                    lib_path = Path(lib)
+                    snapshot(
+                        src=lib_path, dst=local.job_dir / lib_path.name, mode=mode, index=index,
+                        ignore=_job_ignore(lib_path, job_info), manifest=manifest,
+                    )
+            span.bytes_transferred = manifest.total_size
         if isinstance(job_info.python_args, list):
-            lines = []
-            for arg in job_info.python_args:
-                if isinstance(arg, dict):
-                    lines.append(" ".join(f"--{k}={v}" for k, v in arg.items()))
-                else:
-                    lines.append(arg)
-            (local.job_dir / "python-args.txt").write_text("\n".join(lines) + "\n")
-        if job_info.python_libraries:
-            for lib in job_info.python_libraries:
-                lib_path = Path(lib)
-                shutil.copytree(src=lib_path, dst=local.job_dir / lib_path.name)
+            for path in write_python_args(local.job_dir, job_info.python_args):
+                manifest.add(path)
 
         job_run_dir = self._job_run_dir(job_info.cluster, local, job_info)
         script = generate_slurm_script(
             job_info=job_info,
             entrypoint_from_cwd=local.entrypoint_from_cwd(job_info.entrypoint),
             job_run_dir=job_run_dir,
+            library_dirs=(
+                [library_dir(self._remote_root(job_info), key) for key in libraries]
+                if libraries is not None else None
+            ),
         )
         local.slurm_script.write_text(script)
         local.metadata.write_text(
@@ -199,18 +363,15 @@ class SlurmPilot:
                 cluster=job_info.cluster,
                 date=str(datetime.now()),
                 remote_path=job_info.remote_path,
+                src_dir=str(Path(job_info.src_dir).resolve()),
+                n_entries=len(job_info.python_args) if job_info.tasks_per_job is not None else None,
+                tasks_per_job=job_info.tasks_per_job,
             ).to_json()
         )
-
-        if dryrun:
-            return None
-
-        self._log.start_job(job_info.jobname, job_info.cluster)
-        jobid = self._submit(job_info, local)
-        local.jobid_file.write_text(json.dumps({"jobid": jobid}))
-        self._log.job_submitted(job_info.cluster, jobid)
-        self._log.job_tips(job_info.jobname)
-        return jobid
+        manifest.add(local.slurm_script)
+        manifest.add(local.metadata)
+        manifest.save()
+        return _PreparedJob(info=job_info, local=local, manifest=manifest, libraries=libraries)
 
     def status(self, jobnames: list[str]) -> list[str | None]:
         """Return the Slurm state for each jobname (RUNNING, COMPLETED, FAILED, …).
@@ -225,7 +386,8 @@ class SlurmPilot:
         For mock/local clusters the logs are read directly from the local job
         directory.  For SSH clusters the log folder is downloaded first.
 
-        :param index: task index for job arrays (not yet supported).
+        :param index: entry of ``python_args`` whose logs to return, for jobs using
+            ``tasks_per_job`` (not yet supported for other job arrays).
         :return: ``(stdout, stderr)``; empty strings if not yet written.
         """
         local = JobPath(jobname=jobname, root=self.config.local_slurmpilot_path())
@@ -234,14 +396,85 @@ class SlurmPilot:
         if cluster is not None and cluster not in (MOCK_CLUSTER, LOCAL_CLUSTER):
             self._download_logs(cluster, jobname, local)
 
-        stdout = local.stdout.read_text(errors="replace") if local.stdout.exists() else ""
-        stderr = local.stderr.read_text(errors="replace") if local.stderr.exists() else ""
+        stdout_path, stderr_path = local.stdout, local.stderr
+        meta = self._read_metadata(jobname)
+        if index is not None and meta is not None and meta.tasks_per_job is not None:
+            stdout_path = local.job_dir / ENTRIES_DIR / f"{index}.stdout"
+            stderr_path = local.job_dir / ENTRIES_DIR / f"{index}.stderr"
+        stdout = stdout_path.read_text(errors="replace") if stdout_path.exists() else ""
+        stderr = stderr_path.read_text(errors="replace") if stderr_path.exists() else ""
         return stdout, stderr
 
     # ------------------------------------------------------------------
     # Internal helpers
     # ------------------------------------------------------------------
 
+    def _span(self, operation: str, cluster: str | None, **attributes):
+        """Context manager timing a step of an operation, see :func:`record_span`."""
+        return record_span(self.listeners, operation, cluster, **attributes)
+
+    def _cluster_config(self, cluster: str) -> ClusterConfig:
+        # A cluster without config is used directly as the ssh hostname.
+        return self.config.cluster_configs.get(cluster) or ClusterConfig(host=cluster)
+
+    def _make_connection(self, cluster: str) -> RemoteExecution:
+        if cluster == LOCAL_CLUSTER:
+            return LocalExecution()
+        cfg = self._cluster_config(cluster)
+        return self._pool.get(
+            host=cfg.host,
+            user=cfg.user,
+            multiplex=cfg.ssh_multiplexing,
+            control_persist=cfg.ssh_control_persist,
+            persistent_shell=cfg.ssh_persistent_shell,
+            retry_policy=RetryPolicy(max_delay=cfg.retry_max_delay),
+            timeout=cfg.command_timeout,
+            transfer_timeout=cfg.transfer_timeout,
+            transfer=cfg.transfer,
+            # Only the configured settings: they key the pool, ``compress: auto`` is resolved per upload.
+            transfer_settings=transfer_settings(cfg),
+            parallel_transfers=cfg.parallel_transfers,
+        )
+
+    def _async_connection(self, cluster: str) -> AsyncRemoteExecution:
+        """Asyncio executor for ``cluster``, created on first use."""
+        if cluster not in self._async_connections:
+            if cluster == LOCAL_CLUSTER:
+                self._async_connections[cluster] = AsyncLocalExecution()
+            else:
+                cfg = self._cluster_config(cluster)
+                self._async_connections[cluster] = AsyncSSHExecution(
+                    host=cfg.host,
+                    user=cfg.user,
+                    multiplex=cfg.ssh_multiplexing,
+                    control_persist=cfg.ssh_control_persist,
+                    retry_policy=RetryPolicy(max_delay=cfg.retry_max_delay),
+                    timeout=cfg.command_timeout,
+                    transfer_timeout=cfg.transfer_timeout,
+                    transfer=cfg.transfer,
+                    transfer_settings=self._transfer_settings(cluster),
+                    parallel_transfers=cfg.parallel_transfers,
+                )
+        return self._async_connections[cluster]
+
+    def _retries(self, cluster: str) -> int:
+        """Retries of read-only commands on ``cluster`` when ssh cannot reach it, see ``ClusterConfig.retries``."""
+        return self._cluster_config(cluster).retries
+
+    def _transfer_settings(self, cluster: str):
+        return transfer_settings(self._cluster_config(cluster), self.transfer_stats().throughput(cluster))
+
+    def _upload_settings(self, cluster: str) -> TransferSettings | None:
+        """Settings of the next upload to ``cluster``, None to use those of its connection."""
+        if self._cluster_config(cluster).compress != "auto":
+            return None
+        # Follow the throughput measured on the previous uploads.
+        return self._transfer_settings(cluster)
+
+    def transfer_stats(self) -> TransferStats:
+        """Throughput measured on past uploads, see :mod:`slurmpilot.transfer_stats`."""
+        return TransferStats(self.config.local_slurmpilot_path() / "cache" / "transfers.json")
+
     def _remote_root(self, job_info: JobCreationInfo) -> Path:
         """Remote slurmpilot root for this job (job_info.remote_path overrides cluster config)."""
         if job_info.remote_path:
@@ -258,14 +491,24 @@ class SlurmPilot:
             root=root,
         ).job_dir
 
-    def _submit(self, job_info: JobCreationInfo, local: JobPath) -> int:
+    def _submit(
+        self,
+        job_info: JobCreationInfo,
+        local: JobPath,
+        manifest: Manifest | None = None,
+        libraries: dict[str, Path] | None = None,
+    ) -> int:
+        """Upload the job folder if needed, call sbatch and write ``jobid.json``; return the job id."""
         cluster = job_info.cluster
         if cluster == MOCK_CLUSTER:
-            return self._mock_slurms[cluster].sbatch(
-                script_path=local.slurm_script,
-                cwd=local.job_dir,
-                env=job_info.env or None,
-            )
+            with self._span("sbatch", cluster, jobname=job_info.jobname):
+                jobid = self._mock_slurms[cluster].sbatch(
+                    script_path=local.slurm_script,
+                    cwd=local.job_dir,
+                    env=job_info.env or None,
+                )
+            local.jobid_file.write_text(json.dumps({"jobid": jobid}))
+            return jobid
         connection = self._connections[cluster]
         if cluster == LOCAL_CLUSTER:
             job_dir = local.job_dir
@@ -275,30 +518,407 @@ class SlurmPilot:
                 jobname=job_info.jobname,
                 root=self._remote_root(job_info),
             )
+            if manifest is None:
+                manifest = Manifest.load(local.job_dir)
+            files = manifest.paths() if manifest is not None else None
             self._log.connecting(cluster)
-            self._log.send_data(local.job_dir, cluster, remote.job_dir)
-            connection.upload_folder(local.job_dir, remote.job_dir.parent)
+            self._log.send_data(
+                local.job_dir, cluster, remote.job_dir, size_bytes=manifest.total_size if manifest else None
+            )
+            cfg = self._cluster_config(cluster)
+            if libraries:
+                self._ensure_libraries(connection, cluster, self._remote_root(job_info), [(job_info, libraries)])
+            settings = self._upload_settings(cluster)
+            # Bytes actually sent, when known, to measure the throughput of the link.
+            sent = manifest.total_size if manifest is not None else None
+            with self._span("upload", cluster, jobname=job_info.jobname) as span:
+                if cfg.source_cache:
+                    cache = self._source_cache(cluster, connection, self._remote_root(job_info), settings)
+                    upload = cache.upload_folder(
+                        local.job_dir, remote.job_dir.parent, originals=_copied_folders(job_info), files=files
+                    )
+                    span.bytes_transferred = sent = upload.uploaded_bytes
+                    span.attributes["uploaded_blobs"] = upload.uploaded_blobs
+                elif cfg.link_dest and cfg.transfer == "rsync":
+                    # Upload as a delta against the previous job shipped from the same src_dir.
+                    uploads = UploadIndex(self.config.local_slurmpilot_path() / "cache" / "uploads.json")
+                    remote_root = self._remote_root(job_info)
+                    link_dest = uploads.latest(cluster, remote_root, job_info.src_dir)
+                    span.attributes["link_dest"] = str(link_dest) if link_dest else None
+                    connection.upload_folder(
+                        local.job_dir, remote.job_dir.parent, link_dest=link_dest, files=files, settings=settings
+                    )
+                    uploads.record(cluster, remote_root, job_info.src_dir, remote.job_dir)
+                    span.bytes_transferred = sent
+                    if link_dest is not None:
+                        sent = None
+                else:
+                    connection.upload_folder(local.job_dir, remote.job_dir.parent, files=files, settings=settings)
+                    span.bytes_transferred = sent
+            if sent is not None:
+                self._record_throughput(cluster, connection, sent, span.duration, settings)
+            if cfg.verify_upload and manifest is not None:
+                self._verify_upload(connection, cluster, manifest, remote.job_dir)
             job_dir = remote.job_dir
-        return _call_sbatch(connection, job_dir, job_info.jobname, job_info.env)
+        chunks = self._array_chunks(job_info, connection)
+        if chunks is not None:
+            return self._submit_chunks(connection, job_info, job_dir, local, chunks)
+        with self._span("sbatch", cluster, jobname=job_info.jobname) as span:
+            jobid = _call_sbatch(connection, job_dir, job_info.jobname, job_info.env)
+            span.return_code = 0
+        local.jobid_file.write_text(json.dumps({"jobid": jobid}))
+        return jobid
 
-    def _single_status(self, jobname: str) -> str | None:
-        jobid = self._read_jobid(jobname)
-        if jobid is None:
+    def _slurm_limits(self, cluster: str, connection: RemoteExecution) -> SlurmLimits:
+        """Limits of ``cluster`` on job arrays, from its config or else read from the cluster,
+        see :class:`LimitsCache`."""
+        if cluster not in self._limits:
+            cfg = self._cluster_config(cluster)
+            limits = SlurmLimits(max_array_size=cfg.max_array_size, max_submit_jobs=cfg.max_submit_jobs)
+            if limits.max_array_size is None or limits.max_submit_jobs is None:
+                cache = LimitsCache(self.config.local_slurmpilot_path() / "cache" / "limits.json")
+                discovered = cache.get(cluster)
+                if discovered is None:
+                    with self._span("limits", cluster) as span:
+                        results = connection.run_many(LIMITS_COMMANDS, retries=self._retries(cluster))
+                        describe_result(span, results)
+                    discovered = SlurmLimits.parse(results)
+                    if not any(result.transport_failed for result in results):
+                        cache.put(cluster, discovered)
+                if limits.max_array_size is None:
+                    limits.max_array_size = discovered.max_array_size
+                if limits.max_submit_jobs is None:
+                    limits.max_submit_jobs = discovered.max_submit_jobs
+            self._limits[cluster] = limits
+        return self._limits[cluster]
+
+    def _array_chunks(self, job_info: JobCreationInfo, connection: RemoteExecution) -> list[ArrayChunk] | None:
+        """Chunks of the job array of ``job_info`` when it exceeds the limits of its cluster, else None."""
+        if job_info.cluster == MOCK_CLUSTER or not isinstance(job_info.python_args, list):
+            return None
+        n_tasks = n_array_tasks(len(job_info.python_args), job_info.tasks_per_job)
+        chunks = split_array(n_tasks, self._slurm_limits(job_info.cluster, connection))
+        return chunks if len(chunks) > 1 else None
+
+    def _submit_chunks(
+        self,
+        connection: RemoteExecution,
+        job_info: JobCreationInfo,
+        job_dir: Path,
+        local: JobPath,
+        chunks: list[ArrayChunk],
+    ) -> int:
+        """Submit the chunks of a job array that fit in the queue, see :mod:`slurmpilot.array_chunks`.
+
+        :return: job id of the first chunk.
+        :raises RuntimeError: if the first chunk could not be submitted.
+        """
+        throttle = f"%{job_info.n_concurrent_jobs}" if job_info.n_concurrent_jobs is not None else ""
+        for chunk in chunks:
+            env = {**(job_info.env or {}), ARRAY_OFFSET_VAR: chunk.offset}
+            chunk.command = _sbatch_command(
+                job_dir, job_info.jobname, env, array=f"0-{chunk.size - 1}{throttle}"
+            )
+            chunk.throttle = job_info.n_concurrent_jobs
+        self._submit_pending_chunks(job_info.cluster, connection, job_info.jobname, chunks)
+        write_chunks(local.jobid_file, chunks)
+        return chunks[0].jobid
+
+    def _submit_pending_chunks(
+        self, cluster: str, connection: RemoteExecution, jobname: str, chunks: list[ArrayChunk]
+    ) -> None:
+        """Submit the pending ``chunks`` that fit under MaxSubmitJobs and set their job id.
+
+        Throttled chunks are submitted one at a time, see :mod:`slurmpilot.array_chunks`.
+        """
+        limits = self._slurm_limits(cluster, connection)
+        queued, live = None, None
+        if limits.max_submit_jobs is not None or chunks[0].throttle is not None:
+            [result] = connection.run_many([QUEUED_JOBS_COMMAND], retries=self._retries(cluster))
+            if result.failed:
+                # When the queue cannot be read, assume it is full: only a first chunk is sent.
+                queued = limits.max_submit_jobs
+            else:
+                queued, live = parse_queue(result.stdout)
+        ready = chunks_to_submit(chunks, queued, limits.max_submit_jobs, live)
+        if not ready:
+            return
+        with self._span("sbatch", cluster, jobname=jobname, chunks=len(ready)) as span:
+            results = connection.run_many([chunk.command for chunk in ready])
+            describe_result(span, results)
+        for chunk, result in zip(ready, results):
+            try:
+                chunk.jobid = _parse_sbatch_result(result)
+            except RuntimeError as e:
+                if chunk is chunks[0]:
+                    raise
+                logger.warning(f"Could not submit tasks from {chunk.offset} of {jobname}, will retry: {e}")
+
+    def _upload_jobs(
+        self, cluster: str, remote_root: Path, jobs: list[_PreparedJob], errors: dict[str, Exception]
+    ) -> list[_PreparedJob]:
+        """Upload the folders of ``jobs`` to ``cluster`` in one transfer, see :meth:`schedule_jobs`.
+
+        :param errors: receives the exception of each job that could not be uploaded.
+        :return: the jobs ready to be submitted.
+        """
+        if cluster in (MOCK_CLUSTER, LOCAL_CLUSTER):
+            return jobs
+        connection = self._connections[cluster]
+        cfg = self._cluster_config(cluster)
+        ready = jobs
+        # The libraries of every job are referenced and uploaded together.
+        with_libraries = [job for job in jobs if job.libraries]
+        if with_libraries:
+            try:
+                self._ensure_libraries(
+                    connection, cluster, remote_root, [(job.info, job.libraries) for job in with_libraries]
+                )
+            except Exception as e:
+                for job in with_libraries:
+                    errors[job.info.jobname] = e
+                ready = [job for job in jobs if not job.libraries]
+        if not ready:
+            return []
+        remote_dirs = [JobPath(jobname=job.info.jobname, root=remote_root).job_dir for job in ready]
+        jobs_dir = self.config.local_slurmpilot_path() / "jobs"
+        sent = sum(job.manifest.total_size for job in ready)
+        self._log.connecting(cluster)
+        self._log.send_data(jobs_dir, cluster, remote_root / "jobs", size_bytes=sent)
+        settings = self._upload_settings(cluster)
+        with self._span("upload", cluster, jobs=len(ready)) as span:
+            if cfg.source_cache:
+                upload = self._source_cache(cluster, connection, remote_root, settings).upload_folders([
+                    (job.local.job_dir, remote_dir.parent, _copied_folders(job.info), job.manifest.paths())
+                    for job, remote_dir in zip(ready, remote_dirs)
+                ])
+                span.bytes_transferred = sent = upload.uploaded_bytes
+                span.attributes["uploaded_blobs"] = upload.uploaded_blobs
+            else:
+                # One transfer of jobs/ restricted to the files of the batch.
+                files = [
+                    f"{job.local.job_dir.relative_to(jobs_dir).as_posix()}/{path}"
+                    for job in ready for path in job.manifest.paths()
+                ]
+                connection.upload_folder(jobs_dir, remote_root, files=files, settings=settings)
+                span.bytes_transferred = sent
+        self._record_throughput(cluster, connection, sent, span.duration, settings)
+        if not cfg.verify_upload:
+            return ready
+        with self._span("verify", cluster, jobs=len(ready)):
+            results = connection.run_many(
+                [Manifest.verify_command(remote_dir) for remote_dir in remote_dirs], retries=self._retries(cluster)
+            )
+        verified = []
+        for job, remote_dir, result in zip(ready, remote_dirs, results):
+            try:
+                _check_upload(cluster, job.manifest, remote_dir, result)
+            except RuntimeError as e:
+                errors[job.info.jobname] = e
+                continue
+            verified.append(job)
+        return verified
+
+    def _sbatch_jobs(self, cluster: str, remote_root: Path, jobs: list[_PreparedJob], scheduled: ScheduledJobs) -> None:
+        """Submit the uploaded ``jobs`` in one round trip and record their job ids, see :meth:`schedule_jobs`."""
+        if not jobs:
+            return
+        if cluster == MOCK_CLUSTER:
+            for job in jobs:
+                try:
+                    scheduled.jobids[job.info.jobname] = self._submit(job.info, job.local)
+                except Exception as e:
+                    scheduled.errors[job.info.jobname] = e
+            return
+        connection = self._connections[cluster]
+        job_dirs = {
+            job.info.jobname: job.local.job_dir if cluster == LOCAL_CLUSTER
+            else JobPath(jobname=job.info.jobname, root=remote_root).job_dir
+            for job in jobs
+        }
+        batched = []
+        for job in jobs:
+            # Arrays above the limits of the cluster are submitted in chunks, each with its own sbatch.
+            chunks = self._array_chunks(job.info, connection)
+            if chunks is None:
+                batched.append(job)
+                continue
+            try:
+                scheduled.jobids[job.info.jobname] = self._submit_chunks(
+                    connection, job.info, job_dirs[job.info.jobname], job.local, chunks
+                )
+            except Exception as e:
+                scheduled.errors[job.info.jobname] = e
+        if not batched:
+            return
+        with self._span("sbatch", cluster, jobs=len(batched)) as span:
+            results = connection.run_many([
+                _sbatch_command(job_dirs[job.info.jobname], job.info.jobname, job.info.env) for job in batched
+            ])
+            span.attributes["failed"] = sum(result.failed for result in results)
+        for job, result in zip(batched, results):
+            try:
+                scheduled.jobids[job.info.jobname] = _parse_sbatch_result(result)
+            except RuntimeError as e:
+                scheduled.errors[job.info.jobname] = e
+                continue
+            job.local.jobid_file.write_text(json.dumps({"jobid": scheduled.jobids[job.info.jobname]}))
+
+    def _ensure_libraries(
+        self,
+        connection: RemoteExecution,
+        cluster: str,
+        remote_root: Path,
+        jobs: list[tuple[JobCreationInfo, dict[str, Path]]],
+    ) -> None:
+        """Reference the cached libraries of ``jobs`` and upload the missing ones, see
+        :meth:`LibraryCache.ensure_many`."""
+        ignores = {key: _job_ignore(path, info) for info, libraries in jobs for key, path in libraries.items()}
+        with self._span("libraries", cluster, jobs=len(jobs)) as span:
+            uploaded = LibraryCache(connection, remote_root).ensure_many(
+                {info.jobname: libraries for info, libraries in jobs},
+                snapshot_mode=self.config.snapshot_mode, ignores=ignores,
+            )
+            span.attributes["uploaded"] = len(uploaded)
+
+    def _record_throughput(
+        self, cluster: str, connection: RemoteExecution, sent: int, seconds: float,
+        settings: TransferSettings | None = None,
+    ) -> None:
+        settings = settings or getattr(connection, "transfer_settings", None)
+        compressed = settings.compress if settings is not None else True
+        self.transfer_stats().record(cluster, sent, seconds, compressed=compressed)
+
+    def _verify_upload(self, connection: RemoteExecution, cluster: str, manifest: Manifest, remote_dir: Path) -> None:
+        """Check in one command that every file of ``manifest`` arrived with the right size."""
+        with self._span("verify", cluster, files=len(manifest.entries)) as span:
+            result = connection.run(Manifest.verify_command(remote_dir), retries=self._retries(cluster))
+            span.return_code = result.return_code
+            _check_upload(cluster, manifest, remote_dir, result)
+
+    def _source_cache(
+        self, cluster: str, connection: RemoteExecution, remote_root: Path, settings: TransferSettings | None = None
+    ) -> SourceCache:
+        known = KnownBlobs(self.config.local_slurmpilot_path() / "cache" / "blobs" / f"{cluster}.json", remote_root)
+        return SourceCache(connection, remote_root, self._hashes(), known=known, settings=settings)
+
+    def stage_sources(
+        self,
+        cluster: str,
+        src_dir: str | Path,
+        exclude: list[str] | None = None,
+        use_gitignore: bool = False,
+        ship_git: bool = False,
+    ) -> CachedUpload:
+        """Upload the files of ``src_dir`` the blob store of ``cluster`` lacks, ahead of submission.
+
+        Jobs later submitted from ``src_dir`` then only upload their generated files, see
+        :mod:`slurmpilot.watch` for keeping the staged files up to date while editing.
+
+        :param exclude: extra gitignore-style patterns, as in :attr:`JobCreationInfo.exclude`.
+        :param use_gitignore: as in :attr:`JobCreationInfo.use_gitignore`.
+        :param ship_git: as in :attr:`JobCreationInfo.ship_git`.
+        """
+        if cluster in (MOCK_CLUSTER, LOCAL_CLUSTER):
+            raise ValueError(f"Cluster '{cluster}' runs jobs locally, there is nothing to stage.")
+        if not self._cluster_config(cluster).source_cache:
+            raise ValueError(f"Staging sources requires 'source_cache: true' in the config of cluster '{cluster}'.")
+        src_dir = Path(src_dir)
+        files = shipped_files(src_dir, ignore_function(src_dir, exclude, use_gitignore, ship_git))
+        cache = self._source_cache(cluster, self._connections[cluster], self.config.remote_slurmpilot_path(cluster))
+        with self._span("stage", cluster, files=len(files)) as span:
+            upload = cache.stage(src_dir, files=files)
+            span.bytes_transferred = upload.uploaded_bytes
+            span.attributes["uploaded_blobs"] = upload.uploaded_blobs
+        return upload
+
+    def _hashes(self) -> HashCache:
+        with self._hash_cache_lock:
+            if self._hash_cache is None:
+                self._hash_cache = HashCache(self.config.local_slurmpilot_path() / "cache" / "hashes.json")
+            return self._hash_cache
+
+    def _cached_libraries(self, job_info: JobCreationInfo) -> dict[str, Path] | None:
+        """Map the key of each library of the job in the library cache to its folder, or None
+        when the libraries are copied into the job folder instead."""
+        if job_info.cluster in (MOCK_CLUSTER, LOCAL_CLUSTER) or not job_info.python_libraries:
             return None
+        if not self._cluster_config(job_info.cluster).library_cache:
+            return None
+        hashes = self._hashes()
+        libraries = {
+            library_key(Path(lib), hashes, _job_ignore(Path(lib), job_info)): Path(lib)
+            for lib in job_info.python_libraries
+        }
+        hashes.save()
+        return libraries
+
+    def gc_libraries(self, cluster: str, max_age_days: float = 30.0, dryrun: bool = False) -> list[str]:
+        """Remove the versions of the library cache of ``cluster`` that no job uses anymore.
+
+        See :meth:`slurmpilot.library_cache.LibraryCache.gc`.
+
+        :return: keys of the removed versions.
+        """
+        if cluster in (MOCK_CLUSTER, LOCAL_CLUSTER):
+            return []
+        cache = LibraryCache(self._connections[cluster], self.config.remote_slurmpilot_path(cluster))
+        with self._span("gc_libraries", cluster) as span:
+            removed = cache.gc(max_age_days=max_age_days, dryrun=dryrun)
+            span.attributes["removed"] = len(removed)
+        return removed
+
+    def _single_status(self, jobname: str) -> str | None:
         cluster = self._read_cluster(jobname)
         if cluster is None:
             return None
+        chunks = self._advance_chunks(jobname, cluster)
+        jobids = [jobid for jobid, _ in self._job_ids(jobname)]
+        if not jobids:
+            return None
         if cluster == MOCK_CLUSTER:
-            sacct_out = self._mock_slurms[cluster].sacct([jobid])
+            sacct_out = self._mock_slurms[cluster].sacct(jobids)
         else:
-            result = self._connections[cluster].run(
-                f'sacct --format="{SACCT_FORMAT}" -X -p --jobs={jobid}'
-            )
+            with self._span("sacct", cluster, jobs=len(jobids)) as span:
+                result = self._connections[cluster].run(
+                    f'sacct --format="{SACCT_FORMAT}" -X -p --jobs={",".join(map(str, jobids))}',
+                    retries=self._retries(cluster),
+                )
+                describe_result(span, result)
             if result.failed:
                 logger.warning(f"sacct failed for {jobname}: {result.stderr}")
                 return None
             sacct_out = result.stdout
-        return _parse_sacct_state(sacct_out, jobid)
+        return _parse_job_state(sacct_out, jobids, pending=chunks is not None and any(c.pending for c in chunks))
+
+    def _advance_chunks(self, jobname: str, cluster: str) -> list[ArrayChunk] | None:
+        """Submit the chunks of ``jobname`` that now fit in the queue; return its chunks, None if it has none."""
+        jobid_file = JobPath(jobname=jobname, root=self.config.local_slurmpilot_path()).jobid_file
+        chunks = read_chunks(jobid_file)
+        if chunks is None or cluster == MOCK_CLUSTER or not any(chunk.pending for chunk in chunks):
+            return chunks
+        self._submit_pending_chunks(cluster, self._connections[cluster], jobname, chunks)
+        write_chunks(jobid_file, chunks)
+        return chunks
+
+    def _advance_all_chunks(self, jobnames: list[str]) -> dict[str, list[ArrayChunk] | None]:
+        """:meth:`_advance_chunks` for each job of ``jobnames`` with metadata, one job after the other."""
+        chunks = {}
+        for jobname in jobnames:
+            cluster = self._read_cluster(jobname)
+            if cluster is not None:
+                chunks[jobname] = self._advance_chunks(jobname, cluster)
+        return chunks
+
+    def _cancel_pending_chunks(self, jobname: str) -> None:
+        """Mark the chunks of ``jobname`` not submitted yet as cancelled, so that they never are."""
+        jobid_file = JobPath(jobname=jobname, root=self.config.local_slurmpilot_path()).jobid_file
+        chunks = read_chunks(jobid_file)
+        if chunks is None or not any(chunk.pending for chunk in chunks):
+            return
+        for chunk in chunks:
+            chunk.cancelled = chunk.cancelled or chunk.jobid is None
+        write_chunks(jobid_file, chunks)
 
     def _download_logs(self, cluster: str, jobname: str, local: JobPath) -> None:
         remote = JobPath(
@@ -306,7 +926,10 @@ class SlurmPilot:
             root=self._remote_root_for_job(jobname, cluster),
         )
         try:
-            self._connections[cluster].download_folder(remote.log_dir, local.log_dir.parent)
+            with self._span("download", cluster, jobname=jobname) as span:
+                self._connections[cluster].download_folder(remote.log_dir, local.log_dir.parent)
+                if self.listeners:
+                    span.bytes_transferred = folder_size(local.log_dir)
         except Exception as e:
             logger.warning(f"Could not download logs for {jobname}: {e}")
 
@@ -316,6 +939,17 @@ class SlurmPilot:
             return None
         return json.loads(f.read_text())["jobid"]
 
+    def _job_ids(self, jobname: str) -> list[tuple[int, int]]:
+        """Slurm job id and index of the first array task of each submitted part of ``jobname``.
+
+        A single part for a job submitted as a whole, one per submitted chunk otherwise.
+        """
+        chunks = read_chunks(JobPath(jobname=jobname, root=self.config.local_slurmpilot_path()).jobid_file)
+        if chunks is None:
+            jobid = self._read_jobid(jobname)
+            return [] if jobid is None else [(jobid, 0)]
+        return [(chunk.jobid, chunk.offset) for chunk in chunks if chunk.jobid is not None]
+
     def _read_metadata(self, jobname: str) -> JobMetadata | None:
         f = JobPath(jobname=jobname, root=self.config.local_slurmpilot_path()).metadata
         if not f.exists():
@@ -338,107 +972,153 @@ class SlurmPilot:
 
         Each dict has keys: ``jobname``, ``jobid``, ``task_id``, ``cluster``,
         ``creation``, ``elapsed``, ``state``, ``nodelist``.
-        """
-        from collections import defaultdict
-        by_cluster: dict[str, list[tuple[JobMetadata, int]]] = defaultdict(list)
-        for jn in jobnames:
-            meta = self._read_metadata(jn)
-            jobid = self._read_jobid(jn)
-            if meta and jobid is not None:
-                by_cluster[meta.cluster].append((meta, jobid))
 
+        The ``task_id`` of the tasks of a job array submitted in chunks is their index in the
+        whole array, ``jobid`` is the id of their chunk.
+
+        Rows of jobs using ``tasks_per_job`` also count, in ``entries``, ``entries_done`` and
+        ``entries_failed``, the ``python_args`` entries of their array task and how many of them
+        finished or failed; rows without a task id count those of the whole job. The three are
+        None for other jobs.
+        """
+        self._advance_all_chunks(jobnames)
         rows = []
-        for cluster, pairs in by_cluster.items():
-            jobid_to_meta = {jid: meta for meta, jid in pairs}
-            job_ids_str = ",".join(str(jid) for _, jid in pairs)
+        for cluster, jobs in self._jobs_by_cluster(jobnames).items():
+            bundled = _bundled_jobs(jobs)
             if cluster == MOCK_CLUSTER:
-                sacct_out = self._mock_slurms[cluster].sacct([jid for _, jid in pairs])
+                sacct_outs = [self._mock_slurms[cluster].sacct([jid for _, jid, _ in jobs])]
+                progress = self._mock_progress(bundled)
             else:
-                result = self._connections[cluster].run(
-                    f'sacct --format="{SACCT_FORMAT}" -X -p --jobs={job_ids_str}'
+                # The progress of bundled jobs is counted in the same round trip as sacct.
+                sacct_commands = _sacct_commands([jid for _, jid, _ in jobs])
+                with self._span("sacct", cluster, jobs=len(jobs)) as span:
+                    results = self._connections[cluster].run_many(
+                        sacct_commands + self._progress_commands(cluster, bundled), retries=self._retries(cluster)
+                    )
+                    describe_result(span, results)
+                sacct_outs = _successful_sacct_outputs(cluster, results[:len(sacct_commands)])
+                progress = _parse_progress_results(cluster, bundled, results[len(sacct_commands):])
+            cluster_rows = _parse_sacct_rows(cluster, sacct_outs, {jid: (meta, offset) for meta, jid, offset in jobs})
+            rows.extend(_add_entry_progress(cluster_rows, bundled, progress))
+        return rows
+
+    async def sacct_info_async(self, jobnames: list[str]) -> list[dict]:
+        """Like :meth:`sacct_info`, but queries all clusters concurrently."""
+        async def cluster_rows(cluster: str, jobs: list[tuple[JobMetadata, int, int]]) -> list[dict]:
+            bundled = _bundled_jobs(jobs)
+            if cluster == MOCK_CLUSTER:
+                sacct_outs = [self._mock_slurms[cluster].sacct([jid for _, jid, _ in jobs])]
+                progress = self._mock_progress(bundled)
+            else:
+                sacct_commands = _sacct_commands([jid for _, jid, _ in jobs])
+                with self._span("sacct", cluster, jobs=len(jobs)) as span:
+                    results = await self._async_connection(cluster).run_many(
+                        sacct_commands + self._progress_commands(cluster, bundled), retries=self._retries(cluster)
+                    )
+                    describe_result(span, results)
+                sacct_outs = _successful_sacct_outputs(cluster, results[:len(sacct_commands)])
+                progress = _parse_progress_results(cluster, bundled, results[len(sacct_commands):])
+            rows = _parse_sacct_rows(cluster, sacct_outs, {jid: (meta, offset) for meta, jid, offset in jobs})
+            return _add_entry_progress(rows, bundled, progress)
+
+        await asyncio.to_thread(self._advance_all_chunks, jobnames)
+        per_cluster = await asyncio.gather(*(
+            cluster_rows(cluster, jobs) for cluster, jobs in self._jobs_by_cluster(jobnames).items()
+        ))
+        return [row for rows in per_cluster for row in rows]
+
+    async def status_async(self, jobnames: list[str]) -> list[str | None]:
+        """Like :meth:`status`, but with one sacct round trip per cluster, all clusters queried concurrently."""
+        clusters = {jn: self._read_cluster(jn) for jn in jobnames}
+        chunks = await asyncio.to_thread(self._advance_all_chunks, jobnames)
+        jobids = {jn: [jobid for jobid, _ in self._job_ids(jn)] for jn in chunks}
+        by_cluster: dict[str, list[int]] = defaultdict(list)
+        for jn, ids in jobids.items():
+            by_cluster[clusters[jn]].extend(ids)
+
+        async def cluster_sacct(cluster: str, ids: list[int]) -> str | None:
+            if cluster == MOCK_CLUSTER:
+                return self._mock_slurms[cluster].sacct(ids)
+            with self._span("sacct", cluster, jobs=len(ids)) as span:
+                results = await self._async_connection(cluster).run_many(
+                    _sacct_commands(ids), retries=self._retries(cluster)
                 )
-                if result.failed:
-                    logger.warning(f"sacct failed for cluster {cluster}: {result.stderr}")
-                    continue
-                sacct_out = result.stdout
+                describe_result(span, results)
+            failed = [result for result in results if result.failed]
+            if failed:
+                logger.warning(f"sacct failed for cluster {cluster}: {failed[0].stderr}")
+                return None
+            return "\n".join(result.stdout for result in results)
 
-            for line in sacct_out.strip().split("\n")[1:]:
-                parts = [p.strip() for p in line.split("|")]
-                if not parts or not parts[0]:
-                    continue
-                raw_id, task_id = (parts[0].split("_") + [None])[:2]
-                try:
-                    jobid = int(raw_id)
-                except ValueError:
-                    continue
-                meta = jobid_to_meta.get(jobid)
-                if meta is None:
-                    continue
-                try:
-                    parsed_task_id = int(task_id) if task_id is not None else None
-                except ValueError:
-                    parsed_task_id = None
-                rows.append({
-                    "jobname":  meta.jobname,
-                    "jobid":    raw_id,
-                    "task_id":  parsed_task_id,
-                    "cluster":  cluster,
-                    "creation": meta.date,
-                    "elapsed":  parts[1] if len(parts) > 1 else "",
-                    "state":    parts[3] if len(parts) > 3 else None,
-                    "nodelist": parts[4] if len(parts) > 4 else "",
-                })
-        return rows
+        outputs = dict(zip(by_cluster, await asyncio.gather(*(
+            cluster_sacct(cluster, ids) for cluster, ids in by_cluster.items() if ids
+        ))))
+        states = []
+        for jn in jobnames:
+            sacct_out = outputs.get(clusters[jn])
+            if not jobids.get(jn) or sacct_out is None:
+                states.append(None)
+                continue
+            pending = chunks[jn] is not None and any(c.pending for c in chunks[jn])
+            states.append(_parse_job_state(sacct_out, jobids[jn], pending=pending))
+        return states
 
     def stop_job(self, jobname: str) -> None:
         """Cancel a running job via scancel (or MockSlurm for mock clusters)."""
-        jobid = self._read_jobid(jobname)
-        if jobid is None:
+        jobids = [jobid for jobid, _ in self._job_ids(jobname)]
+        if not jobids:
             raise ValueError(f"No jobid found for '{jobname}'")
         cluster = self._read_cluster(jobname)
         if cluster is None:
             raise ValueError(f"No metadata found for '{jobname}'")
         if cluster == MOCK_CLUSTER:
-            self._mock_slurms[cluster].scancel(jobid)
+            for jobid in jobids:
+                self._mock_slurms[cluster].scancel(jobid)
         else:
-            result = self._connections[cluster].run(f"scancel {jobid}")
+            with self._span("scancel", cluster, jobs=len(jobids)) as span:
+                result = self._connections[cluster].run("scancel " + " ".join(map(str, jobids)))
+                describe_result(span, result)
             if result.failed:
                 raise RuntimeError(f"scancel failed:\n{result.stderr}")
+        self._cancel_pending_chunks(jobname)
 
     def stop_all_jobs(self, clusters: list[str] | None = None) -> list[str]:
         """Cancel all tracked jobs on *clusters* (defaults to all known clusters).
 
         Batches scancel calls per cluster. Returns list of cancelled jobnames.
         """
-        from collections import defaultdict
-
-        from job_metadata import list_metadatas
-
-        targets = set(clusters) if clusters else set(self.clusters)
-        jobs_root = self.config.local_slurmpilot_path() / "jobs"
-        metadatas = [m for m in list_metadatas(jobs_root) if m.cluster in targets]
-
-        by_cluster: dict[str, list[tuple[str, int]]] = defaultdict(list)
-        for meta in metadatas:
-            jobid = self._read_jobid(meta.jobname)
-            if jobid is not None:
-                by_cluster[meta.cluster].append((meta.jobname, jobid))
-
         cancelled = []
-        for cluster, pairs in by_cluster.items():
-            jobids_str = " ".join(str(jid) for _, jid in pairs)
+        for cluster, pairs in self._tracked_jobs_by_cluster(clusters).items():
             if cluster == MOCK_CLUSTER:
-                for _, jid in pairs:
-                    try:
-                        self._mock_slurms[cluster].scancel(jid)
-                    except Exception:
-                        pass
-            else:
-                result = self._connections[cluster].run(f"scancel {jobids_str}")
-                if result.failed:
-                    logger.warning(f"scancel failed on {cluster}: {result.stderr}")
-                    continue
-            cancelled.extend(jn for jn, _ in pairs)
+                cancelled.extend(self._mock_scancel(cluster, pairs))
+                continue
+            chunks = _chunks(pairs, MAX_JOBIDS_PER_COMMAND)
+            with self._span("scancel", cluster, jobs=len(pairs)) as span:
+                results = self._connections[cluster].run_many(_scancel_commands(chunks))
+                describe_result(span, results)
+            cancelled.extend(_cancelled_jobnames(cluster, chunks, results))
+        cancelled = list(dict.fromkeys(cancelled))
+        for jobname in cancelled:
+            self._cancel_pending_chunks(jobname)
+        return cancelled
+
+    async def stop_all_jobs_async(self, clusters: list[str] | None = None) -> list[str]:
+        """Like :meth:`stop_all_jobs`, but cancels on all clusters concurrently."""
+        async def cancel(cluster: str, pairs: list[tuple[str, int]]) -> list[str]:
+            if cluster == MOCK_CLUSTER:
+                return self._mock_scancel(cluster, pairs)
+            chunks = _chunks(pairs, MAX_JOBIDS_PER_COMMAND)
+            with self._span("scancel", cluster, jobs=len(pairs)) as span:
+                results = await self._async_connection(cluster).run_many(_scancel_commands(chunks))
+                describe_result(span, results)
+            return _cancelled_jobnames(cluster, chunks, results)
+
+        per_cluster = await asyncio.gather(*(
+            cancel(cluster, pairs) for cluster, pairs in self._tracked_jobs_by_cluster(clusters).items()
+        ))
+        cancelled = list(dict.fromkeys(jobname for jobnames in per_cluster for jobname in jobnames))
+        for jobname in cancelled:
+            self._cancel_pending_chunks(jobname)
         return cancelled
 
     def test_ssh(self, cluster: str) -> bool:
@@ -448,6 +1128,54 @@ class SlurmPilot:
         result = self._connections[cluster].run("hostname")
         return not result.failed
 
+    async def test_ssh_async(self, cluster: str) -> bool:
+        """Like :meth:`test_ssh`, awaitable so that several clusters can be tested at once."""
+        if cluster in (MOCK_CLUSTER, LOCAL_CLUSTER):
+            return True
+        result = await self._async_connection(cluster).run("hostname")
+        return not result.failed
+
+    def _jobs_by_cluster(self, jobnames: list[str]) -> dict[str, list[tuple[JobMetadata, int, int]]]:
+        """Metadata, Slurm job id and task offset of each submitted part of ``jobnames``, see :meth:`_job_ids`."""
+        by_cluster: dict[str, list[tuple[JobMetadata, int, int]]] = defaultdict(list)
+        for jn in jobnames:
+            meta = self._read_metadata(jn)
+            if meta:
+                by_cluster[meta.cluster].extend((meta, jobid, offset) for jobid, offset in self._job_ids(jn))
+        return by_cluster
+
+    def _tracked_jobs_by_cluster(self, clusters: list[str] | None) -> dict[str, list[tuple[str, int]]]:
+        targets = set(clusters) if clusters else set(self.clusters)
+        jobs_root = self.config.local_slurmpilot_path() / "jobs"
+        by_cluster: dict[str, list[tuple[str, int]]] = defaultdict(list)
+        for meta in list_metadatas(jobs_root):
+            if meta.cluster not in targets:
+                continue
+            by_cluster[meta.cluster].extend((meta.jobname, jobid) for jobid, _ in self._job_ids(meta.jobname))
+        return by_cluster
+
+    def _progress_commands(self, cluster: str, bundled: list[JobMetadata]) -> list[str]:
+        """Commands counting the finished entries of each job of ``bundled``, see :mod:`slurmpilot.task_bundles`."""
+        commands = []
+        for meta in bundled:
+            if cluster == LOCAL_CLUSTER:
+                job_dir = self.local_job_path(meta.jobname)
+            else:
+                job_dir = JobPath(jobname=meta.jobname, root=self._remote_root_for_job(meta.jobname, cluster)).job_dir
+            commands.append(progress_command(job_dir, meta.tasks_per_job))
+        return commands
+
+    def _mock_progress(self, bundled: list[JobMetadata]) -> dict[str, dict[int, tuple[int, int]]]:
+        return {meta.jobname: read_progress(self.local_job_path(meta.jobname), meta.tasks_per_job) for meta in bundled}
+
+    def _mock_scancel(self, cluster: str, pairs: list[tuple[str, int]]) -> list[str]:
+        for _, jid in pairs:
+            try:
+                self._mock_slurms[cluster].scancel(jid)
+            except Exception:
+                pass
+        return [jn for jn, _ in pairs]
+
     def download_job(self, jobname: str) -> None:
         """Download the full remote job folder to the local machine.
 
@@ -460,7 +1188,12 @@ class SlurmPilot:
             return
         local = JobPath(jobname=jobname, root=self.config.local_slurmpilot_path())
         remote = JobPath(jobname=jobname, root=self._remote_root_for_job(jobname, cluster))
-        self._connections[cluster].download_folder(remote.job_dir, local.job_dir.parent)
+        with self._span("download", cluster, jobname=jobname) as span:
+            self._connections[cluster].download_folder(
+                remote.job_dir, local.job_dir.parent, progress=self._log.transfer_progress
+            )
+            if self.listeners:
+                span.bytes_transferred = folder_size(local.job_dir)
 
     def local_job_path(self, jobname: str) -> Path:
         """Return the local job directory for ``jobname``."""
@@ -479,11 +1212,12 @@ class SlurmPilot:
     def queue_position(self, jobname: str) -> QueuePosition | None:
         """Return the queue position of a pending job within its partition.
 
-        Runs two ``squeue`` calls on the cluster:
+        Runs two ``squeue`` calls on the cluster in a single round trip:
 
         1. ``squeue -j <jobid> -h -o "%P"`` — discover the partition.
         2. ``squeue -p <partition> --sort=-Q -h -o "%i|%Q|%T"`` — list all jobs
-           sorted by priority (descending) and compute the rank.
+           sorted by priority (descending) and compute the rank. The partition is
+           resolved on the cluster by the same lookup as step 1.
 
         Returns ``None`` for mock/local clusters or when the job cannot be found.
         The ``position`` field of the returned object is ``None`` when the job
@@ -494,17 +1228,20 @@ class SlurmPilot:
         if jobid is None or cluster is None or cluster == MOCK_CLUSTER:
             return None
 
-        connection = self._connections[cluster]
-
-        # Step 1: find the partition this job is queued in.
-        result = connection.run(f'squeue -j {jobid} -h -o "%P"')
-        if result.failed or not result.stdout.strip():
+        partition_lookup = f'squeue -j {jobid} -h -o "%P"'
+        with self._span("squeue", cluster, jobname=jobname) as span:
+            partition_result, result = self._connections[cluster].run_many([
+                # Step 1: find the partition this job is queued in.
+                partition_lookup,
+                # Step 2: list all jobs in that partition sorted by priority descending.
+                f'squeue -p "$({partition_lookup} | head -n 1)" --sort=-Q -h -o "%i|%Q|%T"',
+            ], retries=self._retries(cluster))
+            describe_result(span, [partition_result, result])
+        if partition_result.failed or not partition_result.stdout.strip():
             logger.warning(f"squeue could not find job {jobid} on {cluster}")
             return None
-        partition = result.stdout.strip().splitlines()[0].strip()
+        partition = partition_result.stdout.strip().splitlines()[0].strip()
 
-        # Step 2: list all jobs in that partition sorted by priority descending.
-        result = connection.run(f'squeue -p {partition} --sort=-Q -h -o "%i|%Q|%T"')
         if result.failed:
             logger.warning(f"squeue failed on {cluster}: {result.stderr}")
             return None
@@ -540,15 +1277,26 @@ def _call_sbatch(
     env: dict | None,
 ) -> int:
     """Run sbatch in ``job_dir`` via ``connection`` and return the Slurm job id."""
+    return _parse_sbatch_result(connection.run(_sbatch_command(job_dir, jobname, env)))
+
+
+def _sbatch_command(job_dir: Path, jobname: str, env: dict | None, array: str | None = None) -> str:
+    """Command submitting the ``slurm_script.sh`` of ``job_dir``.
+
+    :param array: value of ``--array``, overriding the one of the script.
+    """
     env_vars = {"SP_JOBNAME": jobname}
     if env:
         env_vars.update(env)
     export = "--export=ALL," + ",".join(
         f"{k}={shlex.quote(str(v))}" for k, v in env_vars.items()
     )
-    result = connection.run(
-        f"cd {str(job_dir)} && mkdir -p logs && sbatch {export} slurm_script.sh"
-    )
+    array_option = f"--array={array} " if array is not None else ""
+    return f"cd {str(job_dir)} && mkdir -p logs && sbatch {array_option}{export} slurm_script.sh"
+
+
+def _parse_sbatch_result(result: CommandResult) -> int:
+    """Slurm job id printed by an sbatch command, see :func:`_sbatch_command`."""
     if result.failed:
         raise RuntimeError(f"sbatch failed:\n{result.stderr}")
     match = re.search(r"Submitted batch job (\d+)", result.stdout)
@@ -560,6 +1308,31 @@ def _call_sbatch(
     return int(match.group(1))
 
 
+def _check_upload(cluster: str, manifest: Manifest, remote_dir: Path, result: CommandResult) -> None:
+    """Raise if the listing ``result`` of :meth:`Manifest.verify_command` misses files of ``manifest``."""
+    if result.failed:
+        raise RuntimeError(f"Could not list {remote_dir} to verify the upload:\n{result.stderr}")
+    problems = manifest.check(result.stdout)
+    if problems:
+        details = "\n".join(problems[:20])
+        if len(problems) > 20:
+            details += f"\n... and {len(problems) - 20} more"
+        raise RuntimeError(f"Upload to {cluster}:{remote_dir} is incomplete:\n{details}")
+
+
+def _job_ignore(root: Path, job_info: JobCreationInfo):
+    """``ignore`` callable of a folder shipped with ``job_info``, see :func:`ignore_function`."""
+    return ignore_function(root, job_info.exclude, job_info.use_gitignore, job_info.ship_git)
+
+
+def _copied_folders(job_info: JobCreationInfo) -> dict[str, Path]:
+    """Folders copied into the job folder by schedule_job, keyed by their name there."""
+    folders = {Path(job_info.src_dir).resolve().name: Path(job_info.src_dir)}
+    for lib in job_info.python_libraries or []:
+        folders[Path(lib).name] = Path(lib)
+    return folders
+
+
 def _parse_sacct_state(sacct_output: str, jobid: int) -> str | None:
     """Parse pipe-delimited sacct output and return the State for ``jobid``.
 
@@ -583,3 +1356,130 @@ def _parse_sacct_state(sacct_output: str, jobid: int) -> str | None:
         if s not in TERMINAL_STATES:
             return s
     return states[-1]
+
+
+def _parse_job_state(sacct_output: str, jobids: list[int], pending: bool = False) -> str | None:
+    """State of a job submitted as the Slurm jobs ``jobids``, see :func:`_parse_sacct_state`.
+
+    :param pending: whether some chunks of the job are still to be submitted, which keeps it PENDING.
+    """
+    states = [_parse_sacct_state(sacct_output, jobid) for jobid in jobids]
+    states = [state for state in states if state is not None] + (["PENDING"] if pending else [])
+    if not states:
+        return None
+    for s in states:
+        if s not in TERMINAL_STATES:
+            return s
+    return states[-1]
+
+
+def _chunks(items: list, size: int) -> list[list]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _sacct_commands(jobids: list[int]) -> list[str]:
+    return [
+        f'sacct --format="{SACCT_FORMAT}" -X -p --jobs={",".join(map(str, chunk))}'
+        for chunk in _chunks(jobids, MAX_JOBIDS_PER_COMMAND)
+    ]
+
+
+def _successful_sacct_outputs(cluster: str, results: list[CommandResult]) -> list[str]:
+    failed = [r for r in results if r.failed]
+    if failed:
+        logger.warning(f"sacct failed for cluster {cluster}: {failed[0].stderr}")
+    return [r.stdout for r in results if not r.failed]
+
+
+def _scancel_commands(chunks: list[list[tuple[str, int]]]) -> list[str]:
+    return ["scancel " + " ".join(str(jid) for _, jid in chunk) for chunk in chunks]
+
+
+def _cancelled_jobnames(
+    cluster: str,
+    chunks: list[list[tuple[str, int]]],
+    results: list[CommandResult],
+) -> list[str]:
+    cancelled = []
+    for chunk, result in zip(chunks, results):
+        if result.failed:
+            logger.warning(f"scancel failed on {cluster}: {result.stderr}")
+            continue
+        cancelled.extend(jn for jn, _ in chunk)
+    return cancelled
+
+
+def _bundled_jobs(jobs: list[tuple[JobMetadata, int, int]]) -> list[JobMetadata]:
+    """Metadata of the jobs using ``tasks_per_job`` among ``jobs``, once per job."""
+    return list({meta.jobname: meta for meta, _, _ in jobs if meta.tasks_per_job is not None}.values())
+
+
+def _parse_progress_results(
+    cluster: str, bundled: list[JobMetadata], results: list[CommandResult]
+) -> dict[str, dict[int, tuple[int, int]]]:
+    progress = {}
+    for meta, result in zip(bundled, results):
+        if result.failed:
+            logger.warning(f"Could not count the finished entries of {meta.jobname} on {cluster}: {result.stderr}")
+            continue
+        progress[meta.jobname] = parse_progress(result.stdout)
+    return progress
+
+
+def _add_entry_progress(
+    rows: list[dict], bundled: list[JobMetadata], progress: dict[str, dict[int, tuple[int, int]]]
+) -> list[dict]:
+    """Add the ``entries``, ``entries_done`` and ``entries_failed`` of each row, see :meth:`SlurmPilot.sacct_info`."""
+    metas = {meta.jobname: meta for meta in bundled}
+    for row in rows:
+        meta = metas.get(row["jobname"])
+        if meta is None or row["jobname"] not in progress:
+            row.update(entries=None, entries_done=None, entries_failed=None)
+            continue
+        blocks = progress[row["jobname"]]
+        if row["task_id"] is None:
+            row["entries"] = meta.n_entries
+            row["entries_done"] = sum(done for done, _ in blocks.values())
+            row["entries_failed"] = sum(failed for _, failed in blocks.values())
+        else:
+            row["entries"] = len(block_entries(row["task_id"], meta.n_entries, meta.tasks_per_job))
+            row["entries_done"], row["entries_failed"] = blocks.get(row["task_id"], (0, 0))
+    return rows
+
+
+def _parse_sacct_rows(
+    cluster: str, sacct_outs: list[str], jobid_to_meta: dict[int, tuple[JobMetadata, int]]
+) -> list[dict]:
+    """Turn pipe-delimited sacct outputs (each with its header line) into sacct_info rows.
+
+    :param jobid_to_meta: metadata of the job of each Slurm job id, and the offset added to its task ids.
+    """
+    rows = []
+    for sacct_out in sacct_outs:
+        for line in sacct_out.strip().split("\n")[1:]:
+            parts = [p.strip() for p in line.split("|")]
+            if not parts or not parts[0]:
+                continue
+            raw_id, task_id = (parts[0].split("_") + [None])[:2]
+            try:
+                jobid = int(raw_id)
+            except ValueError:
+                continue
+            if jobid not in jobid_to_meta:
+                continue
+            meta, offset = jobid_to_meta[jobid]
+            try:
+                parsed_task_id = int(task_id) + offset if task_id is not None else None
+            except ValueError:
+                parsed_task_id = None
+            rows.append({
+                "jobname":  meta.jobname,
+                "jobid":    raw_id,
+                "task_id":  parsed_task_id,
+                "cluster":  cluster,
+                "creation": meta.date,
+                "elapsed":  parts[1] if len(parts) > 1 else "",
+                "state":    parts[3] if len(parts) > 3 else None,
+                "nodelist": parts[4] if len(parts) > 4 else "",
+            })
+    return rows
@@ -37,19 +37,28 @@ class SlurmPilotLogging:
     def start_job(self, jobname: str, cluster: str) -> None:
         print(f"Starting job {_jobname(jobname)} on {_cluster(cluster)}.")
 
-    def send_data(self, local_path: Path, cluster: str, remote_path: Path) -> None:
-        size_bytes = sum(f.stat().st_size for f in Path(local_path).rglob("*") if f.is_file())
+    def send_data(self, local_path: Path, cluster: str, remote_path: Path, size_bytes: int | None = None) -> None:
+        if size_bytes is None:
+            size_bytes = sum(f.stat().st_size for f in Path(local_path).rglob("*") if f.is_file())
         print(
             f"Sending job data from {_jobname(local_path)} to "
             f"{_cluster(cluster)}:{_jobname(remote_path)} ({_human_size(size_bytes)})"
         )
 
+    def transfer_progress(self, done_bytes: int, total_bytes: int) -> None:
+        end = "\n" if done_bytes >= total_bytes else ""
+        print(f"\rTransferred {_human_size(done_bytes)} / {_human_size(total_bytes)}", end=end, flush=True)
+
     def job_submitted(self, cluster: str, jobid: int) -> None:
         print(
             f"\nJob submitted to Slurm / {_cluster(cluster)} with id {_jobid(jobid)} "
             f"saving the jobid locally."
         )
 
+    def jobs_submitted(self, cluster: str, submitted: int, total: int) -> None:
+        failed = f", {total - submitted} failed" if submitted < total else ""
+        print(f"Submitted {submitted} of {total} jobs to {_cluster(cluster)}{failed}.")
+
     def job_tips(self, jobname: str) -> None:
         print(
             f"\nYou can use the following commands in a terminal:\n"
@@ -0,0 +1,389 @@
+"""
+Content-addressed store of job files on a remote cluster.
+
+Instead of rsyncing every job folder in full, the files of a job are stored once under
+``{remote_root}/blobs/`` named by the sha256 of their content, and each job folder is
+assembled on the cluster from hard links to those blobs (or copies when the filesystem
+does not support hard links). Submitting the same code again therefore only transfers
+the files that changed, plus the few generated files of the job.
+
+An upload costs at most three round trips: one to list the blobs the cluster lacks,
+one rsync of the missing blobs (skipped when nothing is missing) and one to link the
+job folder together. Hashes are cached locally by path, size and modification time
+(see :class:`HashCache`) so that unchanged files are not read again.
+
+The blobs known to be on the cluster can also be remembered locally (see
+:class:`KnownBlobs`). The listing is then skipped when every blob is known, and when
+the unknown ones are small enough to be sent right away, as for the few generated files
+of a job whose sources were pre-staged with :meth:`SourceCache.stage` (``sp sync``).
+
+Blobs are made read-only so that a job writing into one of its source files fails
+instead of silently changing the files of every other job sharing that blob.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+
+from .remote_command import RemoteExecution, TransferSettings
+from .util import shell_path
+
+logger = logging.getLogger(__name__)
+
+BLOBS_DIR = "blobs"
+
+# Unknown blobs smaller than this in total are uploaded without first asking the cluster
+# whether it has them, which would cost more than sending them again.
+SEND_UNCHECKED_BYTES = 256 * 1024
+
+
+class HashCache:
+    """Persistent map from a local file to the sha256 of its content.
+
+    An entry is reused only while the size and modification time of the file are
+    unchanged. Files copied into a job folder can be looked up under the path of the
+    file they were copied from (``copytree`` preserves modification times), so that the
+    cache stays warm across jobs. It can be shared by threads preparing jobs concurrently.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._entries: dict[str, list] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        if self.path.exists():
+            try:
+                self._entries = json.loads(self.path.read_text())
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable hash cache {self.path}: {e}")
+
+    def digest(self, path: Path, key: Path | None = None) -> str:
+        """Return the sha256 of ``path``, using the entry stored under ``key`` if still valid."""
+        st = os.stat(path)
+        key = str(Path(key if key is not None else path).resolve())
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+            return entry[2]
+        digest = _sha256(path)
+        with self._lock:
+            self._entries[key] = [st.st_size, st.st_mtime_ns, digest]
+            self._dirty = True
+        return digest
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Write then rename so that concurrent submissions never read a partial file.
+            with tempfile.NamedTemporaryFile("w", dir=self.path.parent, delete=False) as f:
+                json.dump(self._entries, f)
+            os.replace(f.name, self.path)
+            self._dirty = False
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def blob_name(digest: str, mode: int) -> str:
+    """Name of the blob of a file; executable files get their own blob to keep their mode."""
+    return digest + (".x" if mode & stat.S_IXUSR else "")
+
+
+def build_manifest(
+    root: Path, hash_cache: HashCache, originals: dict[str, Path] | None = None, files: list[str] | None = None
+) -> dict[str, str]:
+    """Map the relative (posix) path of every regular file under ``root`` to its blob name.
+
+    :param originals: maps a top-level entry of ``root`` to the folder it was copied from,
+        so that hashes are cached under the original paths.
+    :param files: relative paths of the files to include, when already known (see
+        :class:`slurmpilot.manifest.Manifest`); ``root`` is walked otherwise.
+    """
+    root = Path(root)
+    originals = originals or {}
+    if files is None:
+        files = [
+            (Path(dirpath) / filename).relative_to(root).as_posix()
+            for dirpath, _, filenames in os.walk(root)
+            for filename in filenames
+        ]
+    manifest = {}
+    for relative in files:
+        path = root / relative
+        st = path.lstat()
+        if not stat.S_ISREG(st.st_mode):
+            continue
+        parts = Path(relative).parts
+        key = None
+        if parts[0] in originals and len(parts) > 1:
+            key = Path(originals[parts[0]]).joinpath(*parts[1:])
+        manifest[relative] = blob_name(hash_cache.digest(path, key), st.st_mode)
+    return manifest
+
+
+class KnownBlobs:
+    """Persistent set of the blobs known to be stored in one remote blob store.
+
+    Several processes may use the same file, e.g. ``sp sync --watch`` and ``sp launch``:
+    :meth:`save` merges with what is on disk instead of overwriting it.
+    """
+
+    def __init__(self, path: Path, remote_root: Path):
+        self.path = Path(path)
+        self.key = str(remote_root)
+        self.names: set[str] = set(self._read().get(self.key, []))
+        self._added: set[str] = set()
+
+    def _read(self) -> dict[str, list[str]]:
+        if not self.path.exists():
+            return {}
+        try:
+            return json.loads(self.path.read_text())
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable blob list {self.path}: {e}")
+            return {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.names
+
+    def add(self, names) -> None:
+        names = set(names) - self.names
+        self.names |= names
+        self._added |= names
+
+    def forget(self) -> None:
+        """Forget every blob, e.g. after the remote store was cleaned."""
+        self.names.clear()
+        self._added.clear()
+        data = self._read()
+        if data.pop(self.key, None) is not None:
+            self._write(data)
+
+    def save(self) -> None:
+        if not self._added:
+            return
+        data = self._read()
+        data[self.key] = sorted(set(data.get(self.key, [])) | self._added)
+        self._write(data)
+        self.names |= set(data[self.key])
+        self._added.clear()
+
+    def _write(self, data: dict[str, list[str]]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", dir=self.path.parent, delete=False) as f:
+            json.dump(data, f)
+        os.replace(f.name, self.path)
+
+
+@dataclass
+class CachedUpload:
+    """What an upload through the cache transferred."""
+    files: int
+    uploaded_blobs: int
+    uploaded_bytes: int
+
+
+class SourceCache:
+    def __init__(
+        self,
+        connection: RemoteExecution,
+        remote_root: Path,
+        hash_cache: HashCache,
+        known: KnownBlobs | None = None,
+        settings: TransferSettings | None = None,
+    ):
+        """
+        :param connection: executor of the cluster.
+        :param remote_root: remote slurmpilot root, blobs are stored in ``remote_root/blobs``.
+        :param hash_cache: local cache of file hashes.
+        :param known: blobs known to be on the cluster already, updated after each upload.
+        :param settings: transfer settings of the blob uploads, defaults to those of ``connection``.
+        """
+        self.connection = connection
+        self.remote_root = Path(remote_root)
+        self.hash_cache = hash_cache
+        self.known = known
+        self.settings = settings
+
+    @property
+    def blobs_dir(self) -> Path:
+        return self.remote_root / BLOBS_DIR
+
+    def upload_folder(
+        self,
+        local_path: Path,
+        remote_path: Path,
+        originals: dict[str, Path] | None = None,
+        files: list[str] | None = None,
+    ) -> CachedUpload:
+        """Recreate ``local_path`` as ``remote_path/local_path.name``, like
+        :meth:`RemoteExecution.upload_folder`, transferring only the blobs the cluster lacks.
+
+        :param originals: see :func:`build_manifest`.
+        :param files: see :func:`build_manifest`.
+        """
+        return self.upload_folders([(local_path, remote_path, originals, files)])
+
+    def upload_folders(
+        self, folders: list[tuple[Path, Path, dict[str, Path] | None, list[str] | None]]
+    ) -> CachedUpload:
+        """Upload several folders as :meth:`upload_folder` does, in the same three round trips.
+
+        :param folders: ``(local_path, remote_path, originals, files)`` of each folder.
+        """
+        manifests = []
+        for local_path, remote_path, originals, files in folders:
+            local_path = Path(local_path)
+            manifest = build_manifest(local_path, self.hash_cache, originals, files)
+            manifests.append((local_path, Path(remote_path) / local_path.name, manifest))
+        self.hash_cache.save()
+
+        sources = _sources(manifests)
+        names = sorted(set(sources.values()))
+        trusted = [name for name in names if self.known is not None and name in self.known]
+        missing = self._to_upload(sources, names)
+        incoming, uploaded_bytes = self._upload_blobs(sources, missing)
+        try:
+            self._assemble([(remote_dir, manifest) for _, remote_dir, manifest in manifests], incoming, missing)
+        except RuntimeError:
+            if not trusted:
+                raise
+            # Blobs were removed from the cluster since they were recorded, check them all.
+            logger.warning(f"Some blobs known to be in {self.blobs_dir} are missing, uploading again.")
+            self.known.forget()
+            return self.upload_folders(folders)
+        self._remember(names)
+        return CachedUpload(files=len(sources), uploaded_blobs=len(missing), uploaded_bytes=uploaded_bytes)
+
+    def stage(self, root: Path, files: list[str] | None = None) -> CachedUpload:
+        """Upload the blobs of the files of ``root`` the cluster lacks, without assembling any folder.
+
+        Staging the sources of upcoming jobs leaves only their generated files to upload
+        when they are submitted.
+
+        :param files: see :func:`build_manifest`.
+        """
+        root = Path(root)
+        manifest = build_manifest(root, self.hash_cache, files=files)
+        self.hash_cache.save()
+        sources = _sources([(root, None, manifest)])
+        names = sorted(set(sources.values()))
+        missing = self._to_upload(sources, names)
+        incoming, uploaded_bytes = self._upload_blobs(sources, missing)
+        if incoming is not None:
+            [result] = self.connection.run_many(["\n".join(["set -e"] + self._store_commands(incoming, missing))])
+            if result.failed:
+                raise RuntimeError(f"Could not store blobs in {self.blobs_dir}:\n{result.stderr}")
+        self._remember(names)
+        return CachedUpload(files=len(manifest), uploaded_blobs=len(missing), uploaded_bytes=uploaded_bytes)
+
+    def _to_upload(self, sources: dict[Path, str], names: list[str]) -> list[str]:
+        """Blobs among ``names`` to upload: the missing ones, or every unknown one when they are small."""
+        if self.known is None:
+            return self.missing_blobs(names)
+        unknown = [name for name in names if name not in self.known]
+        sizes = {name: path.stat().st_size for path, name in sources.items()}
+        if sum(sizes[name] for name in unknown) <= SEND_UNCHECKED_BYTES:
+            return unknown
+        return self.missing_blobs(unknown)
+
+    def _remember(self, names: list[str]) -> None:
+        if self.known is not None:
+            self.known.add(names)
+            self.known.save()
+
+    def missing_blobs(self, names: list[str]) -> list[str]:
+        """Return the blobs among ``names`` that are not stored on the cluster yet."""
+        if not names:
+            return []
+        # Through run_many the command is sent on stdin, so its length is not limited by
+        # the maximum size of a command line.
+        [result] = self.connection.run_many([
+            f"mkdir -p {shell_path(self.blobs_dir)} && cd {shell_path(self.blobs_dir)} && "
+            f"for b in {' '.join(names)}; do [ -e \"$b\" ] || echo \"$b\"; done"
+        ])
+        if result.failed:
+            raise RuntimeError(f"Could not list blobs in {self.blobs_dir}:\n{result.stderr}")
+        return result.stdout.split()
+
+    def _upload_blobs(self, sources: dict[Path, str], missing: list[str]) -> tuple[str | None, int]:
+        """Upload the blobs ``missing`` to a new folder of the blob store, see :meth:`_store_commands`.
+
+        :param sources: blob name of each local file.
+        :return: the name of that folder (None when nothing was uploaded) and the bytes sent.
+        """
+        if not missing:
+            return None, 0
+        wanted = set(missing)
+        uploaded_bytes = 0
+        incoming = f".incoming-{uuid.uuid4().hex}"
+        with tempfile.TemporaryDirectory(prefix="slurmpilot-blobs-") as staging:
+            staging_blobs = Path(staging) / incoming
+            staging_blobs.mkdir()
+            for source, name in sources.items():
+                if name not in wanted:
+                    continue
+                wanted.discard(name)
+                try:
+                    os.link(source, staging_blobs / name)
+                except OSError:
+                    shutil.copy2(source, staging_blobs / name)
+                uploaded_bytes += source.stat().st_size
+            self.connection.upload_folder(staging_blobs, self.blobs_dir, settings=self.settings)
+        return incoming, uploaded_bytes
+
+    def _store_commands(self, incoming: str, new_blobs: list[str]) -> list[str]:
+        """Commands moving the uploaded blobs into the store.
+
+        Blobs are uploaded to their own folder first: one may have been sent without
+        checking whether the store had it, and the copy already in place is read-only and
+        may be linked from other jobs, so it is kept.
+        """
+        blobs = shell_path(self.blobs_dir)
+        return [
+            f"(cd {blobs} && for b in {' '.join(new_blobs)}; do [ -e \"$b\" ] || mv {incoming}/\"$b\" \"$b\"; done"
+            f" && rm -rf {incoming} && chmod a-w {' '.join(new_blobs)})"
+        ]
+
+    def _assemble(
+        self, folders: list[tuple[Path, dict[str, str]]], incoming: str | None, new_blobs: list[str]
+    ) -> None:
+        """Link each remote folder of ``folders`` together from the blobs of its manifest, in one command."""
+        lines = ["set -e"]
+        if incoming is not None:
+            lines += self._store_commands(incoming, new_blobs)
+        lines.append('l() { ln -f "$1" "$2" 2>/dev/null || cp -p "$1" "$2"; }')
+        # Resolved before moving into the folders, as the remote root may be relative.
+        lines.append(f'top="$(pwd)" && blobs="$(cd {shell_path(self.blobs_dir)} && pwd)"')
+        for remote_dir, manifest in folders:
+            lines.append(f'cd "$top" && mkdir -p {shell_path(remote_dir)} && cd {shell_path(remote_dir)}')
+            directories = sorted({str(Path(relative).parent) for relative in manifest} - {"."})
+            if directories:
+                lines.append("mkdir -p " + " ".join(shell_path(d) for d in directories))
+            lines += [f'l "$blobs"/{name} {shell_path(relative)}' for relative, name in manifest.items()]
+        [result] = self.connection.run_many(["\n".join(lines)])
+        if result.failed:
+            remote_dirs = ", ".join(str(remote_dir) for remote_dir, _ in folders)
+            raise RuntimeError(f"Could not assemble {remote_dirs} from cached blobs:\n{result.stderr}")
+
+
+def _sources(manifests: list[tuple[Path, Path | None, dict[str, str]]]) -> dict[Path, str]:
+    """Blob name of each local file of ``(local_path, remote_dir, manifest)`` folders."""
+    return {
+        local_path / relative: name
+        for local_path, _, manifest in manifests
+        for relative, name in manifest.items()
+    }
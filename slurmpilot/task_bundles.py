@@ -0,0 +1,75 @@
+"""
+Job arrays whose array tasks each run a block of ``python_args`` entries.
+
+With ``JobCreationInfo.tasks_per_job = T``, array task ``b`` runs the entries ``b * T`` to
+``b * T + T - 1`` of ``python_args`` inside its allocation, one after the other or, with
+``parallel_entries``, ``n_cpus`` at a time. Scheduling and queueing then cost once per
+block instead of once per entry, which dominates when entries only take seconds.
+
+Each entry ``i`` writes its output to ``logs/entries/i.stdout`` and ``logs/entries/i.stderr``
+and its exit code to ``logs/entries/i.status`` once finished; the array task fails if one of
+its entries did. The progress of a job is counted from the status files by
+:func:`progress_command` on the cluster, or :func:`read_progress` for a local job folder.
+"""
+import shlex
+from pathlib import Path
+
+ENTRIES_DIR = "logs/entries"
+
+
+def n_array_tasks(n_entries: int, tasks_per_job: int | None) -> int:
+    """Number of array tasks running ``n_entries`` entries, ``tasks_per_job`` of them per task."""
+    if tasks_per_job is None:
+        return n_entries
+    return -(-n_entries // tasks_per_job)
+
+
+def block_entries(block: int, n_entries: int, tasks_per_job: int) -> range:
+    """Entries run by the array task ``block``."""
+    return range(block * tasks_per_job, min((block + 1) * tasks_per_job, n_entries))
+
+
+def progress_command(job_dir: Path, tasks_per_job: int) -> str:
+    """Command printing ``block done failed`` for each array task of ``job_dir`` with finished entries.
+
+    Several lines may be printed for a block when find splits the status files over several
+    awk calls, :func:`parse_progress` adds them up.
+    """
+    entries_dir = shlex.quote(str(Path(job_dir) / ENTRIES_DIR))
+    awk = (
+        '{n = split(FILENAME, p, "/"); b = int(p[n] / T); done[b]++; if ($1 != "0") failed[b]++} '
+        'END {for (b in done) print b, done[b], failed[b] + 0}'
+    )
+    return (
+        f"[ ! -d {entries_dir} ] || "
+        f"find {entries_dir} -name '*.status' -exec awk -v T={tasks_per_job} '{awk}' {{}} +"
+    )
+
+
+def parse_progress(output: str) -> dict[int, tuple[int, int]]:
+    """Finished and failed entries of each array task, from the output of :func:`progress_command`."""
+    progress: dict[int, tuple[int, int]] = {}
+    for line in output.splitlines():
+        fields = line.split()
+        if len(fields) != 3 or not all(field.isdigit() for field in fields):
+            continue
+        block, done, failed = map(int, fields)
+        previous_done, previous_failed = progress.get(block, (0, 0))
+        progress[block] = (previous_done + done, previous_failed + failed)
+    return progress
+
+
+def read_progress(job_dir: Path, tasks_per_job: int) -> dict[int, tuple[int, int]]:
+    """Like :func:`progress_command` followed by :func:`parse_progress`, for a job folder on this machine."""
+    progress: dict[int, tuple[int, int]] = {}
+    entries_dir = Path(job_dir) / ENTRIES_DIR
+    if not entries_dir.is_dir():
+        return progress
+    for status in entries_dir.glob("*.status"):
+        code = status.read_text().strip()
+        if not code or not status.stem.isdigit():
+            continue
+        block = int(status.stem) // tasks_per_job
+        done, failed = progress.get(block, (0, 0))
+        progress[block] = (done + 1, failed + (code != "0"))
+    return progress
@@ -0,0 +1,116 @@
+"""
+Throughput of past uploads to each cluster, and the transfer settings picked from it.
+
+After every upload whose size is known exactly, :class:`TransferStats` records the bytes
+and seconds it took in ``cache/transfers.json``, separately for compressed and
+uncompressed transfers, together with a moving average of the throughput of the link.
+
+With ``compress: auto`` in the config of a cluster, :func:`transfer_settings` picks the
+settings of the next transfers from that average:
+
+- on a fast link (at least :data:`FAST_LINK` bytes per second, e.g. within a campus),
+  compression costs more CPU time than it saves on the wire, so files are sent
+  uncompressed and whole, without the rsync delta algorithm;
+- on a slow link (at most :data:`SLOW_LINK`, e.g. through a VPN), the strongest
+  compression level is used;
+- in between, and until an upload was measured, rsync compresses with its default level.
+
+Uploads smaller than :data:`MIN_MEASURED_BYTES` are not recorded, their duration is
+dominated by the latency of the connection rather than by its throughput.
+"""
+import json
+import logging
+import os
+import tempfile
+from dataclasses import replace
+from pathlib import Path
+
+from .config import ClusterConfig
+from .remote_command import TransferSettings
+
+logger = logging.getLogger(__name__)
+
+FAST_LINK = 30 * 1024 * 1024
+SLOW_LINK = 2 * 1024 * 1024
+MIN_MEASURED_BYTES = 1024 * 1024
+# Weight of the latest upload in the moving average of the throughput.
+SMOOTHING = 0.3
+
+
+class TransferStats:
+    """Persistent per-cluster statistics of uploads, stored as JSON."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    def _read(self) -> dict:
+        if not self.path.exists():
+            return {}
+        try:
+            return json.loads(self.path.read_text())
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable transfer statistics {self.path}: {e}")
+            return {}
+
+    def record(self, cluster: str, nbytes: int, seconds: float, compressed: bool) -> bool:
+        """Record an upload of ``nbytes`` that took ``seconds``; return whether it was large enough to count."""
+        if nbytes < MIN_MEASURED_BYTES or seconds <= 0:
+            return False
+        data = self._read()
+        stats = data.setdefault(cluster, {})
+        mode = stats.setdefault(
+            "compressed" if compressed else "uncompressed", {"uploads": 0, "bytes": 0, "seconds": 0.0}
+        )
+        mode["uploads"] += 1
+        mode["bytes"] += nbytes
+        mode["seconds"] += seconds
+        throughput = nbytes / seconds
+        previous = stats.get("throughput")
+        stats["throughput"] = throughput if previous is None else SMOOTHING * throughput + (1 - SMOOTHING) * previous
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", dir=self.path.parent, delete=False) as f:
+            json.dump(data, f)
+        os.replace(f.name, self.path)
+        return True
+
+    def throughput(self, cluster: str) -> float | None:
+        """Moving average of the throughput of uploads to ``cluster`` in bytes per second."""
+        return self._read().get(cluster, {}).get("throughput")
+
+    def summary(self, cluster: str) -> dict:
+        """Number of uploads and mean throughput, overall and per compression mode."""
+        stats = self._read().get(cluster, {})
+        summary = {"uploads": 0, "throughput": stats.get("throughput")}
+        for mode in ["compressed", "uncompressed"]:
+            entry = stats.get(mode)
+            summary["uploads"] += entry["uploads"] if entry else 0
+            summary[mode] = entry["bytes"] / entry["seconds"] if entry and entry["seconds"] > 0 else None
+        return summary
+
+
+def transfer_settings(cfg: ClusterConfig, throughput: float | None = None) -> TransferSettings:
+    """Transfer settings of the cluster configured by ``cfg``.
+
+    :param throughput: measured throughput of the cluster (see :meth:`TransferStats.throughput`),
+        used to resolve ``compress: auto``.
+    """
+    settings = TransferSettings(
+        compress=cfg.compress is True,
+        compress_level=cfg.compress_level,
+        bwlimit=str(cfg.bwlimit) if cfg.bwlimit is not None else None,
+        whole_file=cfg.whole_file,
+    )
+    if cfg.compress in (True, False):
+        return settings
+    if cfg.compress != "auto":
+        raise ValueError(f"compress must be true, false or 'auto', got {cfg.compress!r}")
+    return auto_settings(settings, throughput)
+
+
+def auto_settings(settings: TransferSettings, throughput: float | None) -> TransferSettings:
+    """Adapt ``settings`` to a link with the given throughput in bytes per second, see the module doc."""
+    if throughput is not None and throughput >= FAST_LINK:
+        return replace(settings, compress=False, compress_level=None, whole_file=True)
+    if throughput is not None and throughput <= SLOW_LINK:
+        return replace(settings, compress=True, compress_level=9)
+    return replace(settings, compress=True)
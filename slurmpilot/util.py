@@ -1,4 +1,6 @@
+import os
 import random
+import shlex
 import string
 import time
 
@@ -33,4 +35,25 @@ def parse_elapsed_minutes(elapsed: str) -> float:
         n_days = int(days_part)
     parts = elapsed.split(":")
     h, m, s = int(parts[0]), int(parts[1]), int(parts[2])
-    return n_days * 1440 + h * 60 + m + s / 60
\ No newline at end of file
+    return n_days * 1440 + h * 60 + m + s / 60
+
+def folder_size(path) -> int:
+    """Total size in bytes of the regular files under ``path`` (symlinks are not followed)."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except FileNotFoundError:
+                pass
+    return total
+
+
+def shell_path(path) -> str:
+    """Quote ``path`` for a remote shell while keeping a leading ``~/`` expandable."""
+    path = str(path)
+    if path == "~":
+        return path
+    if path.startswith("~/"):
+        return "~/" + shlex.quote(path[2:]) if len(path) > 2 else path
+    return shlex.quote(path)
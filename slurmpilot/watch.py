@@ -0,0 +1,101 @@
+"""
+Keep the sources of upcoming jobs staged on a cluster while they are edited (``sp sync --watch``).
+
+:class:`SourceWatcher` polls ``src_dir`` and, whenever a shipped file (see ``ignore.py``)
+was added, removed or modified, uploads the files the blob store of the cluster lacks
+with :meth:`slurmpilot.SlurmPilot.stage_sources`. A job submitted from ``src_dir``
+afterwards finds its sources in the store already and only uploads its generated files,
+without asking the cluster which blobs it has (see ``KnownBlobs`` in ``source_cache.py``).
+
+Changes are detected by comparing the size and modification time of every file, which
+only costs a ``stat`` per file and needs no platform-specific notification API; files are
+only read again when they changed.
+"""
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Callable
+
+from .ignore import ignore_function, shipped_files
+from .source_cache import CachedUpload
+
+logger = logging.getLogger(__name__)
+
+
+def tree_state(root: Path, files: list[str]) -> dict[str, tuple[int, int]]:
+    """Size and modification time of each of ``files``, relative to ``root``."""
+    state = {}
+    for relative in files:
+        try:
+            st = os.stat(Path(root) / relative)
+        except OSError:
+            continue
+        state[relative] = (st.st_size, st.st_mtime_ns)
+    return state
+
+
+class SourceWatcher:
+    def __init__(
+        self,
+        slurmpilot,
+        cluster: str,
+        src_dir: str | Path,
+        exclude: list[str] | None = None,
+        interval: float = 1.0,
+        use_gitignore: bool = False,
+        ship_git: bool = False,
+    ):
+        """
+        :param slurmpilot: :class:`slurmpilot.SlurmPilot` used to stage the sources.
+        :param cluster: cluster whose blob store is kept up to date.
+        :param src_dir: folder the jobs will be submitted from.
+        :param exclude: extra gitignore-style patterns, as in ``JobCreationInfo.exclude``.
+        :param interval: seconds between two scans of ``src_dir``.
+        :param use_gitignore: as in ``JobCreationInfo.use_gitignore``.
+        :param ship_git: as in ``JobCreationInfo.ship_git``.
+        """
+        self.slurmpilot = slurmpilot
+        self.cluster = cluster
+        self.src_dir = Path(src_dir)
+        self.exclude = exclude
+        self.interval = interval
+        self.use_gitignore = use_gitignore
+        self.ship_git = ship_git
+        self._state: dict[str, tuple[int, int]] | None = None
+
+    def sync(self) -> CachedUpload | None:
+        """Stage ``src_dir`` if it changed since the last call, return what was uploaded or None."""
+        ignore = ignore_function(self.src_dir, self.exclude, self.use_gitignore, self.ship_git)
+        files = shipped_files(self.src_dir, ignore)
+        state = tree_state(self.src_dir, files)
+        if state == self._state:
+            return None
+        upload = self.slurmpilot.stage_sources(
+            self.cluster, self.src_dir, exclude=self.exclude, use_gitignore=self.use_gitignore, ship_git=self.ship_git
+        )
+        self._state = state
+        return upload
+
+    def run(
+        self,
+        stop: threading.Event | None = None,
+        on_sync: Callable[[CachedUpload], None] | None = None,
+    ) -> None:
+        """Stage ``src_dir`` every ``interval`` seconds it changed, until ``stop`` is set.
+
+        A failed staging, e.g. while the cluster is unreachable, is logged and retried at
+        the next scan.
+
+        :param on_sync: called with the result of every staging.
+        """
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            try:
+                upload = self.sync()
+            except (OSError, RuntimeError) as e:
+                logger.warning(f"Could not stage {self.src_dir} on {self.cluster}: {e}")
+                upload = None
+            if upload is not None and on_sync is not None:
+                on_sync(upload)
+            stop.wait(self.interval)
@@ -0,0 +1,170 @@
+"""Shared fixtures.
+
+``fake_ssh`` puts a stand-in ``ssh`` executable first on ``PATH``. It runs the
+requested command with local bash, simulates the cost of a fresh connection with
+a configurable sleep, and mimics OpenSSH ControlMaster behaviour with a plain
+file at the ControlPath so multiplexing can be measured without a real sshd.
+Every invocation is appended as one JSON line to ``fake_ssh.log``.
+
+``fake_rsync`` adds a stand-in ``rsync`` next to it that copies with ``cp`` and runs
+the ``--rsync-path`` prefix (e.g. ``mkdir -p dest &&``) locally, logging to the same
+file, so tests can count the processes an operation spawns.
+"""
+import json
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+_FAKE_SSH = r'''
+import json
+import os
+import subprocess
+import sys
+import time
+
+args = sys.argv[1:]
+options = {}
+control_command = None
+no_command = False
+i = 0
+while i < len(args) and args[i].startswith("-"):
+    flag = args[i]
+    if flag == "-o":
+        key, _, value = args[i + 1].partition("=")
+        options[key] = value
+        i += 2
+    elif flag == "-O":
+        control_command = args[i + 1]
+        i += 2
+    else:
+        no_command = no_command or flag == "-N"
+        i += 1
+host = args[i] if i < len(args) else None
+command = " ".join(args[i + 1:])
+
+socket = options.get("ControlPath")
+master_running = socket is not None and os.path.exists(socket)
+handshake = False
+if control_command is None and not master_running:
+    handshake = True
+    time.sleep(float(os.environ.get("FAKE_SSH_HANDSHAKE", "0")))
+    if socket is not None and options.get("ControlMaster") in ("auto", "yes"):
+        open(socket, "w").close()
+
+with open(os.environ["FAKE_SSH_LOG"], "a") as f:
+    f.write(json.dumps({"program": "ssh", "argv": sys.argv[1:], "host": host, "command": command,
+                        "control": control_command, "handshake": handshake}) + "\n")
+
+if control_command == "check":
+    sys.exit(0 if master_running else 255)
+if control_command == "exit":
+    if master_running:
+        os.remove(socket)
+    sys.exit(0)
+if no_command:
+    sys.exit(0)
+sys.exit(subprocess.run(["bash", "-c", command]).returncode)
+'''
+
+_FAKE_RSYNC = r'''
+import json
+import os
+import shlex
+import subprocess
+import sys
+
+args = sys.argv[1:]
+rsync_path = "rsync"
+link_dest = None
+files_from = None
+positional = []
+i = 0
+while i < len(args):
+    if args[i] == "-e":
+        i += 2
+        continue
+    if args[i].startswith("--rsync-path="):
+        rsync_path = args[i].split("=", 1)[1]
+    elif args[i].startswith("--link-dest="):
+        link_dest = args[i].split("=", 1)[1]
+    elif args[i].startswith("--files-from="):
+        files_from = args[i].split("=", 1)[1]
+    elif not args[i].startswith("-"):
+        positional.append(args[i])
+    i += 1
+*sources, dest = positional
+# A trailing slash copies the content of the source folder rather than the folder.
+sources = [s + "." if s.endswith("/") else s for s in sources]
+
+with open(os.environ["FAKE_SSH_LOG"], "a") as f:
+    f.write(json.dumps({"program": "rsync", "argv": args, "host": None, "command": rsync_path,
+                        "control": None, "handshake": False}) + "\n")
+
+# The remote side of a real rsync runs "<rsync_path> --server ..." through the remote
+# shell; here "rsync" at the end of rsync_path is replaced by the actual copy.
+remote_prefix = rsync_path[: -len("rsync")]
+if ":" in dest:
+    dest = dest.split(":", 1)[1]
+    # A relative --link-dest is resolved against the destination, like rsync does.
+    if link_dest is not None and not os.path.isdir(os.path.normpath(os.path.join(os.path.expanduser(dest), link_dest))):
+        print(f"rsync: --link-dest arg does not exist: {link_dest}", file=sys.stderr)
+        sys.exit(23)
+    copy = f"cp -R {' '.join(shlex.quote(s) for s in sources)} {dest}"
+else:
+    sources = [s.split(':', 1)[1] for s in sources]
+    copy = f"cp -R {' '.join(sources)} {shlex.quote(dest)}"
+    remote_prefix = ""
+if files_from is not None:
+    # Only the listed files and folders (NUL-separated, relative to the source), with their parents.
+    [source] = sources
+    with open(files_from) as f:
+        files = [path for path in f.read().split("\0") if path]
+    dest = dest.rstrip("/")
+    copy = "; ".join(
+        f"if [ -d {source}/{shlex.quote(path)} ]; then mkdir -p {dest}/{shlex.quote(path)}; else "
+        f"mkdir -p $(dirname {dest}/{shlex.quote(path)}) && cp {source}/{shlex.quote(path)} "
+        f"{dest}/{shlex.quote(path)}; fi"
+        for path in files
+    ) or "true"
+sys.exit(subprocess.run(["bash", "-c", remote_prefix + copy]).returncode)
+'''
+
+
+class FakeSSH:
+    def __init__(self, bin_dir: Path, log: Path):
+        self.bin_dir = bin_dir
+        self.log = log
+
+    def calls(self) -> list[dict]:
+        if not self.log.exists():
+            return []
+        return [json.loads(line) for line in self.log.read_text().splitlines()]
+
+    def handshakes(self) -> int:
+        return sum(call["handshake"] for call in self.calls())
+
+    def add_executable(self, name: str, source: str) -> None:
+        script = self.bin_dir / name
+        script.write_text(f"#!{sys.executable}\n{source}")
+        script.chmod(0o755)
+
+
+@pytest.fixture()
+def fake_ssh(tmp_path, monkeypatch) -> FakeSSH:
+    bin_dir = tmp_path / "fake-bin"
+    bin_dir.mkdir()
+    log = tmp_path / "fake_ssh.log"
+    monkeypatch.setenv("PATH", str(bin_dir), prepend=os.pathsep)
+    monkeypatch.setenv("FAKE_SSH_LOG", str(log))
+    monkeypatch.setenv("FAKE_SSH_HANDSHAKE", "0")
+    fake = FakeSSH(bin_dir=bin_dir, log=log)
+    fake.add_executable("ssh", _FAKE_SSH)
+    return fake
+
+
+@pytest.fixture()
+def fake_rsync(fake_ssh) -> FakeSSH:
+    fake_ssh.add_executable("rsync", _FAKE_RSYNC)
+    return fake_ssh
@@ -0,0 +1,203 @@
+import json
+from pathlib import Path
+
+from slurmpilot.array_chunks import (
+    ArrayChunk,
+    LimitsCache,
+    SlurmLimits,
+    chunks_to_submit,
+    parse_queue,
+    read_chunks,
+    split_array,
+    write_chunks,
+)
+from slurmpilot.config import ClusterConfig, Config
+from slurmpilot.connection_pool import ConnectionPool
+from slurmpilot.job_creation_info import JobCreationInfo
+from slurmpilot.remote_command import CommandResult
+
+from slurmpilot import SlurmPilot
+
+
+class TestSplitArray:
+    def test_fitting_array_is_one_chunk(self):
+        assert split_array(10, SlurmLimits()) == [ArrayChunk(offset=0, size=10)]
+        assert split_array(10, SlurmLimits(max_array_size=10)) == [ArrayChunk(offset=0, size=10)]
+
+    def test_smallest_limit_sets_the_chunk_size(self):
+        chunks = split_array(10, SlurmLimits(max_array_size=4, max_submit_jobs=100))
+        assert [(c.offset, c.size) for c in chunks] == [(0, 4), (4, 4), (8, 2)]
+        chunks = split_array(10, SlurmLimits(max_array_size=1000, max_submit_jobs=3))
+        assert [(c.offset, c.size) for c in chunks] == [(0, 3), (3, 3), (6, 3), (9, 1)]
+
+    def test_parse_limits(self):
+        results = [
+            CommandResult(command="scontrol", return_code=0, stdout="1001\n", stderr=""),
+            CommandResult(command="sacctmgr", return_code=0, stdout="\n5000\n200\n", stderr=""),
+        ]
+        assert SlurmLimits.parse(results) == SlurmLimits(max_array_size=1001, max_submit_jobs=200)
+        failed = CommandResult(command="sacctmgr", return_code=1, stdout="", stderr="sacctmgr: not found")
+        assert SlurmLimits.parse([results[0], failed]) == SlurmLimits(max_array_size=1001)
+
+    def test_limits_cache_expires(self, tmp_path):
+        cache = LimitsCache(tmp_path / "limits.json")
+        cache.put("c", SlurmLimits(max_array_size=5))
+        assert cache.get("c") == SlurmLimits(max_array_size=5)
+        assert cache.get("other") is None
+        assert LimitsCache(tmp_path / "limits.json", ttl=-1).get("c") is None
+
+
+class TestChunksToSubmit:
+    def _chunks(self) -> list[ArrayChunk]:
+        return split_array(9, SlurmLimits(max_array_size=3))
+
+    def test_fill_up_to_the_limit(self):
+        chunks = self._chunks()
+        assert chunks_to_submit(chunks, queued=2, max_submit_jobs=8) == chunks[:2]
+        assert chunks_to_submit(chunks, queued=None, max_submit_jobs=8) == chunks
+
+    def test_first_chunk_is_always_submitted(self):
+        chunks = self._chunks()
+        assert chunks_to_submit(chunks, queued=8, max_submit_jobs=8) == chunks[:1]
+        chunks[0].jobid = 1
+        assert chunks_to_submit(chunks, queued=8, max_submit_jobs=8) == []
+
+    def test_throttled_chunks_go_one_at_a_time(self):
+        chunks = self._chunks()
+        for chunk in chunks:
+            chunk.throttle = 2
+        assert chunks_to_submit(chunks, queued=None, max_submit_jobs=None) == chunks[:1]
+        chunks[0].jobid = 1
+        assert chunks_to_submit(chunks, queued=3, max_submit_jobs=None, live={1, 7}) == []
+        assert chunks_to_submit(chunks, queued=None, max_submit_jobs=None, live=None) == []
+        assert chunks_to_submit(chunks, queued=1, max_submit_jobs=None, live={7}) == chunks[1:2]
+
+    def test_parse_queue(self):
+        assert parse_queue("      3 101\n      1 7\n") == (4, {101, 7})
+        assert parse_queue("") == (0, set())
+
+    def test_cancelled_chunks_are_skipped(self, tmp_path):
+        chunks = self._chunks()
+        chunks[0].jobid = 1
+        chunks[1].cancelled = True
+        assert chunks_to_submit(chunks, queued=0, max_submit_jobs=8) == chunks[2:]
+        write_chunks(tmp_path / "jobid.json", chunks)
+        assert json.loads((tmp_path / "jobid.json").read_text())["jobid"] == 1
+        assert read_chunks(tmp_path / "jobid.json") == chunks
+
+
+# Stand-ins of the Slurm commands: sbatch hands out increasing job ids and logs its arguments,
+# squeue reports the queued jobs whose ids are written in a file, sacct reports every task completed.
+_FAKE_SBATCH = """
+import json, os, sys
+path = os.environ["FAKE_SSH_LOG"] + ".sbatch"
+calls = json.loads(open(path).read()) if os.path.exists(path) else []
+calls.append(sys.argv[1:])
+open(path, "w").write(json.dumps(calls))
+print(f"Submitted batch job {100 + len(calls)}")
+"""
+
+_FAKE_SQUEUE = """
+import os
+path = os.environ["FAKE_SSH_LOG"] + ".queued"
+for jobid in (open(path).read() if os.path.exists(path) else "").split():
+    print(jobid)
+"""
+
+_FAKE_SACCT = """
+import sys
+jobids = [arg.split("=")[1] for arg in sys.argv if arg.startswith("--jobs=")][0].split(",")
+print("JobID|Elapsed|Start|State|NodeList|")
+for jobid in jobids:
+    print(f"{jobid}_0|00:00:01|2026-01-01|COMPLETED|node1|")
+"""
+
+_FAKE_SCANCEL = """
+import os, sys
+open(os.environ["FAKE_SSH_LOG"] + ".scancel", "a").write(" ".join(sys.argv[1:]))
+"""
+
+
+class TestChunkedSubmission:
+    def _slurm(self, tmp_path: Path, fake_rsync, **options) -> SlurmPilot:
+        for name, source in [("sbatch", _FAKE_SBATCH), ("squeue", _FAKE_SQUEUE), ("sacct", _FAKE_SACCT),
+                             ("scancel", _FAKE_SCANCEL)]:
+            fake_rsync.add_executable(name, source)
+        cluster = ClusterConfig(
+            host="fakehost", remote_path=str(tmp_path / "remote"), ssh_multiplexing=False, **options
+        )
+        return SlurmPilot(
+            config=Config(local_path=tmp_path / "local", cluster_configs={"c": cluster}),
+            clusters=["c"], pool=ConnectionPool(),
+        )
+
+    def _job(self, tmp_path: Path, n_tasks: int, n_concurrent_jobs: int | None = None) -> JobCreationInfo:
+        src = tmp_path / "src"
+        src.mkdir(exist_ok=True)
+        (src / "main.py").write_text("print('hi')\n")
+        return JobCreationInfo(
+            jobname="sweep", entrypoint="main.py", src_dir=str(src), cluster="c",
+            python_args=[f"--i={i}" for i in range(n_tasks)], n_concurrent_jobs=n_concurrent_jobs,
+        )
+
+    def _sbatch_calls(self, tmp_path: Path) -> list[list[str]]:
+        return json.loads((tmp_path / "fake_ssh.log.sbatch").read_text())
+
+    def test_chunks_trickle_in_as_the_queue_drains(self, fake_rsync, tmp_path):
+        slurm = self._slurm(tmp_path, fake_rsync, max_array_size=3, max_submit_jobs=4)
+        assert slurm.schedule_job(self._job(tmp_path, 7)) == 101
+        [first] = self._sbatch_calls(tmp_path)
+        assert first[0] == "--array=0-2"
+        assert any("SP_ARRAY_OFFSET=0" in arg for arg in first)
+
+        # The first chunk still fills the queue: nothing more is submitted.
+        (tmp_path / "fake_ssh.log.queued").write_text("101 101 101")
+        assert slurm.status(["sweep"]) == ["PENDING"]
+        assert len(self._sbatch_calls(tmp_path)) == 1
+
+        # Once the last chunks are submitted, the job is done when all of them are.
+        (tmp_path / "fake_ssh.log.queued").write_text("")
+        assert slurm.status(["sweep"]) == ["COMPLETED"]
+        second, third = self._sbatch_calls(tmp_path)[1:]
+        assert second[0] == "--array=0-2" and any("SP_ARRAY_OFFSET=3" in arg for arg in second)
+        assert third[0] == "--array=0-0" and any("SP_ARRAY_OFFSET=6" in arg for arg in third)
+
+        rows = slurm.sacct_info(["sweep"])
+        assert [(row["jobid"], row["task_id"]) for row in rows] == [("101", 0), ("102", 3), ("103", 6)]
+
+    def test_limits_are_discovered_once(self, fake_rsync, tmp_path):
+        fake_rsync.add_executable("scontrol", "print('MaxArraySize            = 5')")
+        fake_rsync.add_executable("sacctmgr", "print('')")
+        slurm = self._slurm(tmp_path, fake_rsync)
+        slurm.schedule_job(self._job(tmp_path, 12))
+        assert [call[0] for call in self._sbatch_calls(tmp_path)] == ["--array=0-4", "--array=0-4", "--array=0-1"]
+        assert slurm._limits["c"] == SlurmLimits(max_array_size=5)
+        # Other instances read them from the local cache, without a connection.
+        assert self._slurm(tmp_path, fake_rsync)._slurm_limits("c", None) == SlurmLimits(max_array_size=5)
+
+    def test_throttled_chunks_advance_from_sacct_info(self, fake_rsync, tmp_path):
+        slurm = self._slurm(tmp_path, fake_rsync, max_array_size=3, max_submit_jobs=100)
+        slurm.schedule_job(self._job(tmp_path, 7, n_concurrent_jobs=2))
+        assert [call[0] for call in self._sbatch_calls(tmp_path)] == ["--array=0-2%2"]
+
+        # The first chunk is still running: the next one would run two more tasks at once.
+        (tmp_path / "fake_ssh.log.queued").write_text("101 101")
+        slurm.sacct_info(["sweep"])
+        assert len(self._sbatch_calls(tmp_path)) == 1
+
+        (tmp_path / "fake_ssh.log.queued").write_text("")
+        rows = slurm.sacct_info(["sweep"])
+        assert [call[0] for call in self._sbatch_calls(tmp_path)] == ["--array=0-2%2"] * 2
+        assert [row["jobid"] for row in rows] == ["101", "102"]
+
+    def test_stop_cancels_submitted_and_pending_chunks(self, fake_rsync, tmp_path):
+        slurm = self._slurm(tmp_path, fake_rsync, max_array_size=3, max_submit_jobs=3)
+        slurm.schedule_job(self._job(tmp_path, 9))
+        (tmp_path / "fake_ssh.log.queued").write_text("")
+        slurm.status(["sweep"])
+        slurm.stop_job("sweep")
+        assert (tmp_path / "fake_ssh.log.scancel").read_text() == "101 102"
+        chunks = read_chunks(tmp_path / "local" / "jobs" / "sweep" / "jobid.json")
+        assert [(chunk.jobid, chunk.cancelled) for chunk in chunks] == [(101, False), (102, False), (None, True)]
+        assert slurm.status(["sweep"]) == ["COMPLETED"]
+        assert len(self._sbatch_calls(tmp_path)) == 2
@@ -0,0 +1,162 @@
+import asyncio
+import time
+from pathlib import Path
+
+import pytest
+from slurmpilot.async_remote_command import AsyncLocalExecution, AsyncSSHExecution
+from slurmpilot.remote_command import RetryPolicy
+
+# ---------------------------------------------------------------------------
+# AsyncLocalExecution
+# ---------------------------------------------------------------------------
+
+class TestAsyncLocalExecution:
+    def setup_method(self):
+        self.exe = AsyncLocalExecution()
+
+    def test_run_success(self):
+        result = asyncio.run(self.exe.run("echo hello"))
+        assert not result.failed
+        assert result.stdout == "hello\n"
+
+    def test_run_failure(self):
+        result = asyncio.run(self.exe.run("echo oops >&2; exit 3"))
+        assert result.return_code == 3
+        assert result.stderr == "oops\n"
+
+    def test_run_many(self):
+        results = asyncio.run(self.exe.run_many(["echo a", "exit 1", "echo c"]))
+        assert [r.return_code for r in results] == [0, 1, 0]
+        assert results[2].stdout == "c\n"
+
+    def test_upload_and_download_folder(self, tmp_path):
+        src = tmp_path / "src"
+        (src / "sub").mkdir(parents=True)
+        (src / "sub" / "file.txt").write_text("hello")
+        asyncio.run(self.exe.upload_folder(src, tmp_path / "remote"))
+        assert (tmp_path / "remote" / "src" / "sub" / "file.txt").read_text() == "hello"
+        asyncio.run(self.exe.download_folder(tmp_path / "remote" / "src", tmp_path / "back"))
+        assert (tmp_path / "back" / "src" / "sub" / "file.txt").read_text() == "hello"
+
+    def test_commands_run_concurrently(self):
+        async def three_sleeps():
+            return await asyncio.gather(*(self.exe.run("sleep 0.3") for _ in range(3)))
+
+        loop_start = asyncio.run(_timed(three_sleeps()))
+        assert loop_start < 0.8
+
+
+async def _timed(coroutine) -> float:
+    start = asyncio.get_running_loop().time()
+    await coroutine
+    return asyncio.get_running_loop().time() - start
+
+
+# ---------------------------------------------------------------------------
+# AsyncSSHExecution
+# ---------------------------------------------------------------------------
+
+class TestAsyncSSHExecution:
+    def test_ssh_command_matches_sync_executor(self):
+        exe = AsyncSSHExecution(host="cluster.example.com", user="alice")
+        assert exe._ssh_command("hostname") == ["ssh", "alice@cluster.example.com", "hostname"]
+
+    def test_run_through_stand_in(self, fake_ssh):
+        result = asyncio.run(AsyncSSHExecution(host="fakehost").run("echo hello"))
+        assert result.stdout == "hello"
+        assert fake_ssh.calls()[0]["host"] == "fakehost"
+
+    def test_env_is_forwarded(self, fake_ssh):
+        result = asyncio.run(AsyncSSHExecution(host="fakehost").run("printenv FOO", env={"FOO": "a b"}))
+        assert result.stdout == "a b"
+
+    def test_run_many_is_one_ssh_call(self, fake_ssh):
+        results = asyncio.run(AsyncSSHExecution(host="fakehost").run_many(["echo 1", "echo 2"]))
+        assert [r.stdout for r in results] == ["1", "2"]
+        assert len(fake_ssh.calls()) == 1
+
+    def test_clusters_are_queried_concurrently(self, fake_ssh, monkeypatch):
+        monkeypatch.setenv("FAKE_SSH_HANDSHAKE", "0.3")
+        hosts = [AsyncSSHExecution(host=f"host{i}") for i in range(4)]
+
+        async def query_all():
+            return await asyncio.gather(*(h.run("hostname") for h in hosts))
+
+        assert asyncio.run(_timed(query_all())) < 1.0
+
+    def test_upload_is_a_single_rsync(self, fake_rsync, tmp_path):
+        src = tmp_path / "src"
+        src.mkdir()
+        (src / "f").write_text("x")
+        asyncio.run(AsyncSSHExecution(host="fakehost").upload_folder(src, tmp_path / "new" / "dest"))
+        assert (tmp_path / "new" / "dest" / "src" / "f").read_text() == "x"
+        assert len(fake_rsync.calls()) == 1
+
+    def test_tar_round_trip(self, fake_ssh, tmp_path):
+        src = tmp_path / "src"
+        src.mkdir()
+        (src / "f").write_text("x")
+        exe = AsyncSSHExecution(host="fakehost", transfer="tar")
+        asyncio.run(exe.upload_folder(src, tmp_path / "remote"))
+        asyncio.run(exe.download_folder(tmp_path / "remote" / "src", tmp_path / "back"))
+        assert (tmp_path / "back" / "src" / "f").read_text() == "x"
+        assert [call["program"] for call in fake_ssh.calls()] == ["ssh", "ssh"]
+
+    def test_sharded_round_trip(self, fake_rsync, tmp_path):
+        src = tmp_path / "src"
+        (src / "pkg").mkdir(parents=True)
+        for i in range(6):
+            (src / "pkg" / f"f{i}").write_text("x" * i)
+        exe = AsyncSSHExecution(host="fakehost", parallel_transfers=2)
+        progress = []
+        asyncio.run(exe.upload_folder(src, tmp_path / "remote", progress=lambda *a: progress.append(a)))
+        asyncio.run(exe.download_folder(tmp_path / "remote" / "src", tmp_path / "back"))
+        back = tmp_path / "back" / "src" / "pkg"
+        assert [(back / f"f{i}").read_text() for i in range(6)] == ["x" * i for i in range(6)]
+        assert [call["program"] for call in fake_rsync.calls()] == ["rsync"] * 2 + ["ssh"] + ["rsync"] * 2
+        assert progress[-1] == (15, 15)
+
+    def test_upload_raises_when_destination_cannot_be_created(self, fake_rsync, tmp_path):
+        exe = AsyncSSHExecution(host="fakehost")
+        with pytest.raises(RuntimeError, match="rsync upload failed"):
+            asyncio.run(exe.upload_folder(tmp_path, Path("/proc/forbidden/dir")))
+
+    def test_only_transport_failures_are_retried(self, fake_ssh):
+        exe = AsyncSSHExecution(host="fakehost", retry_policy=RetryPolicy(base_delay=0))
+        assert asyncio.run(exe.run("exit 3", retries=2)).return_code == 3
+        assert len(fake_ssh.calls()) == 1
+        assert asyncio.run(exe.run("exit 255", retries=2)).transport_failed
+        assert len(fake_ssh.calls()) == 4
+
+    def test_timeout_kills_command(self, fake_ssh):
+        exe = AsyncSSHExecution(host="fakehost", timeout=0.5)
+        result = asyncio.run(exe.run("echo partial; sleep 30"))
+        assert result.timed_out
+        assert result.stdout == "partial"
+
+    def test_dead_cluster_does_not_block_others(self, fake_ssh):
+        hosts = [AsyncSSHExecution(host="alive", timeout=0.5), AsyncSSHExecution(host="hung", timeout=0.5)]
+        commands = ["echo up", "sleep 30"]
+
+        async def query_all():
+            return await asyncio.gather(*(h.run(c) for h, c in zip(hosts, commands)))
+
+        start = time.monotonic()
+        alive, hung = asyncio.run(query_all())
+        assert time.monotonic() - start < 5
+        assert alive.stdout == "up"
+        assert hung.timed_out
+
+    def test_cancellation_kills_process(self, tmp_path):
+        marker = tmp_path / "finished"
+
+        async def cancel_soon():
+            task = asyncio.ensure_future(AsyncLocalExecution().run(f"sleep 1; touch {marker}"))
+            await asyncio.sleep(0.2)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            await asyncio.sleep(1.5)
+
+        asyncio.run(cancel_soon())
+        assert not marker.exists()
@@ -2,7 +2,7 @@
 import argparse
 import json
 from pathlib import Path
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 
 import pytest
 
@@ -202,7 +202,7 @@ _MOCK_SACCT_INFO = [{
 def test_cmd_list_jobs_shows_table(job, config, capsys):
     args = argparse.Namespace(n=10, clusters=None, collapse_job_array=False)
     with patch("slurmpilot.cli.SlurmPilot") as MockSP:
-        MockSP.return_value.sacct_info.return_value = _MOCK_SACCT_INFO
+        MockSP.return_value.sacct_info_async = AsyncMock(return_value=_MOCK_SACCT_INFO)
         cmd_list_jobs(args, config)
     out = capsys.readouterr().out
     assert "job-2026-01-01" in out
@@ -225,7 +225,7 @@ def test_cmd_list_jobs_filters_by_cluster(job, config, capsys):
 def test_cmd_test_ssh_success(config, capsys):
     args = argparse.Namespace(clusters=["mock"])
     with patch("slurmpilot.cli.SlurmPilot") as MockSP:
-        MockSP.return_value.test_ssh.return_value = True
+        MockSP.return_value.test_ssh_async = AsyncMock(return_value=True)
         cmd_test_ssh(args, config)
     assert "✅" in capsys.readouterr().out
 
@@ -233,7 +233,7 @@ def test_cmd_test_ssh_success(config, capsys):
 def test_cmd_test_ssh_failure(config, capsys):
     args = argparse.Namespace(clusters=["badhost"])
     with patch("slurmpilot.cli.SlurmPilot") as MockSP:
-        MockSP.return_value.test_ssh.return_value = False
+        MockSP.return_value.test_ssh_async = AsyncMock(return_value=False)
         cmd_test_ssh(args, config)
     assert "❌" in capsys.readouterr().out
 
@@ -245,7 +245,7 @@ def test_cmd_test_ssh_failure(config, capsys):
 def test_cmd_stop_all_cancels_jobs(job, config, capsys):
     args = argparse.Namespace(clusters=[CLUSTER])
     with patch("slurmpilot.cli.SlurmPilot") as MockSP:
-        MockSP.return_value.stop_all_jobs.return_value = [JOBNAME]
+        MockSP.return_value.stop_all_jobs_async = AsyncMock(return_value=[JOBNAME])
         cmd_stop_all(args, config)
     out = capsys.readouterr().out
     assert "🛑" in out
@@ -255,7 +255,7 @@ def test_cmd_stop_all_cancels_jobs(job, config, capsys):
 def test_cmd_stop_all_no_jobs(config, capsys):
     args = argparse.Namespace(clusters=[CLUSTER])
     with patch("slurmpilot.cli.SlurmPilot") as MockSP:
-        MockSP.return_value.stop_all_jobs.return_value = []
+        MockSP.return_value.stop_all_jobs_async = AsyncMock(return_value=[])
         cmd_stop_all(args, config)
     assert "No jobs to stop" in capsys.readouterr().out
 
@@ -467,3 +467,50 @@ def test_launch_cli_python_libraries_no_yaml(tmp_path):
     )
     job_info = _build_job_info(args)
     assert job_info.python_libraries == [str(lib)]
+
+
+def test_launch_cli_exclude_added_to_yaml(tmp_path):
+    """--exclude patterns are added to the exclude list of the YAML."""
+    from slurmpilot.cli import _LAUNCH_FIELDS, _build_job_info
+
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "run.sh").write_text("#!/bin/bash\necho hi\n")
+
+    yaml_file = tmp_path / "job.yaml"
+    yaml_file.write_text(
+        f"cluster: mock\n"
+        f"entrypoint: run.sh\n"
+        f"jobname: test-job\n"
+        f"src_dir: {src}\n"
+        f"exclude:\n"
+        f"  - data/\n"
+    )
+
+    args = argparse.Namespace(
+        config=str(yaml_file),
+        jobname_method=None,
+        python_libraries=None,
+        exclude=["*.ckpt"],
+        **{flag.lstrip("-").replace("-", "_"): None for flag, *_ in _LAUNCH_FIELDS},
+    )
+    job_info = _build_job_info(args)
+    assert job_info.exclude == ["data/", "*.ckpt"]
+
+
+def test_launch_cli_ignore_flags(tmp_path):
+    """--use-gitignore and --ship-git turn on the options left off by the YAML."""
+    from slurmpilot.cli import _LAUNCH_FIELDS, _build_job_info
+
+    yaml_file = tmp_path / "job.yaml"
+    yaml_file.write_text("cluster: mock\nentrypoint: run.sh\njobname: test-job\nship_git: true\n")
+    args = argparse.Namespace(
+        config=str(yaml_file),
+        jobname_method=None,
+        python_libraries=None,
+        use_gitignore=True,
+        ship_git=False,
+        **{flag.lstrip("-").replace("-", "_"): None for flag, *_ in _LAUNCH_FIELDS},
+    )
+    job_info = _build_job_info(args)
+    assert job_info.use_gitignore and job_info.ship_git
@@ -105,6 +105,12 @@ class TestLoadConfig:
         config = load_config(tmp_path)
         assert config.default_cluster == "gpu_cluster"
 
+    def test_loads_snapshot_mode_from_general_yaml(self, tmp_path):
+        write_general(tmp_path / "general.yaml", snapshot_mode="auto")
+        assert load_config(tmp_path).snapshot_mode == "auto"
+        (tmp_path / "general.yaml").unlink()
+        assert load_config(tmp_path).snapshot_mode == "reflink"
+
     def test_loads_cluster_host(self, tmp_path):
         write_cluster(tmp_path / "clusters", "mycluster", host="login.hpc.org")
         config = load_config(tmp_path)
@@ -0,0 +1,190 @@
+import subprocess
+from unittest.mock import patch
+
+from slurmpilot.config import ClusterConfig, Config
+from slurmpilot.connection_pool import ConnectionPool, default_pool
+from slurmpilot.remote_command import CommandTimeoutError, SSHExecution
+
+from slurmpilot import SlurmPilot
+
+
+def make_config(tmp_path, **cluster_configs) -> Config:
+    return Config(local_path=tmp_path, cluster_configs=cluster_configs)
+
+
+class TestConnectionPool:
+    def test_same_key_returns_same_connection(self):
+        pool = ConnectionPool()
+        assert pool.get("host", "alice") is pool.get("host", "alice")
+        assert len(pool) == 1
+
+    def test_different_keys_get_different_connections(self):
+        pool = ConnectionPool()
+        assert pool.get("host", "alice") is not pool.get("host", "bob")
+        assert pool.get("host", "alice") is not pool.get("other", "alice")
+        assert len(pool) == 3
+
+    def test_options_forwarded_on_creation(self):
+        pool = ConnectionPool()
+        connection = pool.get("host", multiplex=True, control_persist="1h")
+        assert connection.multiplex
+        assert connection.control_persist == "1h"
+
+    def test_different_options_get_different_connections(self):
+        pool = ConnectionPool()
+        plain = pool.get("host", timeout=10)
+        assert pool.get("host", timeout=10) is plain
+        assert pool.get("host", timeout=20).timeout == 20
+        assert pool.get("host", multiplex=True) is not plain
+        assert len(pool) == 3 and ("host", None) in pool
+
+    def test_idle_connections_are_evicted_and_closed(self):
+        pool = ConnectionPool(max_idle_seconds=10)
+        with patch("slurmpilot.connection_pool.time.monotonic", return_value=0.0):
+            connection = pool.get("host")
+        with patch.object(SSHExecution, "close") as close, \
+                patch("slurmpilot.connection_pool.time.monotonic", return_value=11.0):
+            assert pool.evict_idle() == 1
+        close.assert_called_once()
+        assert ("host", None) not in pool
+        assert pool.get("host") is not connection
+
+    def test_recently_used_connections_are_kept(self):
+        pool = ConnectionPool(max_idle_seconds=10)
+        with patch("slurmpilot.connection_pool.time.monotonic", return_value=0.0):
+            pool.get("host")
+        with patch("slurmpilot.connection_pool.time.monotonic", return_value=5.0):
+            assert pool.evict_idle() == 0
+
+    def test_connections_in_use_are_kept(self):
+        pool = ConnectionPool(max_idle_seconds=10, health_check_after=1)
+        with patch("slurmpilot.connection_pool.time.monotonic", return_value=0.0):
+            connection = pool.get("host")
+            other = pool.get("other")
+        with patch.object(SSHExecution, "is_healthy") as probe, \
+                patch("slurmpilot.connection_pool.time.monotonic", return_value=20.0):
+            # A long upload started at 0 is still running on the connection.
+            with connection._use():
+                with patch.object(SSHExecution, "close") as close:
+                    assert pool.get("other") is not other
+                close.assert_called_once()
+                assert pool.get("host") is connection
+            probe.assert_not_called()
+            # Idle time counts from the end of the last call.
+            with patch.object(SSHExecution, "close") as close:
+                assert pool.evict_idle() == 0
+        close.assert_not_called()
+        with patch.object(SSHExecution, "close"), \
+                patch("slurmpilot.connection_pool.time.monotonic", return_value=31.0):
+            assert pool.evict_idle() == 2
+
+    def test_calls_count_as_use(self, fake_ssh):
+        connection = SSHExecution(host="fakehost")
+        seen = []
+
+        def run_process(args, **kwargs):
+            seen.append(connection.in_use)
+            return subprocess.CompletedProcess(args, 0, "", "")
+
+        with patch("slurmpilot.remote_command._run_process", side_effect=run_process):
+            connection.run("true")
+        assert seen == [True] and not connection.in_use
+        lines = connection.stream("echo hi")
+        assert next(lines).strip() == "hi" and connection.in_use
+        lines.close()
+        assert not connection.in_use
+
+    def test_unhealthy_connection_is_replaced_after_idle(self):
+        pool = ConnectionPool(health_check_after=1)
+        with patch("slurmpilot.connection_pool.time.monotonic", return_value=0.0):
+            connection = pool.get("host")
+        with patch.object(SSHExecution, "is_healthy", return_value=False), \
+                patch.object(SSHExecution, "close"), \
+                patch("slurmpilot.connection_pool.time.monotonic", return_value=2.0):
+            assert pool.get("host") is not connection
+
+    def test_healthy_connection_is_reused_after_idle(self):
+        pool = ConnectionPool(health_check_after=1)
+        with patch("slurmpilot.connection_pool.time.monotonic", return_value=0.0):
+            connection = pool.get("host")
+        with patch.object(SSHExecution, "is_healthy", return_value=True) as probe, \
+                patch("slurmpilot.connection_pool.time.monotonic", return_value=2.0):
+            assert pool.get("host") is connection
+        probe.assert_called_once()
+
+    def test_probe_does_not_hold_the_pool_lock(self):
+        pool = ConnectionPool(health_check_after=1)
+        with patch("slurmpilot.connection_pool.time.monotonic", return_value=0.0):
+            pool.get("host")
+        locked = []
+        with patch.object(SSHExecution, "is_healthy", side_effect=lambda: locked.append(pool._lock.locked()) or True), \
+                patch("slurmpilot.connection_pool.time.monotonic", return_value=2.0):
+            pool.get("host")
+        assert locked == [False]
+
+    def test_no_health_check_when_recently_used(self):
+        pool = ConnectionPool(health_check_after=60)
+        pool.get("host")
+        with patch.object(SSHExecution, "is_healthy") as probe:
+            pool.get("host")
+        probe.assert_not_called()
+
+    def test_context_manager_closes_connections(self):
+        with patch.object(SSHExecution, "close") as close:
+            with ConnectionPool() as pool:
+                pool.get("a")
+                pool.get("b")
+            assert close.call_count == 2
+        assert len(pool) == 0
+
+    def test_is_healthy_detects_transport_failure(self, fake_ssh):
+        assert SSHExecution(host="fakehost").is_healthy()
+        with patch("slurmpilot.remote_command._run_process") as run:
+            run.return_value.returncode = 255
+            run.return_value.stdout = ""
+            run.return_value.stderr = "ssh: connect to host fakehost: Connection refused"
+            assert not SSHExecution(host="fakehost").is_healthy()
+
+    def test_hung_connection_is_unhealthy(self, fake_ssh):
+        with patch("slurmpilot.remote_command._run_process", side_effect=CommandTimeoutError("ssh", 1.0, "")):
+            assert not SSHExecution(host="fakehost", timeout=1.0).is_healthy()
+
+
+class TestSlurmPilotPooling:
+    def test_instances_share_connections(self, tmp_path):
+        pool = ConnectionPool()
+        config = make_config(tmp_path, c=ClusterConfig(host="login.example.com", user="alice"))
+        first = SlurmPilot(config=config, clusters=["c"], pool=pool)
+        second = SlurmPilot(config=config, clusters=["c"], pool=pool)
+        assert first._connections["c"] is second._connections["c"]
+
+    def test_connections_are_created_lazily(self, tmp_path):
+        pool = ConnectionPool()
+        SlurmPilot(config=make_config(tmp_path), clusters=["somehost"], pool=pool)
+        assert len(pool) == 0
+
+    def test_default_pool_is_process_wide(self, tmp_path):
+        first = SlurmPilot(config=make_config(tmp_path), clusters=["shared-host"])
+        second = SlurmPilot(config=make_config(tmp_path), clusters=["shared-host"])
+        assert first._connections["shared-host"] is second._connections["shared-host"]
+        assert ("shared-host", None) in default_pool()
+
+    def test_local_cluster_does_not_use_pool(self, tmp_path):
+        pool = ConnectionPool()
+        slurm = SlurmPilot(config=make_config(tmp_path), clusters=["local"], pool=pool)
+        assert slurm._connections["local"] is slurm._connections["local"]
+        assert len(pool) == 0
+
+    def test_cluster_timeouts_are_forwarded(self, tmp_path):
+        cluster = ClusterConfig(host="login.example.com", command_timeout=30, transfer_timeout=600)
+        slurm = SlurmPilot(config=make_config(tmp_path, c=cluster), clusters=["c"], pool=ConnectionPool())
+        assert slurm._connections["c"].timeout == 30
+        assert slurm._connections["c"].transfer_timeout == 600
+        assert slurm._async_connection("c").timeout == 30
+
+    def test_cluster_retry_delay_is_forwarded(self, tmp_path):
+        cluster = ClusterConfig(host="login.example.com", retries=3, retry_max_delay=5)
+        slurm = SlurmPilot(config=make_config(tmp_path, c=cluster), clusters=["c"], pool=ConnectionPool())
+        assert slurm._connections["c"].retry_policy.max_delay == 5
+        assert slurm._async_connection("c").retry_policy.max_delay == 5
+        assert slurm._retries("c") == 3
@@ -0,0 +1,107 @@
+import shutil
+from pathlib import Path
+
+import pytest
+from slurmpilot.config import Config
+from slurmpilot.ignore import IgnoreRules, ignore_function
+from slurmpilot.job_creation_info import JobCreationInfo
+
+from slurmpilot import SlurmPilot
+
+
+def files(root: Path) -> set[str]:
+    return {p.relative_to(root).as_posix() for p in root.rglob("*") if p.is_file()}
+
+
+def write(root: Path, *paths: str) -> None:
+    for path in paths:
+        (root / path).parent.mkdir(parents=True, exist_ok=True)
+        (root / path).write_text(path)
+
+
+class TestIgnoreRules:
+    @pytest.mark.parametrize("pattern, path, is_dir, expected", [
+        ("*.pyc", "a.pyc", False, True),
+        ("*.pyc", "pkg/sub/a.pyc", False, True),
+        ("*.pyc", "a.py", False, None),
+        ("/build", "build", True, True),
+        ("/build", "pkg/build", True, None),
+        ("data/", "data", True, True),
+        ("data/", "data", False, None),
+        ("data/", "pkg/data", True, True),
+        ("doc/*.txt", "doc/a.txt", False, True),
+        ("doc/*.txt", "doc/sub/a.txt", False, None),
+        ("**/logs", "a/b/logs", True, True),
+        ("**/logs", "logs", True, True),
+        ("out/**", "out/a/b.txt", False, True),
+        ("a/**/b", "a/x/y/b", False, True),
+        ("a/**/b", "a/b", False, True),
+        ("file?.txt", "file1.txt", False, True),
+        ("file[0-9].txt", "filex.txt", False, None),
+        ("file[!0-9].txt", "filex.txt", False, True),
+        ("\\#notes", "#notes", False, True),
+        ("# comment", "# comment", False, None),
+    ])
+    def test_match(self, pattern, path, is_dir, expected):
+        assert IgnoreRules([pattern]).match(path, is_dir) is expected
+
+    def test_last_match_wins(self):
+        rules = IgnoreRules(["*.log", "!keep.log"])
+        assert rules.match("debug.log", False) is True
+        assert rules.match("keep.log", False) is False
+
+
+class TestIgnoreFunction:
+    def test_copytree_honours_ignore_files(self, tmp_path):
+        src = tmp_path / "src"
+        write(
+            src, "main.py", "main.pyc", ".git/HEAD", "data/big.bin", "pkg/util.py",
+            "pkg/__pycache__/util.pyc", "pkg/out.log", "pkg/keep.log", "model.ckpt",
+        )
+        (src / ".gitignore").write_text("__pycache__/\n*.pyc\n/data\n")
+        (src / ".slurmpilotignore").write_text("*.log\n")
+        (src / "pkg" / ".gitignore").write_text("!keep.log\n")
+
+        ignore = ignore_function(src, exclude=["*.ckpt"], use_gitignore=True)
+        shutil.copytree(src, tmp_path / "dst", ignore=ignore)
+        assert files(tmp_path / "dst") == {
+            "main.py", "pkg/util.py", "pkg/keep.log", ".gitignore", ".slurmpilotignore", "pkg/.gitignore",
+        }
+
+    def test_gitignore_is_opt_in(self, tmp_path):
+        src = tmp_path / "src"
+        write(src, "main.py", "data/big.bin", "debug.log")
+        (src / ".gitignore").write_text("/data\n")
+        (src / ".slurmpilotignore").write_text("*.log\n")
+        shutil.copytree(src, tmp_path / "dst", ignore=ignore_function(src))
+        assert files(tmp_path / "dst") == {"main.py", "data/big.bin", ".gitignore", ".slurmpilotignore"}
+
+    def test_git_folder_ignored_unless_shipped(self, tmp_path):
+        src = tmp_path / "src"
+        write(src, "main.py", ".git/config", "sub/.git/config")
+        shutil.copytree(src, tmp_path / "dst", ignore=ignore_function(src))
+        assert files(tmp_path / "dst") == {"main.py"}
+        shutil.copytree(src, tmp_path / "dst_git", ignore=ignore_function(src, ship_git=True))
+        assert files(tmp_path / "dst_git") == {"main.py", ".git/config", "sub/.git/config"}
+
+
+class TestScheduleJobExcludes:
+    def test_excluded_files_are_not_shipped(self, tmp_path):
+        src = tmp_path / "src"
+        lib = tmp_path / "mylib"
+        write(src, "main.py", "checkpoints/model.pt", "notes.txt")
+        write(lib, "mylib/__init__.py", "mylib/__pycache__/x.pyc")
+        (src / ".slurmpilotignore").write_text("checkpoints/\n")
+        (lib / ".gitignore").write_text("__pycache__/\n")
+
+        slurm = SlurmPilot(config=Config(local_path=tmp_path / "sp"), clusters=["mock"])
+        slurm.schedule_job(
+            JobCreationInfo(
+                jobname="job", entrypoint="main.py", src_dir=str(src), cluster="mock",
+                python_libraries=[str(lib)], exclude=["*.txt"], use_gitignore=True,
+            ),
+            dryrun=True,
+        )
+        job_dir = tmp_path / "sp" / "jobs" / "job"
+        assert files(job_dir / "src") == {"main.py", ".slurmpilotignore"}
+        assert files(job_dir / "mylib") == {"mylib/__init__.py", ".gitignore"}
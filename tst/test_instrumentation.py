@@ -0,0 +1,172 @@
+import json
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+from slurmpilot.config import Config
+from slurmpilot.instrumentation import (
+    InMemoryCollector,
+    JsonLinesSink,
+    Span,
+    SpanListener,
+    record_span,
+)
+from slurmpilot.job_creation_info import JobCreationInfo
+from slurmpilot.remote_command import CommandResult, LocalExecution, RemoteExecution, SSHExecution
+
+from slurmpilot import SlurmPilot
+
+
+class _RecordingConnection(RemoteExecution):
+    """Answers sbatch/sacct/scancel with canned output."""
+
+    def run(self, command: str, env: dict | None = None, retries: int = 0, timeout=None) -> CommandResult:
+        stdout = ""
+        if "sbatch" in command:
+            stdout = "Submitted batch job 7"
+        elif "sacct" in command:
+            stdout = "JobID|Elapsed|Start|State|NodeList|\n7|00:00:05|2024-01-01T10:00:00|RUNNING|node1|"
+        return CommandResult(command=command, stdout=stdout, stderr="", return_code=0)
+
+    def upload_folder(
+        self, local_path: Path, remote_path: Path, timeout=None, link_dest=None, files=None, settings=None
+    ) -> None:
+        pass
+
+    def download_folder(self, remote_path: Path, local_path: Path, timeout=None, progress=None) -> None:
+        pass
+
+
+def _job(tmp_path: Path, cluster: str) -> JobCreationInfo:
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "main.sh").write_text("#!/bin/bash\necho hello\n")
+    return JobCreationInfo(jobname="job", entrypoint="main.sh", src_dir=str(src), cluster=cluster)
+
+
+class TestRecordSpan:
+    def test_duration_and_attributes(self):
+        collector = InMemoryCollector()
+        with record_span([collector], "sbatch", "c", jobname="j") as span:
+            span.return_code = 0
+        [span] = collector.spans
+        assert span.operation == "sbatch" and span.cluster == "c"
+        assert span.attributes == {"jobname": "j"}
+        assert span.duration >= 0 and span.return_code == 0
+
+    def test_exception_is_recorded_and_propagated(self):
+        collector = InMemoryCollector()
+        with pytest.raises(ValueError):
+            with record_span([collector], "upload"):
+                raise ValueError("disk full")
+        assert collector.spans[0].error == "ValueError: disk full"
+
+    def test_failing_listener_does_not_break_operation(self):
+        class Broken(SpanListener):
+            def on_span(self, span: Span) -> None:
+                raise RuntimeError("dashboard down")
+
+        collector = InMemoryCollector()
+        with record_span([Broken(), collector], "run"):
+            pass
+        assert len(collector.spans) == 1
+
+
+class TestJsonLinesSink:
+    def test_one_line_per_span(self, tmp_path):
+        sink = JsonLinesSink(tmp_path / "spans" / "out.jsonl")
+        for operation in ["run", "upload"]:
+            with record_span([sink], operation, "c", jobs=3):
+                pass
+        lines = [json.loads(line) for line in (tmp_path / "spans" / "out.jsonl").read_text().splitlines()]
+        assert [line["operation"] for line in lines] == ["run", "upload"]
+        assert lines[0]["attributes"] == {"jobs": 3}
+
+
+class TestExecutorSpans:
+    def test_no_listener_no_overhead(self):
+        assert LocalExecution().listeners == []
+
+    def test_local_run_and_run_many(self):
+        exe = LocalExecution()
+        collector = InMemoryCollector()
+        exe.listeners.append(collector)
+        exe.run("exit 2")
+        exe.run_many(["true", "false"])
+        run, run_many = collector.spans
+        assert (run.operation, run.cluster, run.return_code) == ("run", "local", 2)
+        assert (run_many.operation, run_many.return_code) == ("run_many", 1)
+
+    def test_upload_and_download_report_bytes(self, tmp_path):
+        src = tmp_path / "src"
+        src.mkdir()
+        (src / "data.bin").write_bytes(b"x" * 1000)
+        exe = LocalExecution()
+        collector = InMemoryCollector()
+        exe.listeners.append(collector)
+        exe.upload_folder(src, tmp_path / "remote")
+        exe.download_folder(tmp_path / "remote" / "src", tmp_path / "back")
+        assert [(s.operation, s.bytes_transferred) for s in collector.spans] == [
+            ("upload", 1000), ("download", 1000)
+        ]
+
+    @patch("slurmpilot.remote_command.time.sleep")
+    @patch("slurmpilot.remote_command._run_process")
+    def test_ssh_retries_are_counted(self, mock_run, mock_sleep):
+        def proc(returncode):
+            m = MagicMock()
+            m.stdout, m.stderr, m.returncode = "", "", returncode
+            return m
+
+        mock_run.side_effect = [proc(255), proc(255), proc(0)]
+        exe = SSHExecution(host="login.example.com")
+        collector = InMemoryCollector()
+        exe.listeners.append(collector)
+        exe.run("hostname", retries=3)
+        [span] = collector.spans
+        assert span.cluster == "login.example.com"
+        assert span.retries == 2 and span.return_code == 0
+
+
+class TestSlurmPilotSpans:
+    def _slurm(self, tmp_path: Path, cluster: str, collector: InMemoryCollector) -> SlurmPilot:
+        slurm = SlurmPilot(config=Config(local_path=tmp_path / "sp"), clusters=[cluster], listeners=[collector])
+        slurm._connections[cluster] = _RecordingConnection()
+        return slurm
+
+    def test_schedule_job_on_remote_cluster(self, tmp_path):
+        collector = InMemoryCollector()
+        slurm = self._slurm(tmp_path, "remote", collector)
+        slurm.schedule_job(_job(tmp_path, "remote"))
+        assert [s.operation for s in collector.spans] == ["copy", "upload", "sbatch"]
+        copy, upload, sbatch = collector.spans
+        assert copy.bytes_transferred > 0
+        assert upload.bytes_transferred >= copy.bytes_transferred
+        assert sbatch.cluster == "remote" and sbatch.attributes == {"jobname": "job"}
+
+    def test_sbatch_failure_is_recorded(self, tmp_path):
+        collector = InMemoryCollector()
+        slurm = self._slurm(tmp_path, "remote", collector)
+        slurm._connections["remote"].run = lambda command, **kwargs: CommandResult(
+            command=command, stdout="", stderr="invalid account", return_code=1
+        )
+        with pytest.raises(RuntimeError):
+            slurm.schedule_job(_job(tmp_path, "remote"))
+        assert "invalid account" in collector.by_operation("sbatch")[0].error
+
+    def test_queries_emit_spans(self, tmp_path):
+        collector = InMemoryCollector()
+        slurm = self._slurm(tmp_path, "remote", collector)
+        slurm.schedule_job(_job(tmp_path, "remote"))
+        collector.clear()
+        slurm.status(["job"])
+        slurm.sacct_info(["job"])
+        slurm.stop_job("job")
+        assert [s.operation for s in collector.spans] == ["sacct", "sacct", "scancel"]
+        assert collector.spans[1].attributes == {"jobs": 1}
+
+    def test_mock_cluster_sbatch_span(self, tmp_path):
+        collector = InMemoryCollector()
+        slurm = SlurmPilot(config=Config(local_path=tmp_path / "sp"), clusters=["mock"], listeners=[collector])
+        slurm.schedule_job(_job(tmp_path, "mock"))
+        assert [s.operation for s in collector.spans] == ["copy", "sbatch"]
@@ -0,0 +1,195 @@
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from slurmpilot.config import ClusterConfig, Config
+from slurmpilot.connection_pool import ConnectionPool
+from slurmpilot.ignore import ignore_function
+from slurmpilot.job_creation_info import JobCreationInfo
+from slurmpilot.library_cache import GC_GRACE_SECONDS, LibraryCache, library_dir, library_key
+from slurmpilot.remote_command import LocalExecution
+from slurmpilot.slurm_script import generate_slurm_script
+from slurmpilot.source_cache import HashCache
+
+from slurmpilot import SlurmPilot
+
+
+def make_tree(root: Path, files: dict[str, str]) -> Path:
+    for relative, content in files.items():
+        path = root / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    return root
+
+
+def age_references(libs_dir: Path, seconds: float) -> None:
+    past = time.time() - seconds
+    for ref in libs_dir.glob("*.refs/*"):
+        os.utime(ref, (past, past))
+
+
+class CountingExecution(LocalExecution):
+    def __init__(self):
+        self.uploads: list[Path] = []
+
+    def upload_folder(self, local_path, remote_path, timeout=None, link_dest=None, files=None, settings=None):
+        self.uploads.append(Path(local_path))
+        super().upload_folder(local_path, remote_path, timeout=timeout)
+
+
+class TestLibraryKey:
+    def test_key_depends_on_content_only(self, tmp_path):
+        lib = make_tree(tmp_path / "mylib", {"__init__.py": "x = 1"})
+        hashes = HashCache(tmp_path / "hashes.json")
+        key = library_key(lib, hashes)
+        assert key.startswith("mylib-")
+        os.utime(lib / "__init__.py", (0, 0))
+        assert library_key(lib, hashes) == key
+        (lib / "__init__.py").write_text("x = 2")
+        assert library_key(lib, hashes) != key
+
+    def test_ignored_files_do_not_change_the_key(self, tmp_path):
+        lib = make_tree(tmp_path / "mylib", {"__init__.py": "", ".slurmpilotignore": "*.log\n"})
+        hashes = HashCache(tmp_path / "hashes.json")
+        key = library_key(lib, hashes, ignore_function(lib))
+        make_tree(lib, {"debug.log": "noise"})
+        assert library_key(lib, hashes, ignore_function(lib)) == key
+
+
+class TestLibraryCache:
+    def _cache(self, tmp_path: Path) -> tuple[LibraryCache, CountingExecution, dict[str, Path]]:
+        lib = make_tree(tmp_path / "mylib", {"__init__.py": "x = 1"})
+        connection = CountingExecution()
+        cache = LibraryCache(connection, tmp_path / "remote")
+        return cache, connection, {library_key(lib, HashCache(tmp_path / "h.json")): lib}
+
+    def test_library_is_uploaded_once(self, tmp_path):
+        cache, connection, libraries = self._cache(tmp_path)
+        [key] = libraries
+        assert cache.ensure(libraries, "job-a") == [key]
+        assert cache.ensure(libraries, "job-b") == []
+        assert len(connection.uploads) == 1
+        assert (cache.remote_dir(key) / "mylib" / "__init__.py").read_text() == "x = 1"
+        assert sorted(os.listdir(cache.libs_dir / f"{key}.refs")) == ["job-a", "job-b"]
+        # The temporary upload folder is gone.
+        assert sorted(os.listdir(cache.libs_dir)) == [key, f"{key}.refs"]
+
+    def test_gc_keeps_versions_of_existing_jobs(self, tmp_path):
+        cache, _, libraries = self._cache(tmp_path)
+        [key] = libraries
+        cache.ensure(libraries, "job-a")
+        (tmp_path / "remote" / "jobs" / "job-a").mkdir(parents=True)
+        assert cache.gc() == []
+        assert cache.remote_dir(key).exists()
+
+    def test_gc_removes_versions_of_deleted_jobs(self, tmp_path):
+        cache, _, libraries = self._cache(tmp_path)
+        [key] = libraries
+        cache.ensure(libraries, "job-a")
+        age_references(cache.libs_dir, 2 * GC_GRACE_SECONDS)
+        assert cache.gc(dryrun=True) == [key]
+        assert cache.remote_dir(key).exists()
+        assert cache.gc() == [key]
+        assert os.listdir(cache.libs_dir) == []
+
+    def test_gc_keeps_recent_references_of_jobs_being_uploaded(self, tmp_path):
+        cache, _, libraries = self._cache(tmp_path)
+        [key] = libraries
+        cache.ensure(libraries, "job-a")
+        assert cache.gc() == []
+        assert cache.gc(grace_seconds=0) == [key]
+
+    def test_concurrent_upload_keeps_the_first_version(self, tmp_path):
+        cache, _, libraries = self._cache(tmp_path)
+        [key] = libraries
+        cache.ensure(libraries, "job-a")
+        # Another job stored the version between the check and the upload of this one.
+        cache._upload(libraries, "copy", {})
+        assert sorted(os.listdir(cache.remote_dir(key))) == ["mylib"]
+        assert sorted(os.listdir(cache.libs_dir)) == [key, f"{key}.refs"]
+
+    def test_gc_drops_old_references(self, tmp_path):
+        cache, _, libraries = self._cache(tmp_path)
+        [key] = libraries
+        cache.ensure(libraries, "job-a")
+        (tmp_path / "remote" / "jobs" / "job-a").mkdir(parents=True)
+        old = time.time() - 40 * 86400
+        os.utime(cache.libs_dir / f"{key}.refs" / "job-a", (old, old))
+        assert cache.gc(max_age_days=60) == []
+        assert cache.gc(max_age_days=30) == [key]
+
+
+class TestScheduleJobLibraryCache:
+    def _slurm(self, tmp_path: Path) -> SlurmPilot:
+        cluster = ClusterConfig(
+            host="fakehost", remote_path=str(tmp_path / "remote"), ssh_multiplexing=False, library_cache=True
+        )
+        return SlurmPilot(
+            config=Config(local_path=tmp_path / "local", cluster_configs={"c": cluster}),
+            clusters=["c"], pool=ConnectionPool(),
+        )
+
+    def _job(self, tmp_path: Path, name: str) -> JobCreationInfo:
+        src = make_tree(tmp_path / "src", {"main.py": "import mylib"})
+        lib = make_tree(tmp_path / "mylib", {"__init__.py": "x = 1"})
+        return JobCreationInfo(
+            jobname=name, entrypoint="main.py", src_dir=str(src), cluster="c",
+            python_binary="python", python_libraries=[str(lib)],
+        )
+
+    def test_schedule_jobs_uploads_the_libraries_of_all_jobs_together(self, fake_rsync, tmp_path):
+        fake_rsync.add_executable("sbatch", 'print("Submitted batch job 4242")')
+        slurm = self._slurm(tmp_path)
+        other = make_tree(tmp_path / "otherlib", {"__init__.py": "y = 2"})
+        first, second = self._job(tmp_path, "a"), self._job(tmp_path, "b")
+        second.python_libraries.append(str(other))
+        scheduled = slurm.schedule_jobs([first, second])
+        assert scheduled.errors == {}
+        # References, library upload, move into place, job upload and sbatch.
+        assert [call["program"] for call in fake_rsync.calls()] == ["ssh", "rsync", "ssh", "rsync", "ssh"]
+        versions = [name for name in os.listdir(tmp_path / "remote" / "libs") if not name.endswith(".refs")]
+        assert len(versions) == 2
+
+    def test_jobs_share_the_cached_library(self, fake_rsync, tmp_path):
+        fake_rsync.add_executable("sbatch", 'print("Submitted batch job 4242")')
+        slurm = self._slurm(tmp_path)
+        slurm.schedule_job(self._job(tmp_path, "a"))
+        slurm.schedule_job(self._job(tmp_path, "b"))
+        programs = [call["program"] for call in fake_rsync.calls()]
+        # One library upload for both jobs, then one upload of each job folder.
+        assert programs.count("rsync") == 3
+
+        remote = tmp_path / "remote"
+        [key] = [name for name in os.listdir(remote / "libs") if not name.endswith(".refs")]
+        assert (remote / "libs" / key / "mylib" / "__init__.py").exists()
+        assert not (remote / "jobs" / "b" / "mylib").exists()
+        script = (remote / "jobs" / "b" / "slurm_script.sh").read_text()
+        assert f"{remote / 'jobs' / 'b'}:{remote / 'libs' / key}\n" in script
+        # The library is imported by its name, as when it is copied into the job folder.
+        [pythonpath] = [line for line in script.splitlines() if line.startswith("export PYTHONPATH=")]
+        env = {**os.environ, "PYTHONPATH": pythonpath.split(":", 1)[1]}
+        imported = subprocess.run(
+            [sys.executable, "-c", "import mylib; print(mylib.x)"], env=env, capture_output=True, text=True
+        )
+        assert imported.stdout == "1\n", imported.stderr
+
+        (remote / "jobs" / "a").rename(remote / "jobs" / "a-deleted")
+        assert slurm.gc_libraries("c") == []
+        (remote / "jobs" / "b").rename(remote / "jobs" / "b-deleted")
+        assert slurm.gc_libraries("c") == []
+        age_references(remote / "libs", 2 * GC_GRACE_SECONDS)
+        assert slurm.gc_libraries("c") == [key]
+
+
+def test_slurm_script_uses_library_dirs(tmp_path):
+    job = JobCreationInfo(
+        jobname="j", entrypoint="main.py", src_dir=str(tmp_path), cluster="c",
+        python_binary="python", python_libraries=["/home/me/mylib"],
+    )
+    script = generate_slurm_script(
+        job, Path("src/main.py"), job_run_dir=Path("/r/jobs/j"),
+        library_dirs=[library_dir(Path("/r"), "mylib-0123")],
+    )
+    assert "export PYTHONPATH=$PYTHONPATH:/r/jobs/j:/r/libs/mylib-0123\n" in script
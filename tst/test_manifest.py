@@ -0,0 +1,84 @@
+from slurmpilot.config import Config
+from slurmpilot.job_creation_info import JobCreationInfo
+from slurmpilot.manifest import MANIFEST_FILE, Manifest
+from slurmpilot.remote_command import LocalExecution
+from slurmpilot.snapshot import snapshot
+
+from slurmpilot import SlurmPilot
+
+
+def make_job(root):
+    (root / "src" / "pkg").mkdir(parents=True)
+    (root / "src" / "main.py").write_text("print('hi')")
+    (root / "src" / "pkg" / "util.py").write_text("X = 1")
+    return root
+
+
+class TestManifest:
+    def test_add_save_load(self, tmp_path):
+        job = make_job(tmp_path / "job")
+        manifest = Manifest(job)
+        manifest.add(job / "src" / "main.py")
+        manifest.add(job / "src" / "pkg" / "util.py", sha256="abc")
+        manifest.save()
+        loaded = Manifest.load(job)
+        assert loaded.entries == manifest.entries
+        assert loaded.paths() == ["src/main.py", "src/pkg/util.py"]
+        assert loaded.total_size == len("print('hi')") + len("X = 1")
+        assert loaded.entries["src/pkg/util.py"].sha256 == "abc"
+
+    def test_load_missing(self, tmp_path):
+        assert Manifest.load(tmp_path) is None
+
+    def test_snapshot_records_files(self, tmp_path):
+        src = make_job(tmp_path / "job") / "src"
+        manifest = Manifest(tmp_path / "copy")
+        snapshot(src, tmp_path / "copy" / "src", mode="copy", manifest=manifest)
+        assert manifest.paths() == ["src/main.py", "src/pkg/util.py"]
+
+    def test_verify_complete_copy(self, tmp_path):
+        job = make_job(tmp_path / "job")
+        manifest = Manifest(job)
+        for path in ["src/main.py", "src/pkg/util.py"]:
+            manifest.add(job / path)
+        manifest.save()
+        result = LocalExecution().run(Manifest.verify_command(job))
+        assert not result.failed
+        assert manifest.check(result.stdout) == []
+        # The manifest file itself is not listed and extra files are fine.
+        assert MANIFEST_FILE in result.stdout
+
+    def test_check_reports_missing_and_truncated_files(self, tmp_path):
+        job = make_job(tmp_path / "job")
+        manifest = Manifest(job)
+        for path in ["src/main.py", "src/pkg/util.py"]:
+            manifest.add(job / path)
+        assert manifest.check("3 src/main.py\n") == [
+            "src/main.py has 3 bytes instead of 11",
+            "missing src/pkg/util.py",
+        ]
+
+
+    def test_check_accepts_stat_listing(self, tmp_path):
+        job = make_job(tmp_path / "job")
+        manifest = Manifest(job)
+        manifest.add(job / "src" / "main.py")
+        # Listing printed by stat -f where find has no -printf.
+        assert manifest.check("11 ./src/main.py\n") == []
+
+
+class TestScheduleJobManifest:
+    def test_manifest_lists_every_file_of_the_job(self, tmp_path):
+        src = make_job(tmp_path / "project") / "src"
+        slurm = SlurmPilot(config=Config(local_path=tmp_path / "sp"), clusters=["mock"])
+        slurm.schedule_job(
+            JobCreationInfo(jobname="job", entrypoint="main.py", src_dir=str(src), cluster="mock",
+                            python_args=["--a=1", "--a=2"]),
+            dryrun=True,
+        )
+        job_dir = tmp_path / "sp" / "jobs" / "job"
+        manifest = Manifest.load(job_dir)
+        files = sorted(p.relative_to(job_dir).as_posix() for p in job_dir.rglob("*") if p.is_file())
+        assert manifest.paths() == [f for f in files if f != MANIFEST_FILE]
+        assert "slurm_script.sh" in manifest.paths()
+        assert "python-args.txt" in manifest.paths()
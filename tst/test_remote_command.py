@@ -1,10 +1,23 @@
+import shutil
+import time
 from pathlib import Path
 from tempfile import TemporaryDirectory
 from unittest.mock import MagicMock, patch
 
 import pytest
 
-from slurmpilot.remote_command import CommandResult, LocalExecution, SSHExecution
+from slurmpilot.remote_command import (
+    TIMEOUT_RETURN_CODE,
+    CommandResult,
+    CommandTimeoutError,
+    LocalExecution,
+    RemoteExecution,
+    RetryPolicy,
+    ShellSession,
+    ShellSessionError,
+    SSHExecution,
+    balanced_shards,
+)
 
 # ---------------------------------------------------------------------------
 # CommandResult
@@ -83,6 +96,57 @@ class TestLocalExecution:
             assert (local_path / remote_path.name / "result.txt").exists()
 
 
+# ---------------------------------------------------------------------------
+# run_many
+# ---------------------------------------------------------------------------
+
+class TestRunMany:
+    def test_results_are_returned_in_order(self):
+        results = LocalExecution().run_many(["echo a", "echo b >&2; exit 4", "printf c"])
+        assert [(r.stdout, r.stderr, r.return_code) for r in results] == [
+            ("a\n", "", 0),
+            ("", "b\n", 4),
+            ("c", "", 0),
+        ]
+
+    def test_failure_does_not_stop_later_commands(self):
+        results = LocalExecution().run_many(["false", 'echo "unterminated', "echo after"])
+        assert results[0].failed and results[1].failed
+        assert results[2].stdout == "after\n"
+
+    def test_env_is_exported(self):
+        [result] = LocalExecution().run_many(["printenv FOO"], env={"FOO": "a b"})
+        assert result.stdout == "a b\n"
+
+    def test_empty_list(self):
+        assert LocalExecution().run_many([]) == []
+
+    def test_missing_results_are_reported_as_failures(self):
+        exe = LocalExecution()
+        with patch.object(LocalExecution, "_run_script", return_value=CommandResult(
+            command="", stdout="", stderr="connection refused", return_code=255,
+        )):
+            results = exe.run_many(["echo a", "echo b"])
+        assert all(r.failed and r.stderr == "connection refused" for r in results)
+
+    def test_ssh_uses_a_single_process(self, fake_ssh):
+        results = SSHExecution(host="fakehost").run_many(["echo one", "echo two", "exit 2"])
+        assert [r.stdout for r in results] == ["one", "two", ""]
+        assert results[2].return_code == 2
+        assert len(fake_ssh.calls()) == 1
+        assert fake_ssh.calls()[0]["command"] == "sh -s"
+
+    def test_ssh_through_persistent_shell(self, fake_ssh):
+        exe = SSHExecution(host="fakehost", persistent_shell=True)
+        try:
+            exe.run("true")
+            results = exe.run_many(["echo one", "echo two"])
+        finally:
+            exe.close()
+        assert [r.stdout for r in results] == ["one", "two"]
+        assert len(fake_ssh.calls()) == 1
+
+
 # ---------------------------------------------------------------------------
 # SSHExecution
 # ---------------------------------------------------------------------------
@@ -106,7 +170,7 @@ class TestSSHExecution:
         exe = SSHExecution(host="cluster.example.com")
         assert exe._remote == "cluster.example.com"
 
-    @patch("slurmpilot.remote_command.subprocess.run")
+    @patch("slurmpilot.remote_command._run_process")
     def test_run_success(self, mock_run):
         mock_run.return_value = _proc(stdout="hello\n")
         result = self.exe.run("echo hello")
@@ -114,11 +178,10 @@ class TestSSHExecution:
         assert result.stdout == "hello"
         mock_run.assert_called_once_with(
             ["ssh", "alice@cluster.example.com", "echo hello"],
-            capture_output=True,
-            text=True,
+            timeout=None,
         )
 
-    @patch("slurmpilot.remote_command.subprocess.run")
+    @patch("slurmpilot.remote_command._run_process")
     def test_run_failure(self, mock_run):
         mock_run.return_value = _proc(stderr="no such file", returncode=1)
         result = self.exe.run("ls /bad")
@@ -126,7 +189,7 @@ class TestSSHExecution:
         assert result.return_code == 1
         assert result.stderr == "no such file"
 
-    @patch("slurmpilot.remote_command.subprocess.run")
+    @patch("slurmpilot.remote_command._run_process")
     def test_run_with_env(self, mock_run):
         mock_run.return_value = _proc(stdout="42\n")
         self.exe.run("echo $FOO", env={"FOO": "42"})
@@ -134,44 +197,72 @@ class TestSSHExecution:
         assert "FOO=42" in remote_command_arg
         assert remote_command_arg.startswith("env ")
 
-    @patch("slurmpilot.remote_command.subprocess.run")
-    def test_run_retries_on_failure_then_succeeds(self, mock_run):
-        mock_run.side_effect = [_proc(returncode=1), _proc(returncode=0)]
+    @patch("slurmpilot.remote_command.time.sleep")
+    @patch("slurmpilot.remote_command._run_process")
+    def test_run_retries_on_transport_failure_then_succeeds(self, mock_run, mock_sleep):
+        mock_run.side_effect = [_proc(returncode=255), _proc(returncode=0)]
         result = self.exe.run("flaky", retries=1)
         assert not result.failed
         assert mock_run.call_count == 2
+        assert mock_sleep.call_count == 1
 
-    @patch("slurmpilot.remote_command.subprocess.run")
-    def test_run_exhausts_retries(self, mock_run):
-        mock_run.return_value = _proc(returncode=1)
+    @patch("slurmpilot.remote_command.time.sleep")
+    @patch("slurmpilot.remote_command._run_process")
+    def test_run_exhausts_retries(self, mock_run, mock_sleep):
+        mock_run.return_value = _proc(returncode=255)
         result = self.exe.run("bad", retries=2)
-        assert result.failed
+        assert result.transport_failed
         assert mock_run.call_count == 3  # 1 initial + 2 retries
 
-    @patch("slurmpilot.remote_command.subprocess.run")
+    @patch("slurmpilot.remote_command.time.sleep")
+    @patch("slurmpilot.remote_command._run_process")
+    def test_run_does_not_retry_command_failure(self, mock_run, mock_sleep):
+        mock_run.return_value = _proc(stderr="sbatch: error: invalid partition", returncode=1)
+        result = self.exe.run("sbatch job.sh", retries=3)
+        assert result.failed and not result.transport_failed
+        assert mock_run.call_count == 1
+        mock_sleep.assert_not_called()
+
+    @patch("slurmpilot.remote_command.time.sleep")
+    @patch("slurmpilot.remote_command._run_process")
+    def test_run_many_retries_the_batch_on_transport_failure(self, mock_run, mock_sleep):
+        mock_run.side_effect = [_proc(returncode=255), _proc(returncode=0)]
+        self.exe.run_many(["sacct", "squeue"], retries=1)
+        assert mock_run.call_count == 2
+        assert mock_sleep.call_count == 1
+        mock_run.side_effect = [_proc(returncode=255)]
+        assert all(result.failed for result in self.exe.run_many(["sbatch job.sh"]))
+        assert mock_run.call_count == 3
+
+    @patch("slurmpilot.remote_command._run_process")
     def test_run_no_retry_on_success(self, mock_run):
         mock_run.return_value = _proc(returncode=0)
         self.exe.run("ok", retries=5)
         assert mock_run.call_count == 1
 
-    @patch("slurmpilot.remote_command.subprocess.run")
+    @patch("slurmpilot.remote_command._run_process")
     def test_upload_folder(self, mock_run):
         mock_run.return_value = _proc()
         self.exe.upload_folder(Path("/local/mydir"), Path("/remote/jobs"))
-        assert mock_run.call_count == 2
-        mkdir_call = mock_run.call_args_list[0][0][0]
-        assert mkdir_call[:2] == ["ssh", "alice@cluster.example.com"]
-        rsync_call = mock_run.call_args_list[1][0][0]
+        assert mock_run.call_count == 1
+        rsync_call = mock_run.call_args[0][0]
         assert rsync_call[0] == "rsync"
+        assert "--rsync-path=mkdir -p /remote/jobs && rsync" in rsync_call
         assert rsync_call[-1] == "alice@cluster.example.com:/remote/jobs"
 
-    @patch("slurmpilot.remote_command.subprocess.run")
+    @patch("slurmpilot.remote_command._run_process")
+    def test_upload_folder_quotes_destination(self, mock_run):
+        mock_run.return_value = _proc()
+        self.exe.upload_folder(Path("/local/mydir"), Path("~/my jobs"))
+        assert "--rsync-path=mkdir -p ~/'my jobs' && rsync" in mock_run.call_args[0][0]
+
+    @patch("slurmpilot.remote_command._run_process")
     def test_upload_folder_raises_on_rsync_failure(self, mock_run):
-        mock_run.side_effect = [_proc(), _proc(returncode=255, stderr="refused")]
+        mock_run.return_value = _proc(returncode=255, stderr="refused")
         with pytest.raises(RuntimeError, match="rsync upload failed"):
             self.exe.upload_folder(Path("/local/mydir"), Path("/remote/jobs"))
 
-    @patch("slurmpilot.remote_command.subprocess.run")
+    @patch("slurmpilot.remote_command._run_process")
     def test_download_folder(self, mock_run):
         mock_run.return_value = _proc()
         with TemporaryDirectory() as local:
@@ -180,9 +271,501 @@ class TestSSHExecution:
         assert rsync_call[0] == "rsync"
         assert "alice@cluster.example.com:/remote/jobs/myjob" in rsync_call
 
-    @patch("slurmpilot.remote_command.subprocess.run")
+    @patch("slurmpilot.remote_command._run_process")
     def test_download_folder_raises_on_rsync_failure(self, mock_run):
         mock_run.return_value = _proc(returncode=1, stderr="error")
         with TemporaryDirectory() as local:
             with pytest.raises(RuntimeError, match="rsync download failed"):
                 self.exe.download_folder(Path("/remote/jobs/myjob"), Path(local))
+
+
+class TestRetryPolicy:
+    def test_delay_grows_exponentially_up_to_max(self):
+        policy = RetryPolicy(base_delay=1, multiplier=2, max_delay=5, jitter=False)
+        assert [policy.delay(i) for i in range(5)] == [1, 2, 4, 5, 5]
+
+    def test_full_jitter_stays_within_cap(self):
+        policy = RetryPolicy(base_delay=1, multiplier=2, max_delay=5)
+        delays = [policy.delay(2) for _ in range(200)]
+        assert all(0 <= d <= 4 for d in delays)
+        assert len(set(delays)) > 1
+
+    @patch("slurmpilot.remote_command.time.sleep")
+    @patch("slurmpilot.remote_command._run_process")
+    def test_sleeps_follow_policy(self, mock_run, mock_sleep):
+        exe = SSHExecution(host="h", retry_policy=RetryPolicy(base_delay=0.5, jitter=False))
+        mock_run.return_value = _proc(returncode=255)
+        exe.run("x", retries=3)
+        assert [c.args[0] for c in mock_sleep.call_args_list] == [0.5, 1.0, 2.0]
+
+    @patch("slurmpilot.remote_command.time.sleep")
+    @patch("slurmpilot.remote_command._run_process")
+    def test_budget_is_shared_across_calls(self, mock_run, mock_sleep):
+        exe = SSHExecution(host="h", retry_policy=RetryPolicy(budget=3))
+        mock_run.return_value = _proc(returncode=255)
+        exe.run("a", retries=2)
+        exe.run("b", retries=2)
+        exe.run("c", retries=2)
+        # 3 initial attempts + the 3 retries allowed by the budget.
+        assert mock_run.call_count == 6
+
+    @patch("slurmpilot.remote_command.time.sleep")
+    @patch("slurmpilot.remote_command._run_process")
+    def test_success_refills_budget(self, mock_run, mock_sleep):
+        exe = SSHExecution(host="h", retry_policy=RetryPolicy(budget=1))
+        mock_run.side_effect = [_proc(returncode=255), _proc(), _proc(), _proc(returncode=255), _proc()]
+        assert not exe.run("a", retries=1).failed
+        assert not exe.run("b").failed
+        assert not exe.run("c", retries=1).failed
+        assert mock_run.call_count == 5
+
+    @patch("slurmpilot.remote_command.time.sleep")
+    @patch("slurmpilot.remote_command._run_process")
+    def test_unlimited_budget(self, mock_run, mock_sleep):
+        exe = SSHExecution(host="h", retry_policy=RetryPolicy(budget=None))
+        mock_run.return_value = _proc(returncode=255)
+        exe.run("a", retries=30)
+        assert mock_run.call_count == 31
+
+
+class TestSSHTransfers:
+    """Round trips through the fake ssh/rsync executables."""
+
+    def test_upload_creates_destination_in_one_process(self, fake_rsync, tmp_path):
+        src = tmp_path / "src"
+        src.mkdir()
+        (src / "main.sh").write_text("echo hi")
+        dest = tmp_path / "remote" / "jobs"
+        SSHExecution(host="fakehost").upload_folder(src, dest)
+        assert (dest / "src" / "main.sh").read_text() == "echo hi"
+        assert [call["program"] for call in fake_rsync.calls()] == ["rsync"]
+
+    def test_upload_with_link_dest(self, fake_rsync, tmp_path):
+        src = tmp_path / "local" / "run2"
+        src.mkdir(parents=True)
+        (src / "main.sh").write_text("echo hi")
+        jobs = tmp_path / "remote" / "jobs"
+        (jobs / "run1").mkdir(parents=True)
+        SSHExecution(host="fakehost").upload_folder(src, jobs, link_dest=jobs / "run1")
+        assert (jobs / "run2" / "main.sh").read_text() == "echo hi"
+        [call] = fake_rsync.calls()
+        assert "--link-dest=../run1" in call["argv"]
+
+    def test_link_dest_relative_to_destination(self):
+        args = SSHExecution(host="h")._rsync_upload_command(
+            Path("/local/jobs/exp/run2"), Path("~/slurmpilot/jobs/exp"), link_dest=Path("~/slurmpilot/jobs/exp/run1")
+        )
+        assert args[-4:] == [
+            "--rsync-path=mkdir -p ~/slurmpilot/jobs/exp/run2 && rsync",
+            "--link-dest=../run1",
+            "/local/jobs/exp/run2/",
+            "h:~/slurmpilot/jobs/exp/run2/",
+        ]
+
+    def test_upload_retries_without_missing_link_dest(self, fake_rsync, tmp_path):
+        src = tmp_path / "src"
+        src.mkdir()
+        (src / "main.sh").write_text("echo hi")
+        dest = tmp_path / "remote" / "jobs"
+        SSHExecution(host="fakehost").upload_folder(src, dest, link_dest=dest / "deleted")
+        assert (dest / "src" / "main.sh").read_text() == "echo hi"
+        first, second = fake_rsync.calls()
+        assert any(arg.startswith("--link-dest=") for arg in first["argv"])
+        assert not any(arg.startswith("--link-dest=") for arg in second["argv"])
+
+    def test_tar_upload_streams_through_one_ssh(self, fake_ssh, tmp_path):
+        src = tmp_path / "my src"
+        (src / "pkg").mkdir(parents=True)
+        (src / "main.sh").write_text("echo hi")
+        (src / "pkg" / "util.py").write_text("X = 1")
+        dest = tmp_path / "remote" / "jobs"
+        SSHExecution(host="fakehost", transfer="tar").upload_folder(src, dest)
+        assert (dest / "my src" / "main.sh").read_text() == "echo hi"
+        assert (dest / "my src" / "pkg" / "util.py").read_text() == "X = 1"
+        assert [call["program"] for call in fake_ssh.calls()] == ["ssh"]
+
+    def test_tar_upload_of_listed_files(self, fake_ssh, tmp_path):
+        src = tmp_path / "src"
+        (src / "pkg").mkdir(parents=True)
+        (src / "main.sh").write_text("echo hi")
+        (src / "pkg" / "util.py").write_text("X = 1")
+        (src / "manifest.json").write_text("{}")
+        dest = tmp_path / "remote"
+        SSHExecution(host="fakehost", transfer="tar").upload_folder(src, dest, files=["main.sh", "pkg/util.py"])
+        assert sorted(p.relative_to(dest).as_posix() for p in dest.rglob("*") if p.is_file()) == [
+            "src/main.sh", "src/pkg/util.py",
+        ]
+
+    def test_tar_download(self, fake_ssh, tmp_path):
+        remote = tmp_path / "remote" / "logs"
+        remote.mkdir(parents=True)
+        (remote / "stdout").write_text("done")
+        SSHExecution(host="fakehost", transfer="tar").download_folder(remote, tmp_path / "local")
+        assert (tmp_path / "local" / "logs" / "stdout").read_text() == "done"
+
+    def test_tar_upload_failure(self, fake_ssh, tmp_path):
+        with pytest.raises(RuntimeError, match="tar upload failed"):
+            SSHExecution(host="fakehost", transfer="tar").upload_folder(tmp_path / "missing", tmp_path / "remote")
+
+    def test_unknown_transfer(self):
+        with pytest.raises(ValueError, match="transfer"):
+            SSHExecution(host="fakehost", transfer="scp")
+
+    def test_download(self, fake_rsync, tmp_path):
+        remote = tmp_path / "remote" / "logs"
+        remote.mkdir(parents=True)
+        (remote / "stdout").write_text("done")
+        SSHExecution(host="fakehost").download_folder(remote, tmp_path / "local")
+        assert (tmp_path / "local" / "logs" / "stdout").read_text() == "done"
+
+
+def _tree(root: Path) -> dict[str, str]:
+    return {p.relative_to(root).as_posix(): p.read_text() if p.is_file() else "/" for p in root.rglob("*")}
+
+
+def _make_tree(root: Path) -> Path:
+    for i in range(12):
+        path = root / f"d{i % 3}" / f"f{i}.txt"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("x" * (100 * i))
+    (root / "empty").mkdir()
+    return root
+
+
+class TestShardedTransfers:
+    def test_balanced_shards(self):
+        sizes = {"a": 10, "b": 7, "c": 5, "d": 4, "e": 2, "f": 2}
+        shards = balanced_shards(sizes, 3)
+        assert sorted(p for shard in shards for p in shard) == sorted(sizes)
+        loads = [sum(sizes[p] for p in shard) for shard in shards]
+        assert len(shards) == 3 and max(loads) - min(loads) <= 2
+        assert balanced_shards({"a": 1}, 4) == [["a"]]
+        assert balanced_shards({}, 4) == []
+
+    def test_local_parallel_copy(self, tmp_path):
+        src = _make_tree(tmp_path / "src")
+        progress = []
+        LocalExecution(parallel_transfers=4).upload_folder(
+            src, tmp_path / "dest", progress=lambda *a: progress.append(a)
+        )
+        assert _tree(tmp_path / "dest" / "src") == _tree(src)
+        assert progress[-1] == (sum(100 * i for i in range(12)),) * 2
+
+    def test_ssh_round_trip(self, fake_rsync, tmp_path):
+        src = _make_tree(tmp_path / "job")
+        exe = SSHExecution(host="fakehost", parallel_transfers=3)
+        progress = []
+        exe.upload_folder(src, tmp_path / "remote", progress=lambda *a: progress.append(a))
+        assert _tree(tmp_path / "remote" / "job") == _tree(src)
+        assert [call["program"] for call in fake_rsync.calls()] == ["rsync"] * 3
+        assert len(progress) == 3 and progress[-1][0] == progress[-1][1]
+
+        exe.download_folder(tmp_path / "remote" / "job", tmp_path / "back")
+        assert _tree(tmp_path / "back" / "job") == _tree(src)
+
+    def test_download_without_gnu_find(self, fake_rsync, tmp_path):
+        # find without -printf and stat -f, as on BSD and macOS.
+        fake_rsync.add_executable("find", (
+            f"import os, sys\n"
+            f"if '-printf' in sys.argv: sys.exit(1)\n"
+            f"os.execv({shutil.which('find')!r}, ['find', *sys.argv[1:]])"
+        ))
+        fake_rsync.add_executable("stat", (
+            "import os, sys\n"
+            "assert sys.argv[1:3] == ['-f', '%z %N']\n"
+            "for path in sys.argv[3:]: print(os.stat(path).st_size, path)"
+        ))
+        src = _make_tree(tmp_path / "job")
+        exe = SSHExecution(host="fakehost", parallel_transfers=3)
+        exe.upload_folder(src, tmp_path / "remote")
+        progress = []
+        exe.download_folder(tmp_path / "remote" / "job", tmp_path / "back", progress=lambda *a: progress.append(a))
+        assert _tree(tmp_path / "back" / "job") == _tree(src)
+        assert progress[-1] == (sum(100 * i for i in range(12)),) * 2
+
+    def test_empty_folder(self, fake_rsync, tmp_path):
+        (tmp_path / "job").mkdir()
+        exe = SSHExecution(host="fakehost", parallel_transfers=3)
+        exe.upload_folder(tmp_path / "job", tmp_path / "remote")
+        exe.download_folder(tmp_path / "remote" / "job", tmp_path / "back")
+        assert (tmp_path / "back" / "job").is_dir()
+
+    def test_tar_stays_single_stream(self, fake_ssh, tmp_path):
+        src = _make_tree(tmp_path / "job")
+        SSHExecution(host="fakehost", transfer="tar", parallel_transfers=4).upload_folder(src, tmp_path / "remote")
+        assert _tree(tmp_path / "remote" / "job") == _tree(src)
+        assert [call["program"] for call in fake_ssh.calls()] == ["ssh"]
+
+
+class TestSSHMultiplexing:
+    def setup_method(self):
+        self.exe = SSHExecution(
+            host="cluster.example.com", user="alice", multiplex=True, control_path="/tmp/sp-test-%C"
+        )
+
+    def test_no_control_options_without_multiplex(self):
+        exe = SSHExecution(host="cluster.example.com")
+        assert exe._ssh_command("hostname") == ["ssh", "cluster.example.com", "hostname"]
+
+    def test_ssh_command_uses_control_master(self):
+        args = self.exe._ssh_command("hostname")
+        assert "ControlMaster=auto" in args
+        assert "ControlPath=/tmp/sp-test-%C" in args
+        assert "ControlPersist=10m" in args
+        assert args[-2:] == ["alice@cluster.example.com", "hostname"]
+
+    @patch("slurmpilot.remote_command._run_process")
+    def test_rsync_shares_master_connection(self, mock_run):
+        mock_run.return_value = _proc()
+        self.exe.upload_folder(Path("/local/mydir"), Path("/remote/jobs"))
+        rsync_call = mock_run.call_args_list[-1][0][0]
+        rsh = rsync_call[rsync_call.index("-e") + 1]
+        assert rsh.startswith("ssh ")
+        assert "ControlPath=/tmp/sp-test-%C" in rsh
+
+    def test_master_lifecycle(self, fake_ssh, tmp_path):
+        exe = SSHExecution(host="fakehost", multiplex=True, control_path=str(tmp_path / "master.sock"))
+        assert not exe.master_alive()
+        exe.open_master()
+        assert exe.master_alive()
+        exe.close()
+        assert not exe.master_alive()
+
+    def test_run_through_stand_in(self, fake_ssh):
+        result = SSHExecution(host="fakehost").run("echo hello")
+        assert result.stdout == "hello"
+        assert fake_ssh.calls()[0]["host"] == "fakehost"
+
+    def test_multiplexed_runs_share_one_master(self, fake_ssh, tmp_path):
+        """Only the first multiplexed run opens a connection, the others go through its socket."""
+        n = 5
+        for _ in range(n):
+            assert not SSHExecution(host="fakehost").run("true").failed
+        assert fake_ssh.handshakes() == n
+        assert not any("ControlMaster=auto" in call["argv"] for call in fake_ssh.calls())
+        socket = str(tmp_path / "master.sock")
+        exe = SSHExecution(host="fakehost", multiplex=True, control_path=socket)
+        for _ in range(n):
+            assert not exe.run("true").failed
+        multiplexed = fake_ssh.calls()[n:]
+        assert fake_ssh.handshakes() == n + 1
+        assert all(f"ControlPath={socket}" in call["argv"] for call in multiplexed)
+        assert all("ControlMaster=auto" in call["argv"] for call in multiplexed)
+
+
+# ---------------------------------------------------------------------------
+# ShellSession / persistent shell
+# ---------------------------------------------------------------------------
+
+class TestShellSession:
+    def setup_method(self):
+        self.session = ShellSession(["bash"])
+
+    def teardown_method(self):
+        self.session.close()
+
+    def test_run_captures_stdout_stderr_and_return_code(self):
+        result = self.session.run("echo out; echo err >&2; exit 3")
+        assert result.stdout == "out\n"
+        assert result.stderr == "err\n"
+        assert result.return_code == 3
+
+    def test_output_without_trailing_newline(self):
+        assert self.session.run("printf abc").stdout == "abc"
+        assert self.session.run("true").stdout == ""
+
+    def test_commands_reuse_the_same_shell(self):
+        first = self.session.run("echo $$").stdout
+        second = self.session.run("echo $$").stdout
+        assert first == second
+
+    def test_cd_does_not_leak_between_commands(self, tmp_path):
+        before = self.session.run("pwd").stdout
+        self.session.run(f"cd {tmp_path}")
+        assert self.session.run("pwd").stdout == before
+
+    def test_syntax_error_does_not_break_session(self):
+        result = self.session.run('echo "unterminated')
+        assert result.failed
+        assert self.session.run("echo ok").stdout == "ok\n"
+
+    def test_command_reading_stdin_does_not_consume_protocol(self):
+        assert self.session.run("cat").stdout == ""
+        assert self.session.run("echo still-here").stdout == "still-here\n"
+
+    def test_large_stderr_does_not_deadlock(self):
+        result = self.session.run("head -c 200000 /dev/zero | tr '\\0' x >&2; echo done")
+        assert result.stdout == "done\n"
+        assert len(result.stderr) == 200000
+
+    def test_timeout_reaps_the_shell(self):
+        self.session.run("true")
+        process = self.session._process
+        with pytest.raises(CommandTimeoutError):
+            self.session.run("sleep 30", timeout=0.2)
+        # Waited for, so not left as a zombie.
+        assert process.returncode is not None
+        assert self.session.run("echo ok").stdout == "ok\n"
+
+    def test_dead_shell_raises(self):
+        session = ShellSession(["bash", "-c", "exit 0"])
+        with pytest.raises(ShellSessionError):
+            session.run("echo hi")
+
+
+class TestSSHPersistentShell:
+    def test_commands_share_one_ssh_process(self, fake_ssh):
+        exe = SSHExecution(host="fakehost", persistent_shell=True)
+        try:
+            results = [exe.run(f"echo {i}") for i in range(3)]
+        finally:
+            exe.close()
+        assert [r.stdout for r in results] == ["0", "1", "2"]
+        assert len(fake_ssh.calls()) == 1
+
+    def test_env_is_forwarded(self, fake_ssh):
+        exe = SSHExecution(host="fakehost", persistent_shell=True)
+        try:
+            assert exe.run("printenv FOO", env={"FOO": "bar baz"}).stdout == "bar baz"
+        finally:
+            exe.close()
+
+    def test_falls_back_to_ssh_per_command(self, fake_ssh):
+        exe = SSHExecution(host="fakehost", persistent_shell=True)
+        with patch.object(ShellSession, "run", side_effect=ShellSessionError("broken")):
+            result = exe.run("echo fallback")
+        assert result.stdout == "fallback"
+        assert not exe.persistent_shell
+        assert fake_ssh.calls()[-1]["command"] == "echo fallback"
+
+    def test_scripts_fall_back_to_stdin(self, fake_ssh):
+        """After the session broke, batches are still sent through stdin rather than as ssh arguments."""
+        exe = SSHExecution(host="fakehost", persistent_shell=True)
+        with patch.object(ShellSession, "run", side_effect=ShellSessionError("broken")):
+            results = exe.run_many(["echo one", "echo two"])
+        assert [r.stdout for r in results] == ["one", "two"]
+        assert not exe.persistent_shell
+        assert fake_ssh.calls()[-1]["command"] == "sh -s"
+
+    def test_timeout_restarts_session(self, fake_ssh):
+        exe = SSHExecution(host="fakehost", persistent_shell=True)
+        try:
+            result = exe.run("echo partial; sleep 30", timeout=0.5)
+            assert result.timed_out
+            assert result.stdout == "partial"
+            assert exe.run("echo ok").stdout == "ok"
+        finally:
+            exe.close()
+        assert exe.persistent_shell
+        assert len(fake_ssh.calls()) == 2
+
+
+# ---------------------------------------------------------------------------
+# Streaming
+# ---------------------------------------------------------------------------
+
+class _RunOnlyExecution(LocalExecution):
+    """Executor relying on the default, buffered stream implementation."""
+
+    stream = RemoteExecution.stream
+
+
+class TestStream:
+    def test_lines_arrive_before_command_exits(self):
+        start = time.monotonic()
+        lines = LocalExecution().stream("echo first; sleep 1; echo second")
+        assert next(lines) == "first\n"
+        assert time.monotonic() - start < 0.8
+        assert list(lines) == ["second\n"]
+
+    def test_closing_early_kills_command(self, tmp_path):
+        marker = tmp_path / "finished"
+        lines = LocalExecution().stream(f"echo started; sleep 1; touch {marker}")
+        assert next(lines) == "started\n"
+        lines.close()
+        time.sleep(1.5)
+        assert not marker.exists()
+
+    def test_break_stops_infinite_command(self):
+        start = time.monotonic()
+        for i, _ in enumerate(LocalExecution().stream("yes")):
+            if i == 1000:
+                break
+        assert time.monotonic() - start < 5
+
+    def test_failure_raises_after_output(self):
+        lines = LocalExecution().stream("echo out; echo oops >&2; exit 3")
+        assert next(lines) == "out\n"
+        with pytest.raises(RuntimeError, match="oops"):
+            next(lines)
+
+    def test_large_stderr_does_not_block(self):
+        lines = list(LocalExecution().stream("head -c 1000000 /dev/zero >&2; echo done"))
+        assert lines == ["done\n"]
+
+    def test_ssh_stream(self, fake_ssh):
+        lines = SSHExecution(host="fakehost").stream("printenv FOO; echo end", env={"FOO": "a b"})
+        assert list(lines) == ["a b\n", "end\n"]
+
+    def test_default_implementation_uses_run(self):
+        assert list(_RunOnlyExecution().stream("echo a; echo b")) == ["a\n", "b\n"]
+        with pytest.raises(RuntimeError, match="return code 1"):
+            list(_RunOnlyExecution().stream("false"))
+
+
+# ---------------------------------------------------------------------------
+# Timeouts
+# ---------------------------------------------------------------------------
+
+class TestTimeouts:
+    def test_local_command_is_killed_with_partial_output(self):
+        start = time.monotonic()
+        result = LocalExecution().run("echo partial; sleep 30", timeout=0.5)
+        assert time.monotonic() - start < 5
+        assert result.timed_out and result.failed
+        assert result.return_code == TIMEOUT_RETURN_CODE
+        assert result.stdout == "partial\n"
+
+    def test_background_children_are_killed(self):
+        # The backgrounded sleep keeps stdout open; only killing the group unblocks us.
+        start = time.monotonic()
+        result = LocalExecution().run("sleep 30 & wait", timeout=0.5)
+        assert result.timed_out
+        assert time.monotonic() - start < 5
+
+    def test_fast_command_is_unaffected(self):
+        result = LocalExecution().run("echo fine", timeout=10)
+        assert not result.timed_out
+        assert result.stdout == "fine\n"
+
+    def test_run_many_keeps_completed_results(self):
+        first, second = LocalExecution().run_many(["echo done", "sleep 30"], timeout=0.5)
+        assert first.stdout == "done\n" and not first.failed
+        assert second.timed_out and second.failed
+
+    def test_ssh_default_timeout(self, fake_ssh):
+        exe = SSHExecution(host="fakehost", timeout=0.5)
+        start = time.monotonic()
+        result = exe.run("sleep 30", retries=3)
+        assert result.timed_out
+        assert time.monotonic() - start < 5
+        assert len(fake_ssh.calls()) == 1  # timeouts are not retried
+
+    def test_per_call_timeout_overrides_default(self, fake_ssh):
+        exe = SSHExecution(host="fakehost", timeout=0.1)
+        assert not exe.run("sleep 0.3; echo late", timeout=10).timed_out
+
+    @patch("slurmpilot.remote_command._run_process")
+    def test_transfers_use_transfer_timeout(self, mock_run):
+        mock_run.return_value = _proc()
+        exe = SSHExecution(host="h", timeout=1, transfer_timeout=60)
+        exe.upload_folder(Path("/local/src"), Path("/remote/dst"))
+        exe.download_folder(Path("/remote/dst"), Path("/tmp/slurmpilot-test-dl"))
+        assert [c.kwargs["timeout"] for c in mock_run.call_args_list] == [60, 60]
+
+    @patch("slurmpilot.remote_command._run_process")
+    def test_transfer_timeout_raises(self, mock_run):
+        mock_run.side_effect = CommandTimeoutError(["rsync"], 5, stderr="sending incremental file list")
+        with pytest.raises(CommandTimeoutError) as error:
+            SSHExecution(host="h").download_folder(Path("/remote/dst"), Path("/tmp/slurmpilot-test-dl"))
+        assert error.value.stderr == "sending incremental file list"
@@ -1,11 +1,15 @@
 """Tests for SlurmPilot using the mock cluster."""
+import os
+import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import pytest
 
 from slurmpilot.config import Config
 from slurmpilot.job_creation_info import JobCreationInfo
+from slurmpilot.slurm_script import _argument_lookup, write_python_args
 from slurmpilot import SlurmPilot
 
 # ---------------------------------------------------------------------------
@@ -135,6 +139,75 @@ class TestScheduleJobValidation:
             slurm.schedule_job(job)
 
 
+# ---------------------------------------------------------------------------
+# schedule_jobs
+# ---------------------------------------------------------------------------
+
+class TestScheduleJobs:
+    def test_submits_all_jobs(self, tmp_path):
+        slurm = SlurmPilot(config=make_config(tmp_path), clusters=["mock"])
+        jobs = [bash_job(tmp_path, name=f"sweep/run{i}") for i in range(3)]
+        scheduled = slurm.schedule_jobs(jobs)
+        assert scheduled.errors == {}
+        assert sorted(scheduled.jobids) == ["sweep/run0", "sweep/run1", "sweep/run2"]
+        for jobname, jobid in scheduled.jobids.items():
+            _wait(slurm, jobid)
+            assert (tmp_path / "jobs" / jobname / "jobid.json").exists()
+        assert slurm.status(list(scheduled.jobids)) == ["COMPLETED"] * 3
+
+    def test_failed_jobs_do_not_stop_the_batch(self, tmp_path):
+        slurm = SlurmPilot(config=make_config(tmp_path), clusters=["mock"])
+        src = make_bash_src(tmp_path / "src")
+        jobs = [
+            bash_job(tmp_path, name="a"),
+            JobCreationInfo(jobname="broken", entrypoint="missing.sh", src_dir=str(src), cluster="mock"),
+            bash_job(tmp_path, name="b"),
+        ]
+        _wait(slurm, slurm.schedule_job(bash_job(tmp_path, name="b")))
+        jobs.append(bash_job(tmp_path, name="c"))
+        scheduled = slurm.schedule_jobs(jobs)
+        assert sorted(scheduled.jobids) == ["a", "c"]
+        assert isinstance(scheduled.errors["broken"], AssertionError)
+        assert "already exists" in str(scheduled.errors["b"])
+        for jobid in scheduled.jobids.values():
+            _wait(slurm, jobid)
+
+    def test_duplicate_jobnames_in_batch_raise(self, tmp_path):
+        slurm = SlurmPilot(config=make_config(tmp_path), clusters=["mock"])
+        with pytest.raises(ValueError, match="unique within a batch"):
+            slurm.schedule_jobs([bash_job(tmp_path, name="a"), bash_job(tmp_path, name="a")])
+        assert not (tmp_path / "jobs" / "a").exists()
+
+    def test_results_follow_input_order(self, tmp_path):
+        slurm = SlurmPilot(config=make_config(tmp_path), clusters=["mock"])
+        src = make_bash_src(tmp_path / "src")
+        names = [f"run{i}" for i in range(20)]
+        jobs = [
+            JobCreationInfo(
+                jobname=name, entrypoint="missing.sh" if i % 3 == 0 else "main.sh", src_dir=str(src), cluster="mock"
+            )
+            for i, name in enumerate(names)
+        ]
+        scheduled = slurm.schedule_jobs(jobs, dryrun=True, workers=8)
+        assert list(scheduled.errors) == names[::3]
+        assert all((tmp_path / "jobs" / name / "slurm_script.sh").exists() for i, name in enumerate(names) if i % 3)
+
+    def test_concurrent_preparations_claim_a_jobname_once(self, tmp_path):
+        slurm = SlurmPilot(config=make_config(tmp_path), clusters=["mock"])
+        job = bash_job(tmp_path, name="a")
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(slurm._try_prepare, [job] * 8))
+        errors = [result for result in results if isinstance(result, Exception)]
+        assert len(errors) == 7
+        assert all("already exists" in str(error) for error in errors)
+
+    def test_dryrun(self, tmp_path):
+        slurm = SlurmPilot(config=make_config(tmp_path), clusters=["mock"])
+        scheduled = slurm.schedule_jobs([bash_job(tmp_path, name="a")], dryrun=True)
+        assert scheduled.jobids == {} and scheduled.errors == {}
+        assert (tmp_path / "jobs" / "a" / "slurm_script.sh").exists()
+
+
 # ---------------------------------------------------------------------------
 # status
 # ---------------------------------------------------------------------------
@@ -404,15 +477,31 @@ class TestJobArray:
         script = (tmp_path / "jobs" / "arrayjob" / "slurm_script.sh").read_text()
         assert "#SBATCH --array=0-2%1" in script
 
-    def test_sed_lookup_in_script(self, tmp_path):
-        """Slurm script reads the task argument from python-args.txt via sed."""
+    def test_indexed_lookup_in_script(self, tmp_path):
+        """Slurm script seeks to the task argument through python-args.idx instead of scanning with sed."""
         slurm = SlurmPilot(config=make_config(tmp_path), clusters=["mock"])
         job = self._array_job(tmp_path, ["--value=a", "--value=b"])
         slurm.schedule_job(job, dryrun=True)
         script = (tmp_path / "jobs" / "arrayjob" / "slurm_script.sh").read_text()
-        assert "python-args.txt" in script
+        assert "python-args.txt" in script and "python-args.idx" in script
         assert "SLURM_ARRAY_TASK_ID" in script
         assert "$argument" in script
+        assert "sed" not in script
+        index = (tmp_path / "jobs" / "arrayjob" / "python-args.idx").read_text()
+        assert index == f"{0:>12}\n{len('--value=a') + 1:>12}\n"
+
+    def test_lookup_of_every_task(self, tmp_path):
+        """The lookup finds each line, whatever its length or encoding."""
+        args = ["--value=a", "", "--value=é€ with spaces", {"lr": 0.1, "name": "x"}] + [f"--i={i}" for i in range(200)]
+        write_python_args(tmp_path, args)
+        lookup = _argument_lookup("TASK")
+        for task in [0, 1, 2, 3, 150, len(args) - 1]:
+            output = subprocess.run(
+                ["bash", "-c", lookup + 'printf "%s" "$argument"'], cwd=tmp_path,
+                env={**os.environ, "TASK": str(task)}, capture_output=True, text=True, check=True,
+            ).stdout
+            expected = args[task] if not isinstance(args[task], dict) else "--lr=0.1 --name=x"
+            assert output == expected
 
     def test_end_to_end_array_task_0(self, tmp_path):
         """Mock runs task 0: SLURM_ARRAY_TASK_ID=0 → reads first line → correct output."""
@@ -436,6 +525,16 @@ class TestJobArray:
         stdout, _ = slurm.log("arrayjob2")
         assert "world" in stdout
 
+    def test_end_to_end_array_chunk_offset(self, tmp_path):
+        """Task 0 of a chunk starting at task 1 reads the second line."""
+        slurm = SlurmPilot(config=make_config(tmp_path), clusters=["mock"])
+        job = self._array_job(tmp_path, ["--value=hello", "--value=world"], name="arrayjob3")
+        job.env = {"SLURM_ARRAY_TASK_ID": "0", "SP_ARRAY_OFFSET": "1"}
+        jobid = slurm.schedule_job(job)
+        _wait(slurm, jobid)
+        stdout, _ = slurm.log("arrayjob3")
+        assert "world" in stdout
+
     def test_n_concurrent_jobs_without_list_raises(self, tmp_path):
         """n_concurrent_jobs requires python_args to be a list."""
         src = make_python_src(tmp_path / "src")
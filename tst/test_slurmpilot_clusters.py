@@ -5,13 +5,17 @@ SSH session or Slurm installation is required.
 
 Local-cluster tests mock subprocess so they also run without Slurm installed.
 """
+import asyncio
+import json
 import shutil
+import time
 from pathlib import Path
 from unittest.mock import MagicMock, patch
 
 import pytest
 
 from slurmpilot.config import ClusterConfig, Config
+from slurmpilot.connection_pool import ConnectionPool
 from slurmpilot.job_creation_info import JobCreationInfo
 from slurmpilot.remote_command import CommandResult, RemoteExecution
 from slurmpilot import SlurmPilot
@@ -47,7 +51,13 @@ class FakeConnection(RemoteExecution):
         self.sacct_state = sacct_state
         self.commands: list[str] = []
         self.uploaded: list[tuple[Path, Path]] = []
+        self.link_dests: list[Path | None] = []
         self.downloaded: list[tuple[Path, Path]] = []
+        self.batches: list[list[str]] = []
+
+    def run_many(self, commands: list[str], env: dict | None = None, retries: int = 0) -> list[CommandResult]:
+        self.batches.append(list(commands))
+        return [self.run(command, env=env) for command in commands]
 
     def run(self, command: str, env: dict | None = None, retries: int = 0) -> CommandResult:
         self.commands.append(command)
@@ -66,10 +76,14 @@ class FakeConnection(RemoteExecution):
             return CommandResult(command=command, stdout="", stderr="", return_code=0)
         return CommandResult(command=command, stdout="", stderr="", return_code=0)
 
-    def upload_folder(self, local_path: Path, remote_path: Path) -> None:
+    def upload_folder(
+        self, local_path: Path, remote_path: Path, link_dest: Path | None = None, files: list[str] | None = None,
+        settings=None,
+    ) -> None:
         self.uploaded.append((local_path, remote_path))
+        self.link_dests.append(link_dest)
 
-    def download_folder(self, remote_path: Path, local_path: Path) -> None:
+    def download_folder(self, remote_path: Path, local_path: Path, progress=None) -> None:
         self.downloaded.append((remote_path, local_path))
         # Simulate the download by copying from local if the src exists.
         if remote_path.exists():
@@ -107,7 +121,7 @@ class TestLocalCluster:
             return m
         return side_effect
 
-    @patch("slurmpilot.remote_command.subprocess.run")
+    @patch("slurmpilot.remote_command._run_process")
     def test_schedule_job_calls_sbatch(self, mock_run, tmp_path):
         mock_run.side_effect = self._fake_run(jobid=77)
         slurm = self._slurm(tmp_path)
@@ -117,7 +131,7 @@ class TestLocalCluster:
         assert len(sbatch_calls) == 1
         assert "slurm_script.sh" in sbatch_calls[0]
 
-    @patch("slurmpilot.remote_command.subprocess.run")
+    @patch("slurmpilot.remote_command._run_process")
     def test_schedule_job_writes_jobid_json(self, mock_run, tmp_path):
         mock_run.side_effect = self._fake_run(jobid=55)
         slurm = self._slurm(tmp_path)
@@ -127,7 +141,7 @@ class TestLocalCluster:
         import json
         assert json.loads(jobid_file.read_text())["jobid"] == 55
 
-    @patch("slurmpilot.remote_command.subprocess.run")
+    @patch("slurmpilot.remote_command._run_process")
     def test_sbatch_command_contains_cd_to_job_dir(self, mock_run, tmp_path):
         mock_run.side_effect = self._fake_run()
         slurm = self._slurm(tmp_path)
@@ -138,21 +152,21 @@ class TestLocalCluster:
         assert "myjob" in sbatch_cmd
         assert "cd" in sbatch_cmd
 
-    @patch("slurmpilot.remote_command.subprocess.run")
+    @patch("slurmpilot.remote_command._run_process")
     def test_status_completed(self, mock_run, tmp_path):
         mock_run.side_effect = self._fake_run(jobid=10, state="COMPLETED")
         slurm = self._slurm(tmp_path)
         slurm.schedule_job(bash_job(tmp_path, "local"))
         assert slurm.status(["job"]) == ["COMPLETED"]
 
-    @patch("slurmpilot.remote_command.subprocess.run")
+    @patch("slurmpilot.remote_command._run_process")
     def test_status_running(self, mock_run, tmp_path):
         mock_run.side_effect = self._fake_run(jobid=10, state="RUNNING")
         slurm = self._slurm(tmp_path)
         slurm.schedule_job(bash_job(tmp_path, "local"))
         assert slurm.status(["job"]) == ["RUNNING"]
 
-    @patch("slurmpilot.remote_command.subprocess.run")
+    @patch("slurmpilot.remote_command._run_process")
     def test_log_reads_local_files(self, mock_run, tmp_path):
         mock_run.side_effect = self._fake_run()
         slurm = self._slurm(tmp_path)
@@ -165,7 +179,7 @@ class TestLocalCluster:
         stdout, stderr = slurm.log("job")
         assert "local output" in stdout
 
-    @patch("slurmpilot.remote_command.subprocess.run")
+    @patch("slurmpilot.remote_command._run_process")
     def test_no_upload_for_local_cluster(self, mock_run, tmp_path):
         """Local cluster must not call upload_folder — files are already there."""
         mock_run.side_effect = self._fake_run()
@@ -187,7 +201,7 @@ class TestLocalCluster:
         with pytest.raises(RuntimeError, match="sbatch failed"):
             slurm.schedule_job(bash_job(tmp_path, "local"))
 
-    @patch("slurmpilot.remote_command.subprocess.run")
+    @patch("slurmpilot.remote_command._run_process")
     def test_python_library_copied_to_job_folder_local(self, mock_run, tmp_path):
         """python_libraries are copied into the local job folder for the local backend."""
         mock_run.side_effect = self._fake_run()
@@ -214,7 +228,7 @@ class TestLocalCluster:
         assert (tmp_path / "jobs" / "libjob" / "mylib").is_dir()
         assert (tmp_path / "jobs" / "libjob" / "mylib" / "values.py").exists()
 
-    @patch("slurmpilot.remote_command.subprocess.run")
+    @patch("slurmpilot.remote_command._run_process")
     def test_pythonpath_in_slurm_script_local(self, mock_run, tmp_path):
         """Slurm script for local backend contains PYTHONPATH with job_dir and lib paths."""
         mock_run.side_effect = self._fake_run()
@@ -270,6 +284,26 @@ class TestSSHCluster:
         assert local_path.name == "job"          # the job dir was uploaded
         assert "jobs" in str(remote_path)        # into the remote jobs/ parent
 
+    def test_schedule_job_links_against_previous_job_from_same_src_dir(self, tmp_path):
+        slurm, fake = self._slurm(tmp_path)
+        slurm.schedule_job(bash_job(tmp_path, self.CLUSTER, name="exp/run1"))
+        slurm.schedule_job(bash_job(tmp_path, self.CLUSTER, name="exp/run2"))
+        other = JobCreationInfo(
+            jobname="other", entrypoint="main.sh", src_dir=str(make_bash_src(tmp_path / "other")), cluster=self.CLUSTER
+        )
+        slurm.schedule_job(other)
+        assert fake.link_dests == [None, Path("~/slurmpilot/jobs/exp/run1"), None]
+        metadata = json.loads((slurm.local_job_path("exp/run2") / "metadata.json").read_text())
+        assert metadata["src_dir"] == str((tmp_path / "src").resolve())
+
+    def test_schedule_job_without_link_dest(self, tmp_path):
+        cfg = ClusterConfig(host="login.bigcluster.example.com", remote_path="~/slurmpilot", link_dest=False)
+        slurm = SlurmPilot(config=make_config(tmp_path, {self.CLUSTER: cfg}), clusters=[self.CLUSTER])
+        slurm._connections[self.CLUSTER] = fake = FakeConnection()
+        slurm.schedule_job(bash_job(tmp_path, self.CLUSTER, name="run1"))
+        slurm.schedule_job(bash_job(tmp_path, self.CLUSTER, name="run2"))
+        assert fake.link_dests == [None, None]
+
     def test_schedule_job_returns_jobid(self, tmp_path):
         slurm, fake = self._slurm(tmp_path, FakeConnection(sbatch_jobid=999))
         jobid = slurm.schedule_job(bash_job(tmp_path, self.CLUSTER))
@@ -362,3 +396,232 @@ class TestSSHCluster:
             return CommandResult(command=cmd, stdout="Submitted batch job 5", stderr="", return_code=0)
         fake.run = run_sacct_fail
         assert slurm.status(["job"]) == [None]
+
+    def test_configured_retries_only_apply_to_read_only_commands(self, tmp_path):
+        calls = []
+
+        class RecordingConnection(FakeConnection):
+            def run(self, command: str, env: dict | None = None, retries: int = 0) -> CommandResult:
+                calls.append((command, retries))
+                return super().run(command, env=env)
+
+        slurm, _ = self._slurm(tmp_path, RecordingConnection())
+        slurm.config.cluster_configs[self.CLUSTER].retries = 2
+        slurm.schedule_job(bash_job(tmp_path, self.CLUSTER))
+        assert slurm.status(["job"]) == ["COMPLETED"]
+        assert [retries for command, retries in calls if "sbatch" in command] == [0]
+        assert [retries for command, retries in calls if command.startswith("sacct")] == [2]
+
+    def test_queue_position_uses_one_round_trip(self, tmp_path):
+        slurm, fake = self._slurm(tmp_path, FakeConnection(sbatch_jobid=12))
+        slurm.schedule_job(bash_job(tmp_path, self.CLUSTER))
+        run = fake.run
+
+        def run_squeue(cmd, **kw):
+            if cmd.startswith("squeue -j"):
+                return CommandResult(command=cmd, stdout="gpu", stderr="", return_code=0)
+            if cmd.startswith("squeue -p"):
+                rows = "11|900|PENDING\n12|800|PENDING\n13|100|RUNNING"
+                return CommandResult(command=cmd, stdout=rows, stderr="", return_code=0)
+            return run(cmd, **kw)
+        fake.run = run_squeue
+
+        pos = slurm.queue_position("job")
+        assert len(fake.batches) == 1
+        assert (pos.partition, pos.position, pos.total_pending, pos.top_priority) == ("gpu", 2, 2, 900)
+
+    def test_sacct_info_splits_large_jobid_sets(self, tmp_path, monkeypatch):
+        monkeypatch.setattr("slurmpilot.slurmpilot.MAX_JOBIDS_PER_COMMAND", 1)
+        slurm, fake = self._slurm(tmp_path, FakeConnection(sbatch_jobid=7))
+        slurm.schedule_job(bash_job(tmp_path, self.CLUSTER, name="a"))
+        slurm.schedule_job(bash_job(tmp_path, self.CLUSTER, name="b"))
+        rows = slurm.sacct_info(["a", "b"])
+        assert len(fake.batches[-1]) == 2
+        assert all(c.startswith("sacct") for c in fake.batches[-1])
+        assert {r["state"] for r in rows} == {"COMPLETED"}
+
+    def test_stop_all_jobs_batches_scancel(self, tmp_path):
+        slurm, fake = self._slurm(tmp_path, FakeConnection(sbatch_jobid=7))
+        slurm.schedule_job(bash_job(tmp_path, self.CLUSTER, name="a"))
+        slurm.schedule_job(bash_job(tmp_path, self.CLUSTER, name="b"))
+        cancelled = slurm.stop_all_jobs([self.CLUSTER])
+        assert sorted(cancelled) == ["a", "b"]
+        assert fake.batches[-1] == ["scancel 7 7"]
+
+
+# ---------------------------------------------------------------------------
+# SSH cluster through the fake ssh/rsync executables
+# ---------------------------------------------------------------------------
+
+_FAKE_SBATCH = """
+print("Submitted batch job 4242")
+"""
+
+
+class TestSSHProcesses:
+    """Counts the ssh/rsync processes spawned per operation (see conftest.fake_ssh)."""
+
+    def _slurm(self, tmp_path: Path, **options) -> SlurmPilot:
+        cluster = ClusterConfig(
+            host="fakehost", remote_path=str(tmp_path / "remote"), ssh_multiplexing=False, **options
+        )
+        return SlurmPilot(
+            config=make_config(tmp_path / "local", {"c": cluster}), clusters=["c"], pool=ConnectionPool()
+        )
+
+    def test_multiplexing_is_opt_in(self, fake_rsync, tmp_path):
+        fake_rsync.add_executable("sbatch", _FAKE_SBATCH)
+        for multiplexing in [None, True]:
+            options = {} if multiplexing is None else {"ssh_multiplexing": multiplexing}
+            cluster = ClusterConfig(host="fakehost", remote_path=str(tmp_path / "remote"), **options)
+            slurm = SlurmPilot(
+                config=make_config(tmp_path / "local", {"c": cluster}), clusters=["c"], pool=ConnectionPool()
+            )
+            assert slurm._connections["c"].multiplex is bool(multiplexing)
+            slurm._connections["c"].close()
+
+    def test_schedule_job_uses_one_upload_and_one_sbatch(self, fake_rsync, tmp_path):
+        fake_rsync.add_executable("sbatch", _FAKE_SBATCH)
+        slurm = self._slurm(tmp_path)
+        assert slurm.schedule_job(bash_job(tmp_path, "c")) == 4242
+        assert [call["program"] for call in fake_rsync.calls()] == ["rsync", "ssh"]
+        assert (tmp_path / "remote" / "jobs" / "job" / "slurm_script.sh").exists()
+
+    def test_schedule_job_uploads_manifest_files_and_verifies(self, fake_rsync, tmp_path):
+        fake_rsync.add_executable("sbatch", _FAKE_SBATCH)
+        slurm = self._slurm(tmp_path, verify_upload=True)
+        slurm.schedule_job(bash_job(tmp_path, "c"))
+        rsync, verify, sbatch = fake_rsync.calls()
+        assert any(arg.startswith("--files-from=") for arg in rsync["argv"])
+        assert "find" in verify["command"]
+        remote_job = tmp_path / "remote" / "jobs" / "job"
+        assert (remote_job / "src" / "main.sh").exists()
+        assert not (remote_job / "manifest.json").exists()
+
+    def test_incomplete_upload_is_detected(self, fake_rsync, tmp_path):
+        fake_rsync.add_executable("sbatch", _FAKE_SBATCH)
+        slurm = self._slurm(tmp_path, verify_upload=True)
+        # The stand-in rsync only copies the files it is told about.
+        with patch("slurmpilot.manifest.Manifest.paths", return_value=["slurm_script.sh"]):
+            with pytest.raises(RuntimeError, match="missing src/main.sh"):
+                slurm.schedule_job(bash_job(tmp_path, "c"))
+
+    def test_schedule_job_with_tar_transfer(self, fake_ssh, tmp_path):
+        fake_ssh.add_executable("sbatch", _FAKE_SBATCH)
+        slurm = self._slurm(tmp_path, transfer="tar")
+        assert slurm.schedule_job(bash_job(tmp_path, "c")) == 4242
+        assert [call["program"] for call in fake_ssh.calls()] == ["ssh", "ssh"]
+        assert (tmp_path / "remote" / "jobs" / "job" / "slurm_script.sh").exists()
+
+
+_FAKE_SBATCH_REJECTING_BAD = """
+import sys
+if any("SP_JOBNAME=sweep/bad" in arg for arg in sys.argv):
+    print("sbatch: error: invalid partition", file=sys.stderr)
+    sys.exit(1)
+print("Submitted batch job 4242")
+"""
+
+
+class TestScheduleJobsProcesses:
+    def _jobs(self, tmp_path: Path, names: list[str]) -> list[JobCreationInfo]:
+        src = make_bash_src(tmp_path / "src")
+        return [
+            JobCreationInfo(jobname=f"sweep/{name}", entrypoint="main.sh", src_dir=str(src), cluster="c")
+            for name in names
+        ]
+
+    def test_one_upload_and_one_sbatch_round_trip(self, fake_rsync, tmp_path):
+        fake_rsync.add_executable("sbatch", _FAKE_SBATCH_REJECTING_BAD)
+        slurm = TestSSHProcesses()._slurm(tmp_path, verify_upload=True)
+        scheduled = slurm.schedule_jobs(self._jobs(tmp_path, ["a", "bad", "b"]))
+        assert scheduled.jobids == {"sweep/a": 4242, "sweep/b": 4242}
+        assert "invalid partition" in str(scheduled.errors["sweep/bad"])
+        # Upload, verification of the three folders, sbatch of the three jobs.
+        assert [call["program"] for call in fake_rsync.calls()] == ["rsync", "ssh", "ssh"]
+        for name in ["a", "bad", "b"]:
+            assert (tmp_path / "remote" / "jobs" / "sweep" / name / "src" / "main.sh").exists()
+        assert (tmp_path / "local" / "jobs" / "sweep" / "a" / "jobid.json").exists()
+        assert not (tmp_path / "local" / "jobs" / "sweep" / "bad" / "jobid.json").exists()
+
+    def test_failed_upload_fails_the_jobs_of_the_cluster(self, fake_rsync, tmp_path):
+        slurm = TestSSHProcesses()._slurm(tmp_path)
+        failure = RuntimeError("rsync upload failed")
+        with patch("slurmpilot.remote_command.SSHExecution.upload_folder", side_effect=failure):
+            scheduled = slurm.schedule_jobs(self._jobs(tmp_path, ["a", "b"]))
+        assert scheduled.jobids == {}
+        assert sorted(scheduled.errors) == ["sweep/a", "sweep/b"]
+
+    def test_with_source_cache(self, fake_rsync, tmp_path):
+        fake_rsync.add_executable("sbatch", _FAKE_SBATCH)
+        slurm = TestSSHProcesses()._slurm(tmp_path, source_cache=True)
+        scheduled = slurm.schedule_jobs(self._jobs(tmp_path, ["a", "b"]))
+        assert scheduled.errors == {}
+        # Small blobs are sent without listing the store: upload, assembly of both folders, sbatch.
+        assert [call["program"] for call in fake_rsync.calls()] == ["rsync", "ssh", "ssh"]
+        for name in ["a", "b"]:
+            assert (tmp_path / "remote" / "jobs" / "sweep" / name / "src" / "main.sh").read_text().startswith("#!")
+
+
+# ---------------------------------------------------------------------------
+# Async multi-cluster operations
+# ---------------------------------------------------------------------------
+
+class SlowAsyncConnection:
+    """Async stand-in for AsyncRemoteExecution that answers like FakeConnection after a delay."""
+
+    def __init__(self, delay: float, sbatch_jobid: int = 42, sacct_state: str = "COMPLETED"):
+        self.delay = delay
+        self.sync = FakeConnection(sbatch_jobid=sbatch_jobid, sacct_state=sacct_state)
+
+    async def run(self, command: str, env: dict | None = None, retries: int = 0) -> CommandResult:
+        await asyncio.sleep(self.delay)
+        return self.sync.run(command, env=env)
+
+    async def run_many(self, commands: list[str], env: dict | None = None, retries: int = 0) -> list[CommandResult]:
+        await asyncio.sleep(self.delay)
+        return self.sync.run_many(commands, env=env)
+
+
+class TestAsyncClusters:
+    CLUSTERS = ["c1", "c2", "c3"]
+    DELAY = 0.3
+
+    def _slurm(self, tmp_path: Path) -> SlurmPilot:
+        slurm = SlurmPilot(config=make_config(tmp_path), clusters=self.CLUSTERS)
+        for i, cluster in enumerate(self.CLUSTERS):
+            slurm._connections[cluster] = FakeConnection(sbatch_jobid=100 + i)
+            slurm._async_connections[cluster] = SlowAsyncConnection(self.DELAY, sbatch_jobid=100 + i)
+            slurm.schedule_job(bash_job(tmp_path, cluster, name=f"job-{cluster}"))
+        return slurm
+
+    def test_sacct_info_async_latency_is_slowest_cluster(self, tmp_path):
+        slurm = self._slurm(tmp_path)
+        start = time.perf_counter()
+        rows = asyncio.run(slurm.sacct_info_async([f"job-{c}" for c in self.CLUSTERS]))
+        elapsed = time.perf_counter() - start
+        assert sorted(r["cluster"] for r in rows) == self.CLUSTERS
+        assert elapsed < self.DELAY * len(self.CLUSTERS)
+
+    def test_status_async(self, tmp_path):
+        slurm = self._slurm(tmp_path)
+        states = asyncio.run(slurm.status_async([f"job-{c}" for c in self.CLUSTERS] + ["missing"]))
+        assert states == ["COMPLETED"] * len(self.CLUSTERS) + [None]
+
+    def test_status_async_queries_each_cluster_once(self, tmp_path):
+        slurm = self._slurm(tmp_path)
+        for i in range(3):
+            slurm.schedule_job(bash_job(tmp_path, "c1", name=f"more-{i}"))
+        jobnames = [f"more-{i}" for i in range(3)] + [f"job-{c}" for c in self.CLUSTERS]
+        assert asyncio.run(slurm.status_async(jobnames)) == ["COMPLETED"] * 6
+        [[sacct]] = slurm._async_connections["c1"].sync.batches
+        assert sacct.startswith("sacct ") and sacct.endswith("--jobs=100,100,100,100")
+
+    def test_stop_all_jobs_async(self, tmp_path):
+        slurm = self._slurm(tmp_path)
+        cancelled = asyncio.run(slurm.stop_all_jobs_async(self.CLUSTERS))
+        assert sorted(cancelled) == sorted(f"job-{c}" for c in self.CLUSTERS)
+
+    def test_test_ssh_async_mock_cluster(self, tmp_path):
+        slurm = SlurmPilot(config=make_config(tmp_path), clusters=["mock"])
+        assert asyncio.run(slurm.test_ssh_async("mock"))
@@ -0,0 +1,101 @@
+import errno
+import os
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from slurmpilot.config import Config
+from slurmpilot.job_creation_info import JobCreationInfo
+from slurmpilot.snapshot import SnapshotIndex, snapshot
+
+from slurmpilot import SlurmPilot
+
+
+def make_src(root: Path) -> Path:
+    (root / "pkg").mkdir(parents=True)
+    (root / "main.py").write_text("print('hello')")
+    (root / "pkg" / "util.py").write_text("X = 1")
+    return root
+
+
+def tree(root: Path) -> dict[str, str]:
+    return {p.relative_to(root).as_posix(): p.read_text() for p in root.rglob("*") if p.is_file()}
+
+
+def _unsupported(*args):
+    raise OSError(errno.EOPNOTSUPP, "Operation not supported")
+
+
+def _fake_clone(fd_out, request, fd_in):
+    os.write(fd_out, os.read(fd_in, 1 << 20))
+
+
+class TestSnapshot:
+    def test_copy_mode(self, tmp_path):
+        src = make_src(tmp_path / "src")
+        counts = snapshot(src, tmp_path / "dst", mode="copy")
+        assert tree(tmp_path / "dst") == tree(src)
+        assert counts == {"reflink": 0, "hardlink": 0, "copy": 2}
+
+    def test_reflink_falls_back_to_copy(self, tmp_path):
+        src = make_src(tmp_path / "src")
+        with patch("slurmpilot.snapshot.fcntl.ioctl", side_effect=_unsupported) as ioctl:
+            counts = snapshot(src, tmp_path / "dst", mode="reflink")
+        assert tree(tmp_path / "dst") == tree(src)
+        assert counts["copy"] == 2
+        assert ioctl.call_count == 1  # not retried for every file
+
+    def test_reflink_clones_files(self, tmp_path):
+        src = make_src(tmp_path / "src")
+        os.utime(src / "main.py", ns=(1_000_000_000, 1_000_000_000))
+        with patch("slurmpilot.snapshot.fcntl.ioctl", side_effect=_fake_clone):
+            counts = snapshot(src, tmp_path / "dst", mode="reflink")
+        assert counts == {"reflink": 2, "hardlink": 0, "copy": 0}
+        assert tree(tmp_path / "dst") == tree(src)
+        assert (tmp_path / "dst" / "main.py").stat().st_mtime_ns == 1_000_000_000
+
+    def test_auto_links_unchanged_files_to_previous_snapshot(self, tmp_path):
+        src = make_src(tmp_path / "src")
+        index = SnapshotIndex(tmp_path / "snapshots.json")
+        snapshot(src, tmp_path / "job1", mode="auto", index=index)
+        (src / "main.py").write_text("print('changed')")
+        counts = snapshot(src, tmp_path / "job2", mode="auto", index=index)
+
+        assert counts["hardlink"] == 1
+        assert tree(tmp_path / "job2") == tree(src)
+        assert tree(tmp_path / "job1")["main.py"] == "print('hello')"
+        linked = tmp_path / "job2" / "pkg" / "util.py"
+        assert linked.stat().st_ino == (tmp_path / "job1" / "pkg" / "util.py").stat().st_ino
+        assert not linked.stat().st_mode & 0o222
+
+    def test_snapshot_never_shares_the_source_inode(self, tmp_path):
+        src = make_src(tmp_path / "src")
+        index = SnapshotIndex(tmp_path / "snapshots.json")
+        snapshot(src, tmp_path / "job1", mode="auto", index=index)
+        snapshot(src, tmp_path / "job2", mode="auto", index=index)
+        (src / "pkg" / "util.py").write_text("X = 2")
+        assert tree(tmp_path / "job2")["pkg/util.py"] == "X = 1"
+
+    def test_missing_previous_snapshot_is_ignored(self, tmp_path):
+        src = make_src(tmp_path / "src")
+        index = SnapshotIndex(tmp_path / "snapshots.json")
+        index.record(src, tmp_path / "deleted-job")
+        counts = snapshot(src, tmp_path / "job", mode="auto", index=index)
+        assert counts["hardlink"] == 0
+
+    def test_unknown_mode(self, tmp_path):
+        with pytest.raises(ValueError, match="snapshot mode"):
+            snapshot(make_src(tmp_path / "src"), tmp_path / "dst", mode="symlink")
+
+
+class TestScheduleJobSnapshots:
+    def test_jobs_share_unchanged_files(self, tmp_path):
+        src = make_src(tmp_path / "src")
+        slurm = SlurmPilot(config=Config(local_path=tmp_path / "sp", snapshot_mode="auto"), clusters=["mock"])
+        for jobname in ["a", "b"]:
+            slurm.schedule_job(
+                JobCreationInfo(jobname=jobname, entrypoint="main.py", src_dir=str(src), cluster="mock"),
+                dryrun=True,
+            )
+        job_a, job_b = (tmp_path / "sp" / "jobs" / name / "src" / "main.py" for name in ["a", "b"])
+        assert job_a.stat().st_ino == job_b.stat().st_ino
@@ -0,0 +1,204 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import patch
+
+from slurmpilot.config import ClusterConfig, Config
+from slurmpilot.connection_pool import ConnectionPool
+from slurmpilot.instrumentation import InMemoryCollector
+from slurmpilot.job_creation_info import JobCreationInfo
+from slurmpilot.remote_command import LocalExecution
+from slurmpilot.source_cache import HashCache, KnownBlobs, SourceCache, build_manifest
+
+from slurmpilot import SlurmPilot
+
+
+def make_tree(root: Path, files: dict[str, str]) -> Path:
+    for relative, content in files.items():
+        path = root / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    return root
+
+
+class CountingExecution(LocalExecution):
+    def __init__(self):
+        self.batches: list[list[str]] = []
+        self.uploads: list[Path] = []
+
+    def run_many(self, commands, env=None, timeout=None):
+        self.batches.append(commands)
+        return super().run_many(commands, env=env, timeout=timeout)
+
+    def upload_folder(self, local_path, remote_path, timeout=None, link_dest=None, files=None, settings=None):
+        self.uploads.append(sorted(p.name for p in Path(local_path).iterdir()))
+        super().upload_folder(local_path, remote_path, timeout=timeout)
+
+
+class TestHashCache:
+    def test_unchanged_files_are_not_rehashed(self, tmp_path):
+        make_tree(tmp_path / "src", {"a.py": "a"})
+        cache = HashCache(tmp_path / "hashes.json")
+        with patch("slurmpilot.source_cache._sha256", return_value="h") as sha:
+            cache.digest(tmp_path / "src" / "a.py")
+            cache.digest(tmp_path / "src" / "a.py")
+        assert sha.call_count == 1
+
+    def test_modified_file_is_rehashed(self, tmp_path):
+        path = make_tree(tmp_path, {"a.py": "a"}) / "a.py"
+        cache = HashCache(tmp_path / "hashes.json")
+        first = cache.digest(path)
+        path.write_text("changed content")
+        assert cache.digest(path) != first
+
+    def test_persisted_between_instances(self, tmp_path):
+        path = make_tree(tmp_path, {"a.py": "a"}) / "a.py"
+        cache = HashCache(tmp_path / "cache" / "hashes.json")
+        cache.digest(path)
+        cache.save()
+        with patch("slurmpilot.source_cache._sha256") as sha:
+            HashCache(tmp_path / "cache" / "hashes.json").digest(path)
+        sha.assert_not_called()
+
+    def test_shared_between_threads(self, tmp_path):
+        root = make_tree(tmp_path / "src", {f"f{i}.py": str(i) for i in range(200)})
+        cache = HashCache(tmp_path / "hashes.json")
+
+        def digest_and_save(start: int) -> None:
+            for i in range(start, 200, 4):
+                cache.digest(root / f"f{i}.py")
+                cache.save()
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(digest_and_save, range(4)))
+        cache.save()
+        with patch("slurmpilot.source_cache._sha256") as sha:
+            reloaded = HashCache(tmp_path / "hashes.json")
+            for i in range(200):
+                reloaded.digest(root / f"f{i}.py")
+        sha.assert_not_called()
+
+    def test_copies_hit_the_entry_of_their_original(self, tmp_path):
+        make_tree(tmp_path / "src", {"pkg/a.py": "a"})
+        cache = HashCache(tmp_path / "hashes.json")
+        build_manifest(tmp_path / "src", cache)
+        shutil.copytree(tmp_path / "src", tmp_path / "job" / "src")
+        with patch("slurmpilot.source_cache._sha256") as sha:
+            manifest = build_manifest(tmp_path / "job", cache, originals={"src": tmp_path / "src"})
+        sha.assert_not_called()
+        assert list(manifest) == ["src/pkg/a.py"]
+
+
+class TestManifest:
+    def test_executable_files_get_their_own_blob(self, tmp_path):
+        make_tree(tmp_path, {"run.sh": "same", "data.txt": "same"})
+        os.chmod(tmp_path / "run.sh", 0o755)
+        manifest = build_manifest(tmp_path, HashCache(tmp_path / "h.json"))
+        assert manifest["run.sh"] == manifest["data.txt"] + ".x"
+
+
+class TestSourceCache:
+    def _upload(self, tmp_path, connection, job: str, files: dict[str, str]):
+        local = make_tree(tmp_path / "local" / job, files)
+        cache = SourceCache(connection, tmp_path / "remote", HashCache(tmp_path / "hashes.json"))
+        return cache.upload_folder(local, tmp_path / "remote" / "jobs")
+
+    def test_job_folder_is_recreated(self, tmp_path):
+        files = {"slurm_script.sh": "#!/bin/bash", "src/main.py": "print(1)", "src/pkg/util.py": ""}
+        self._upload(tmp_path, LocalExecution(), "job1", files)
+        remote = tmp_path / "remote" / "jobs" / "job1"
+        assert {p.relative_to(remote).as_posix(): p.read_text() for p in remote.rglob("*") if p.is_file()} == files
+
+    def test_relative_remote_root(self, tmp_path, monkeypatch):
+        # Remote paths without a leading / are relative to the home folder of the ssh session.
+        monkeypatch.chdir(tmp_path)
+        local = make_tree(tmp_path / "local" / "job1", {"src/main.py": "print(1)"})
+        SourceCache(LocalExecution(), Path("remote"), HashCache(tmp_path / "hashes.json")).upload_folder(
+            local, Path("remote") / "jobs"
+        )
+        assert (tmp_path / "remote" / "jobs" / "job1" / "src" / "main.py").read_text() == "print(1)"
+
+    def test_files_are_read_only_links_to_blobs(self, tmp_path):
+        self._upload(tmp_path, LocalExecution(), "job1", {"src/main.py": "print(1)"})
+        path = tmp_path / "remote" / "jobs" / "job1" / "src" / "main.py"
+        [blob] = (tmp_path / "remote" / "blobs").iterdir()
+        assert path.stat().st_ino == blob.stat().st_ino
+        assert not blob.stat().st_mode & 0o222
+
+    def test_resubmission_only_uploads_changed_files(self, tmp_path):
+        connection = CountingExecution()
+        code = {"src/main.py": "print(1)", "src/big.bin": "x" * 10000}
+        first = self._upload(tmp_path, connection, "job1", {**code, "metadata.json": "job1"})
+        second = self._upload(tmp_path, connection, "job2", {**code, "metadata.json": "job2"})
+        assert first.uploaded_blobs == 3
+        assert second.uploaded_blobs == 1
+        assert second.uploaded_bytes == len("job2")
+        assert (tmp_path / "remote" / "jobs" / "job2" / "src" / "big.bin").read_text() == "x" * 10000
+
+    def test_unchanged_code_needs_no_transfer(self, tmp_path):
+        connection = CountingExecution()
+        self._upload(tmp_path, connection, "job1", {"src/main.py": "print(1)"})
+        connection.batches.clear()
+        connection.uploads.clear()
+        result = self._upload(tmp_path, connection, "job2", {"src/main.py": "print(1)"})
+        assert result.uploaded_bytes == 0
+        assert connection.uploads == []
+        assert len(connection.batches) == 2  # missing-blob check + assembly
+
+
+class TestKnownBlobs:
+    def _upload(self, tmp_path, connection, job: str, files: dict[str, str]):
+        local = make_tree(tmp_path / "local" / job, files)
+        known = KnownBlobs(tmp_path / "known.json", tmp_path / "remote")
+        cache = SourceCache(connection, tmp_path / "remote", HashCache(tmp_path / "hashes.json"), known=known)
+        return cache.upload_folder(local, tmp_path / "remote" / "jobs")
+
+    def test_saves_merge_between_instances(self, tmp_path):
+        first = KnownBlobs(tmp_path / "known.json", "/remote")
+        second = KnownBlobs(tmp_path / "known.json", "/remote")
+        first.add(["a"])
+        second.add(["b"])
+        first.save()
+        second.save()
+        assert KnownBlobs(tmp_path / "known.json", "/remote").names == {"a", "b"}
+        assert KnownBlobs(tmp_path / "known.json", "/other").names == set()
+
+    def test_known_blobs_skip_the_listing(self, tmp_path):
+        connection = CountingExecution()
+        self._upload(tmp_path, connection, "job1", {"src/main.py": "print(1)"})
+        connection.batches.clear()
+        result = self._upload(tmp_path, connection, "job2", {"src/main.py": "print(1)"})
+        assert result.uploaded_blobs == 0
+        assert len(connection.batches) == 1  # assembly only
+
+    def test_blobs_removed_from_the_cluster_are_uploaded_again(self, tmp_path):
+        connection = CountingExecution()
+        self._upload(tmp_path, connection, "job1", {"src/main.py": "print(1)"})
+        shutil.rmtree(tmp_path / "remote" / "blobs")
+        result = self._upload(tmp_path, connection, "job2", {"src/main.py": "print(1)"})
+        assert result.uploaded_blobs == 1
+        assert (tmp_path / "remote" / "jobs" / "job2" / "src" / "main.py").read_text() == "print(1)"
+
+
+class TestSlurmPilotSourceCache:
+    def test_second_submission_transfers_only_generated_files(self, fake_rsync, tmp_path):
+        fake_rsync.add_executable("sbatch", 'print("Submitted batch job 1")')
+        cluster = ClusterConfig(
+            host="fakehost", remote_path=str(tmp_path / "remote"), ssh_multiplexing=False, source_cache=True
+        )
+        collector = InMemoryCollector()
+        slurm = SlurmPilot(
+            config=Config(local_path=tmp_path / "local", cluster_configs={"c": cluster}),
+            clusters=["c"],
+            pool=ConnectionPool(),
+            listeners=[collector],
+        )
+        src = make_tree(tmp_path / "code", {"main.sh": "echo hi", "data.bin": "d" * 100000})
+        for jobname in ["a", "b"]:
+            slurm.schedule_job(JobCreationInfo(jobname=jobname, entrypoint="main.sh", src_dir=str(src), cluster="c"))
+        first, second = collector.by_operation("upload")
+        assert first.bytes_transferred > 100000
+        assert second.bytes_transferred < 5000
+        remote_src = tmp_path / "remote" / "jobs" / "b" / "code"
+        assert (remote_src / "data.bin").read_text() == "d" * 100000
@@ -0,0 +1,142 @@
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from slurmpilot.cli import cmd_list_jobs
+from slurmpilot.config import ClusterConfig, Config
+from slurmpilot.connection_pool import ConnectionPool
+from slurmpilot.job_creation_info import JobCreationInfo
+from slurmpilot.job_metadata import JobMetadata
+from slurmpilot.task_bundles import (
+    ENTRIES_DIR,
+    block_entries,
+    n_array_tasks,
+    parse_progress,
+    progress_command,
+    read_progress,
+)
+
+from slurmpilot import SlurmPilot
+
+# Prints its --value and fails for the value "bad".
+_ENTRYPOINT = """
+import argparse, sys
+p = argparse.ArgumentParser()
+p.add_argument('--value')
+args = p.parse_args()
+print(f"value={args.value}")
+sys.exit(1 if args.value == "bad" else 0)
+"""
+
+
+def _write_statuses(job_dir: Path, codes: dict[int, int]) -> None:
+    entries = job_dir / ENTRIES_DIR
+    entries.mkdir(parents=True, exist_ok=True)
+    for entry, code in codes.items():
+        (entries / f"{entry}.status").write_text(f"{code}\n")
+
+
+class TestBlocks:
+    def test_array_size(self):
+        assert n_array_tasks(10, None) == 10
+        assert n_array_tasks(10, 3) == 4
+        assert n_array_tasks(9, 3) == 3
+        assert list(block_entries(3, 10, 3)) == [9]
+
+    def test_progress_command_matches_read_progress(self, tmp_path):
+        _write_statuses(tmp_path, {0: 0, 1: 1, 2: 0, 7: 0, 12: 2})
+        output = subprocess.run(
+            ["bash", "-c", progress_command(tmp_path, 5)], capture_output=True, text=True, check=True
+        ).stdout
+        assert parse_progress(output) == read_progress(tmp_path, 5) == {0: (3, 1), 1: (1, 0), 2: (1, 1)}
+
+    def test_missing_or_split_progress(self, tmp_path):
+        assert subprocess.run(["bash", "-c", progress_command(tmp_path, 5)]).returncode == 0
+        assert read_progress(tmp_path, 5) == {}
+        # find may split the status files over several awk calls.
+        assert parse_progress("0 2 1\n0 3 0\nnoise\n") == {0: (5, 1)}
+
+
+class TestBundledJobs:
+    def _job(self, tmp_path: Path, values: list[str], name: str = "bundle", **options) -> JobCreationInfo:
+        src = tmp_path / "src"
+        src.mkdir(exist_ok=True)
+        (src / "main.py").write_text(_ENTRYPOINT)
+        return JobCreationInfo(
+            jobname=name, entrypoint="main.py", src_dir=str(src), cluster="mock", python_binary=sys.executable,
+            python_args=[f"--value={value}" for value in values], tasks_per_job=3, **options,
+        )
+
+    def test_script_runs_blocks(self, tmp_path):
+        slurm = SlurmPilot(config=Config(local_path=tmp_path), clusters=["mock"])
+        slurm.schedule_job(self._job(tmp_path, ["a", "b", "c", "d", "e"]), dryrun=True)
+        script = (tmp_path / "jobs" / "bundle" / "slurm_script.sh").read_text()
+        assert "#SBATCH --array=0-1\n" in script
+        assert "run_entry $entry\n" in script and "wait -n" not in script
+
+    @pytest.mark.parametrize("parallel_entries", [False, True])
+    def test_entries_have_their_own_logs_and_status(self, tmp_path, parallel_entries):
+        slurm = SlurmPilot(config=Config(local_path=tmp_path), clusters=["mock"])
+        job = self._job(tmp_path, ["a", "b", "c", "d", "bad"], n_cpus=2, parallel_entries=parallel_entries)
+        # The mock runs a single array task, the second block here.
+        job.env = {"SLURM_ARRAY_TASK_ID": "1"}
+        slurm._mock_slurms["mock"].wait(slurm.schedule_job(job))
+
+        assert slurm.log("bundle", index=3) == ("value=d\n", "")
+        assert slurm.log("bundle", index=0) == ("", "")
+        entries = tmp_path / "jobs" / "bundle" / ENTRIES_DIR
+        assert (entries / "4.status").read_text().strip() == "1"
+        assert slurm.status(["bundle"]) == ["FAILED"]
+        [row] = slurm.sacct_info(["bundle"])
+        assert (row["entries"], row["entries_done"], row["entries_failed"]) == (5, 2, 1)
+
+    def test_parallel_entries_need_tasks_per_job(self, tmp_path):
+        job = self._job(tmp_path, ["a"])
+        job.tasks_per_job = None
+        job.parallel_entries = True
+        with pytest.raises(AssertionError, match="parallel_entries"):
+            job.check_path()
+
+    def test_list_jobs_shows_entry_progress(self, tmp_path, capsys):
+        config = Config(local_path=tmp_path)
+        job_dir = tmp_path / "jobs" / "bundle"
+        job_dir.mkdir(parents=True)
+        meta = JobMetadata(jobname="bundle", cluster="mock", date="2026-01-01 00:00:00", n_entries=6, tasks_per_job=3)
+        (job_dir / "metadata.json").write_text(meta.to_json())
+        row = {"jobname": "bundle", "jobid": "7", "cluster": "mock", "creation": meta.date, "elapsed": "00:01:00",
+               "state": "RUNNING", "nodelist": "node1", "entries": 3}
+        infos = [
+            {**row, "task_id": 0, "entries_done": 3, "entries_failed": 1},
+            {**row, "task_id": 1, "entries_done": 1, "entries_failed": 0},
+        ]
+        with patch("slurmpilot.cli.SlurmPilot") as MockSP:
+            MockSP.return_value.sacct_info_async = AsyncMock(return_value=infos)
+            cmd_list_jobs(argparse.Namespace(n=10, clusters=None, collapse_job_array=False), config)
+            assert "3/3 (1 failed)" in capsys.readouterr().out
+            cmd_list_jobs(argparse.Namespace(n=10, clusters=None, collapse_job_array=True), config)
+            assert "4/6 (1 failed)" in capsys.readouterr().out
+
+    def test_progress_is_counted_in_the_sacct_round_trip(self, fake_rsync, tmp_path):
+        fake_rsync.add_executable("sbatch", 'print("Submitted batch job 42")')
+        fake_rsync.add_executable(
+            "sacct", 'print("JobID|Elapsed|Start|State|NodeList|")\nprint("42_1|00:00:01|x|RUNNING|n|")'
+        )
+        cluster = ClusterConfig(
+            host="fakehost", remote_path=str(tmp_path / "remote"), ssh_multiplexing=False,
+            max_array_size=1000, max_submit_jobs=1000,
+        )
+        slurm = SlurmPilot(
+            config=Config(local_path=tmp_path / "local", cluster_configs={"c": cluster}), clusters=["c"],
+            pool=ConnectionPool(),
+        )
+        job = self._job(tmp_path, ["a", "b", "c", "d", "e"])
+        job.cluster = "c"
+        slurm.schedule_job(job)
+        _write_statuses(tmp_path / "remote" / "jobs" / "bundle", {3: 0, 4: 1})
+        calls = len(fake_rsync.calls())
+        [row] = slurm.sacct_info(["bundle"])
+        assert len(fake_rsync.calls()) == calls + 1
+        assert (row["task_id"], row["entries"], row["entries_done"], row["entries_failed"]) == (1, 2, 2, 1)
@@ -0,0 +1,114 @@
+import argparse
+from pathlib import Path
+
+import pytest
+from slurmpilot.cli import cmd_transfer_stats
+from slurmpilot.config import ClusterConfig, Config
+from slurmpilot.connection_pool import ConnectionPool
+from slurmpilot.job_creation_info import JobCreationInfo
+from slurmpilot.remote_command import SSHExecution, TransferSettings
+from slurmpilot.transfer_stats import FAST_LINK, SLOW_LINK, TransferStats, auto_settings, transfer_settings
+
+from slurmpilot import SlurmPilot
+
+
+class TestTransferSettings:
+    def test_rsync_options(self):
+        assert TransferSettings().rsync_options() == ["-az"]
+        settings = TransferSettings(compress=True, compress_level=9, bwlimit="10m", whole_file=True)
+        assert settings.rsync_options() == ["-az", "--compress-level=9", "--bwlimit=10m", "--whole-file"]
+        assert TransferSettings(compress=False, compress_level=9).rsync_options() == ["-a"]
+
+    def test_invalid_level(self):
+        with pytest.raises(ValueError, match="compress_level"):
+            TransferSettings(compress_level=12)
+
+    def test_commands_follow_settings(self, tmp_path):
+        exe = SSHExecution(host="h", transfer_settings=TransferSettings(compress=False, bwlimit="500"))
+        rsync = exe._rsync_upload_command(tmp_path / "job", Path("/remote"))
+        assert rsync[1:3] == ["-a", "--bwlimit=500"]
+        exe = SSHExecution(host="h", transfer="tar", transfer_settings=TransferSettings(compress=False))
+        tar = exe._tar_upload_command(tmp_path / "job", Path("/remote"))[-1]
+        assert "-czf" not in tar and "-xzf" not in tar and " -z " not in tar
+
+
+class TestAutoSettings:
+    def test_thresholds(self):
+        base = TransferSettings(bwlimit="10m")
+        assert auto_settings(base, None) == base
+        fast = auto_settings(base, FAST_LINK * 2)
+        assert (fast.compress, fast.whole_file, fast.bwlimit) == (False, True, "10m")
+        slow = auto_settings(base, SLOW_LINK / 2)
+        assert (slow.compress, slow.compress_level) == (True, 9)
+        assert auto_settings(base, (FAST_LINK + SLOW_LINK) / 2) == base
+
+    def test_explicit_settings_ignore_throughput(self):
+        cfg = ClusterConfig(host="h", compress=False, whole_file=True)
+        assert transfer_settings(cfg, FAST_LINK / 1000) == TransferSettings(compress=False, whole_file=True)
+        with pytest.raises(ValueError, match="compress"):
+            transfer_settings(ClusterConfig(host="h", compress="sometimes"))
+
+
+class TestTransferStats:
+    def test_small_uploads_are_not_recorded(self, tmp_path):
+        stats = TransferStats(tmp_path / "transfers.json")
+        assert not stats.record("c", 1000, 1.0, compressed=True)
+        assert stats.throughput("c") is None
+
+    def test_moving_average_and_summary(self, tmp_path):
+        stats = TransferStats(tmp_path / "transfers.json")
+        stats.record("c", 10_000_000, 1.0, compressed=True)
+        stats.record("c", 10_000_000, 10.0, compressed=False)
+        assert stats.throughput("c") == pytest.approx(0.3 * 1e6 + 0.7 * 1e7)
+        summary = TransferStats(tmp_path / "transfers.json").summary("c")
+        assert summary["uploads"] == 2
+        assert summary["compressed"] == pytest.approx(1e7)
+        assert summary["uncompressed"] == pytest.approx(1e6)
+        assert stats.summary("other") == {"uploads": 0, "throughput": None, "compressed": None, "uncompressed": None}
+
+
+class TestSlurmPilotTransferStats:
+    def _slurm(self, tmp_path: Path, **options) -> SlurmPilot:
+        cluster = ClusterConfig(
+            host="fakehost", remote_path=str(tmp_path / "remote"), ssh_multiplexing=False, link_dest=False, **options
+        )
+        return SlurmPilot(
+            config=Config(local_path=tmp_path / "local", cluster_configs={"c": cluster}),
+            clusters=["c"], pool=ConnectionPool(),
+        )
+
+    def test_uploads_are_measured_and_used_by_auto(self, fake_rsync, tmp_path):
+        fake_rsync.add_executable("sbatch", 'print("Submitted batch job 1")')
+        src = tmp_path / "code"
+        src.mkdir()
+        (src / "main.sh").write_text("echo hi")
+        (src / "data.bin").write_bytes(b"d" * 2_000_000)
+        slurm = self._slurm(tmp_path, compress="auto")
+        slurm.schedule_job(JobCreationInfo(jobname="a", entrypoint="main.sh", src_dir=str(src), cluster="c"))
+        throughput = slurm.transfer_stats().throughput("c")
+        assert throughput is not None
+        assert slurm._connections["c"].transfer_settings == auto_settings(TransferSettings(), None)
+        assert slurm._transfer_settings("c") == auto_settings(TransferSettings(), throughput)
+
+    def test_auto_settings_are_passed_to_the_upload(self, fake_rsync, tmp_path):
+        fake_rsync.add_executable("sbatch", 'print("Submitted batch job 1")')
+        src = tmp_path / "code"
+        src.mkdir()
+        (src / "main.sh").write_text("echo hi")
+        slurm = self._slurm(tmp_path, compress="auto")
+        slurm.transfer_stats().record("c", 100 * FAST_LINK, 1.0, compressed=True)
+        connection = slurm._connections["c"]
+        slurm.schedule_job(JobCreationInfo(jobname="a", entrypoint="main.sh", src_dir=str(src), cluster="c"))
+        [rsync] = [call for call in fake_rsync.calls() if call["program"] == "rsync"]
+        assert rsync["argv"][:2] == ["-a", "--whole-file"]
+        # The pooled connection, shared with other instances, keeps its own settings.
+        assert connection.transfer_settings == TransferSettings()
+        assert slurm._connections["c"] is connection
+
+    def test_cli_prints_stats(self, tmp_path, capsys):
+        slurm = self._slurm(tmp_path, compress="auto")
+        slurm.transfer_stats().record("c", 100_000_000, 1.0, compressed=True)
+        cmd_transfer_stats(argparse.Namespace(clusters=None), slurm.config)
+        out = capsys.readouterr().out
+        assert "100.0 MB/s" in out
+        assert "no compression, whole files (auto)" in out
@@ -0,0 +1,71 @@
+import threading
+from pathlib import Path
+
+import pytest
+from slurmpilot.config import ClusterConfig, Config
+from slurmpilot.connection_pool import ConnectionPool
+from slurmpilot.job_creation_info import JobCreationInfo
+from slurmpilot.watch import SourceWatcher
+
+from slurmpilot import SlurmPilot
+
+
+def make_tree(root: Path, files: dict[str, str]) -> Path:
+    for relative, content in files.items():
+        path = root / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    return root
+
+
+def make_slurm(tmp_path: Path, **options) -> SlurmPilot:
+    cluster = ClusterConfig(
+        host="fakehost", remote_path=str(tmp_path / "remote"), ssh_multiplexing=False, **options
+    )
+    return SlurmPilot(
+        config=Config(local_path=tmp_path / "local", cluster_configs={"c": cluster}),
+        clusters=["c"], pool=ConnectionPool(),
+    )
+
+
+class TestSourceWatcher:
+    def test_sync_only_stages_changes(self, fake_rsync, tmp_path):
+        src = make_tree(
+            tmp_path / "code", {"main.sh": "echo hi", "data.bin": "d" * 1000, ".slurmpilotignore": "*.log\n"}
+        )
+        watcher = SourceWatcher(make_slurm(tmp_path, source_cache=True), "c", src)
+        first = watcher.sync()
+        assert first.uploaded_blobs == 3
+        assert watcher.sync() is None
+        (src / "debug.log").write_text("ignored")
+        assert watcher.sync() is None
+        (src / "main.sh").write_text("echo changed")
+        assert watcher.sync().uploaded_blobs == 1
+
+    def test_run_stops_on_event(self, fake_rsync, tmp_path):
+        src = make_tree(tmp_path / "code", {"main.sh": "echo hi"})
+        watcher = SourceWatcher(make_slurm(tmp_path, source_cache=True), "c", src, interval=0.01)
+        stop = threading.Event()
+        synced = []
+
+        def on_sync(upload):
+            synced.append(upload)
+            stop.set()
+
+        watcher.run(stop=stop, on_sync=on_sync)
+        assert [upload.uploaded_blobs for upload in synced] == [1]
+
+    def test_staging_requires_source_cache(self, tmp_path):
+        with pytest.raises(ValueError, match="source_cache"):
+            make_slurm(tmp_path).stage_sources("c", tmp_path)
+
+    def test_staged_job_skips_the_blob_listing(self, fake_rsync, tmp_path):
+        fake_rsync.add_executable("sbatch", 'print("Submitted batch job 1")')
+        src = make_tree(tmp_path / "code", {"main.sh": "echo hi", "data.bin": "d" * 500_000})
+        slurm = make_slurm(tmp_path, source_cache=True)
+        slurm.stage_sources("c", src)
+        fake_rsync.log.unlink()
+        slurm.schedule_job(JobCreationInfo(jobname="a", entrypoint="main.sh", src_dir=str(src), cluster="c"))
+        # Upload of the generated files, assembly of the job folder, sbatch.
+        assert [call["program"] for call in fake_rsync.calls()] == ["rsync", "ssh", "ssh"]
+        assert (tmp_path / "remote" / "jobs" / "a" / "code" / "data.bin").stat().st_size == 500_000